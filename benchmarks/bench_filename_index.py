@@ -0,0 +1,128 @@
+"""文件名索引基准：FilenameIndex（三字母组倒排表）与逐个比较同扩展名文件的线性查找
+
+模拟爬取过程：文件陆续登记，期间穿插 url() 兜底查询（约一半命中带内容哈希的文件名，其余未命中），
+之后再登记一批文件（每次登记都要与已缓存的查询比较）。线性实现即改为三字母组之前的做法：
+每次查询遍历整个扩展名桶，每次登记遍历该扩展名的全部已缓存查询。两者结果逐一比对。
+
+用法：
+    python benchmarks/bench_filename_index.py [--files 50000] [--queries 20000] [--output results.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from website_crawler import FilenameIndex  # noqa: E402
+
+EXTS = ('.js', '.css', '.png', '.woff2', '.jpg', '.svg')
+WORDS = ('logo', 'icon', 'font', 'hero', 'banner', 'chunk', 'page', 'vendor', 'main', 'app', 'bg', 'arrow')
+
+
+class LinearIndex(FilenameIndex):
+    """查询遍历整个扩展名桶、登记遍历全部已缓存查询的参考实现"""
+
+    def add(self, rel_path):
+        name = rel_path.rsplit('/', 1)[-1]
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        if rel_path in self._paths:
+            return
+        self._paths.add(rel_path)
+        self._by_ext.setdefault(ext, []).append((stem, rel_path))
+        cached = self._cache.get(ext)
+        if cached:
+            key = self.walk_key(rel_path)
+            for filename, hit in cached.items():
+                if os.path.splitext(filename)[0] in stem and (hit is None or key < hit[0]):
+                    cached[filename] = (key, rel_path)
+
+    def find(self, filename):
+        file_base, file_ext = os.path.splitext(filename)
+        file_ext = file_ext.lower()
+        cached = self._cache.setdefault(file_ext, {})
+        if filename not in cached:
+            matches = [(self.walk_key(rel_path), rel_path)
+                       for stem, rel_path in self._by_ext.get(file_ext, ()) if file_base in stem]
+            cached[filename] = min(matches) if matches else None
+        hit = cached[filename]
+        return hit[1] if hit else None
+
+
+def make_workload(files, queries, seed):
+    """返回 (文件相对路径列表, 查询文件名列表)"""
+    rng = random.Random(seed)
+    dirs = [f"static/{rng.choice(('chunks', 'css', 'media', 'img'))}/{rng.getrandbits(24):06x}" for _ in range(500)]
+    paths = []
+    for i in range(files):
+        stem = f"{rng.choice(WORDS)}-{rng.choice(WORDS)}-{i}.{rng.getrandbits(40):010x}"
+        paths.append(f"{rng.choice(dirs)}/{stem}{rng.choice(EXTS)}")
+    names = []
+    for _ in range(queries):
+        roll = rng.random()
+        if roll < 0.5:
+            # 去掉内容哈希后的原始文件名
+            stem, ext = os.path.splitext(rng.choice(paths).rsplit('/', 1)[-1])
+            names.append(stem.rsplit('.', 1)[0] + ext)
+        elif roll < 0.9:
+            names.append(f"missing-{rng.getrandbits(32):08x}{rng.choice(EXTS)}")
+        else:
+            names.append(f"{rng.choice(WORDS)[:2]}{rng.choice(EXTS)}")
+    return paths, names
+
+
+def run(index_class, paths, names):
+    index = index_class()
+    split = len(paths) // 2
+    start = time.perf_counter()
+    for rel_path in paths[:split]:
+        index.add(rel_path)
+    # 查询与登记交替进行（下载陆续落盘时CSS重写在查询）
+    step = max(1, len(names) // (len(paths) - split)) if len(paths) > split else len(names)
+    results = []
+    remaining = iter(paths[split:])
+    for i, name in enumerate(names):
+        results.append(index.find(name))
+        if i % step == 0:
+            rel_path = next(remaining, None)
+            if rel_path:
+                index.add(rel_path)
+    for rel_path in remaining:
+        index.add(rel_path)
+    results.extend(index.find(name) for name in names)
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FilenameIndex 查找基准')
+    parser.add_argument('--files', type=int, default=50000, help='登记的文件数量')
+    parser.add_argument('--queries', type=int, default=20000, help='兜底查询数量')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='结果 JSON 路径')
+    args = parser.parse_args()
+
+    paths, names = make_workload(args.files, args.queries, args.seed)
+    print(f"文件: {args.files}, 查询: {args.queries}")
+    results = {}
+    outputs = {}
+    for label, index_class in (('trigram', FilenameIndex), ('linear', LinearIndex)):
+        seconds, outputs[label] = run(index_class, paths, names)
+        results[label] = {'seconds': round(seconds, 3)}
+        print(f"  {label:8s} {seconds:8.2f}s")
+    if outputs['trigram'] != outputs['linear']:
+        print("  [FAIL] 两种实现的查找结果不一致")
+        sys.exit(1)
+    print(f"  结果一致，加速 {results['linear']['seconds'] / max(results['trigram']['seconds'], 1e-9):.1f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'bench_filename_index', 'config': vars(args), 'results': results}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""JS / 内联脚本路径重写的微基准
+
+对比旧实现（每个前缀一次 re.sub / str.replace）与 WebsiteCrawler 当前实现，
+先校验两者输出逐字节一致，再输出各自耗时与加速比。fix_js_paths 为单次扫描；
+内联脚本的转义前缀仍用 str.replace（比正则回调快），此处作为回归对照。
+
+用法：
+    python benchmarks/bench_js_rewrite.py [--size-mb 4] [--prefixes 4] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from website_crawler import WebsiteCrawler  # noqa: E402
+
+
+# ========== 旧实现（逐前缀多趟扫描），仅作对照 ==========
+
+def legacy_fix_js_paths(crawler, js_content):
+    js_content = re.sub(
+        r'(\.p\s*=\s*["\'])(/[^"\']*)(["\'])',
+        lambda m: f'{m.group(1)}{m.group(2).lstrip("/")}{m.group(3)}',
+        js_content
+    )
+    js_content = re.sub(
+        r'(__webpack_public_path__\s*=\s*["\'])(/[^"\']*)(["\'])',
+        lambda m: f'{m.group(1)}{m.group(2).lstrip("/")}{m.group(3)}',
+        js_content
+    )
+    js_content = re.sub(
+        r'(assetPrefix\s*[=:]\s*["\'])(/[^"\']*)(["\'])',
+        lambda m: f'{m.group(1)}{m.group(2).lstrip("/")}{m.group(3)}',
+        js_content
+    )
+    for prefix in crawler.detected_prefixes:
+        relative_prefix = prefix.lstrip('/')
+
+        def replace_prefix(match, p=prefix, rp=relative_prefix):
+            full_path = match.group(2)
+            if full_path.startswith(p):
+                return f'{match.group(1)}{rp}{full_path[len(p):]}{match.group(3)}'
+            return match.group(0)
+
+        js_content = re.sub(
+            r'(["\'])(' + re.escape(prefix) + r'[^"\']*)(["\'])',
+            replace_prefix,
+            js_content
+        )
+    return js_content
+
+
+def legacy_fix_inline_script_paths(crawler, script_content):
+    for prefix in crawler.detected_prefixes:
+        escaped_prefix = prefix.replace('/', '\\/')
+        double_escaped = prefix.replace('/', '\\\\/')
+        if double_escaped in script_content:
+            script_content = script_content.replace(double_escaped, escaped_prefix[2:])
+        if escaped_prefix in script_content:
+            script_content = script_content.replace(escaped_prefix, escaped_prefix[2:])
+
+    def replace_quoted_abs_path(match):
+        quote_char = match.group(1)
+        path = match.group(2)
+        clean_path = path.split('?')[0]
+        decoded_path = unquote(clean_path)
+        if clean_path in crawler.path_mapping:
+            return f"{quote_char}{crawler.path_mapping[clean_path]}{quote_char}"
+        if decoded_path in crawler.path_mapping:
+            return f"{quote_char}{crawler.path_mapping[decoded_path]}{quote_char}"
+        if re.search(r'\.(js|css|png|jpg|jpeg|gif|svg|woff2?|ttf|eot|otf|json|webp|ico|mp4|webm)(\?|$)', path):
+            return f"{quote_char}{crawler.absolute_to_relative(path)}{quote_char}"
+        return match.group(0)
+
+    return re.sub(
+        r"""(['\"])(\/(?!\/|api\/|graphql)[a-zA-Z0-9_\-\.\/\%\[\]@]+\.[a-zA-Z0-9]+(?:\?[^'\"]*)?)\1""",
+        replace_quoted_abs_path,
+        script_content
+    )
+
+
+# ========== 合成输入 ==========
+
+def make_prefixes(count):
+    """生成互不嵌套的站点前缀（旧实现在嵌套前缀下的结果依赖 set 的迭代顺序）"""
+    return [f'/b/site{i}/ecom-website/{i:04x}/' for i in range(count)]
+
+
+def make_bundle(rng, prefixes, size):
+    """生成类似 Next.js chunk 的压缩JS"""
+    pieces = ['!function(){var e={};e.p="/b/site0/ecom-website/0000/_next/";']
+    total = len(pieces[0])
+    while total < size:
+        kind = rng.random()
+        prefix = rng.choice(prefixes)
+        if kind < 0.25:
+            piece = f'a[{rng.randint(0, 9999)}]="{prefix}_next/static/chunks/{rng.randint(0, 1 << 30):x}.js";'
+        elif kind < 0.3:
+            piece = f'assetPrefix:"{prefix[:-1]}",'
+        else:
+            piece = f'function f{rng.randint(0, 99999)}(t,n){{return t.length>n?"x{rng.randint(0, 999)}":n}}'
+        pieces.append(piece)
+        total += len(piece)
+    pieces.append('}();')
+    return ''.join(pieces)
+
+
+def make_inline_script(rng, prefixes, size):
+    """生成类似 self.__next_f.push 的内联脚本"""
+    pieces = []
+    total = 0
+    while total < size:
+        prefix = rng.choice(prefixes)
+        escaped = prefix.replace('/', '\\/')
+        kind = rng.random()
+        if kind < 0.3:
+            piece = f'self.__next_f.push([1,"{escaped}_next\\/static\\/media\\/{rng.randint(0, 9999)}.woff2"]);'
+        elif kind < 0.4:
+            double = prefix.replace('/', '\\\\/')
+            piece = f'self.__next_f.push([1,"{double}_next\\\\/image?url={rng.randint(0, 99)}"]);'
+        elif kind < 0.7:
+            piece = f'var u{rng.randint(0, 999)}="/assets/img/{rng.randint(0, 999)}.png?v=2";'
+        else:
+            piece = f'self.__next_f.push([1,"{rng.randint(0, 1 << 40):x} plain text chunk"]);'
+        pieces.append(piece)
+        total += len(piece)
+    return ''.join(pieces)
+
+
+def best_of(repeat, func, *args):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JS/内联脚本路径重写微基准')
+    parser.add_argument('--size-mb', type=float, default=4.0, help='合成JS bundle大小（MB）')
+    parser.add_argument('--prefixes', type=int, default=4, help='detected_prefixes 数量')
+    parser.add_argument('--repeat', type=int, default=3, help='每项取最好成绩的重复次数')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    prefixes = make_prefixes(args.prefixes)
+    crawler = WebsiteCrawler('https://example.com/', 'bench_output')
+    crawler.detected_prefixes.update(prefixes)
+    crawler.path_mapping['/assets/img/1.png'] = 'assets/img/1.png'
+
+    size = int(args.size_mb * 1024 * 1024)
+    bundle = make_bundle(rng, prefixes, size)
+    inline = make_inline_script(rng, prefixes, size // 4)
+
+    cases = [
+        ('fix_js_paths', bundle, legacy_fix_js_paths, crawler.fix_js_paths),
+        ('_fix_inline_script_paths', inline, legacy_fix_inline_script_paths, crawler._fix_inline_script_paths),
+    ]
+    print(f"前缀数: {len(prefixes)}, bundle: {len(bundle) / 1e6:.1f}MB, 内联脚本: {len(inline) / 1e6:.1f}MB")
+    for name, content, legacy, current in cases:
+        legacy_time, expected = best_of(args.repeat, legacy, crawler, content)
+        current_time, actual = best_of(args.repeat, current, content)
+        if actual != expected:
+            print(f"  [FAIL] {name}: 输出与旧实现不一致")
+            sys.exit(1)
+        print(f"  {name}: 旧实现 {legacy_time * 1000:.1f}ms, 当前实现 {current_time * 1000:.1f}ms, "
+              f"加速 {legacy_time / current_time:.2f}x（输出一致）")
+
+
+if __name__ == '__main__':
+    main()
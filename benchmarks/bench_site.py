@@ -0,0 +1,281 @@
+"""整站爬取基准：本地合成 Next.js 风格站点 + 可注入延迟的 http.server
+
+生成包含多MB bundle、self.__next_f.push 内联脚本、嵌套 @import 链的合成站点，
+在本地 http.server 上提供（每个请求可注入固定延迟），然后在独立子进程中完整爬取，
+记录端到端耗时、各阶段耗时、峰值RSS 和每秒文件数，结果写入 JSON 便于比较不同版本。
+
+用法：
+    python benchmarks/bench_site.py [--css 20] [--js 30] [--images 200] [--fonts 10]
+                                    [--bundle-mb 4] [--latency-ms 20] [--repeat 3]
+                                    [--rewrite-mode walk] [--output results.json]
+"""
+import argparse
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_js_rewrite import make_bundle, make_inline_script, make_prefixes  # noqa: E402
+from website_crawler import WebsiteCrawler  # noqa: E402
+
+
+# 阶段 -> 计时的 WebsiteCrawler 方法
+STAGES = {
+    'discovery': ('detect_resource_prefixes', 'collect_html_resources', '_enqueue_links'),
+    'download': ('download_graph',),
+    'css': ('_fix_all_css_files', 'flush_pending_css'),
+    'js': ('_fix_all_js_files',),
+    'html': ('fix_html_paths',),
+    'final_rewrite': ('_refix_unchanged_files', 'rewrite_files_in_processes'),
+    # pipeline 模式在下载线程中重写，记录的是各线程累计时间（已包含在 download 中）
+    'pipeline_rewrite_threads': ('_rewrite_text',),
+}
+
+
+# ========== 合成站点 ==========
+
+def _write(root, rel_path, data):
+    path = os.path.join(root, rel_path.lstrip('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data.encode('utf-8') if isinstance(data, str) else data)
+
+
+def generate_site(root, css=20, js=30, images=200, fonts=10, bundle_mb=4.0, pages=1,
+                  import_depth=3, prefixes=4, seed=42):
+    """生成合成站点，返回站点统计信息"""
+    rng = random.Random(seed)
+    all_prefixes = make_prefixes(prefixes)
+    prefix = all_prefixes[0]
+    static = f'{prefix}_next/static/'
+
+    image_paths = [f'{static}media/img-{i}.png' for i in range(images)]
+    font_paths = [f'{static}media/font-{i}.woff2' for i in range(fonts)]
+    for path in image_paths:
+        _write(root, path, rng.randbytes(rng.randint(2, 40) * 1024))
+    for path in font_paths:
+        _write(root, path, rng.randbytes(rng.randint(20, 80) * 1024))
+
+    # CSS：每个入口文件带一条 @import 链，url() 引用字体和图片
+    css_paths = []
+    for i in range(css):
+        css_paths.append(f'{static}css/entry-{i}.css')
+        chain = [f'{static}css/entry-{i}.css'] + [f'{static}css/import-{i}-{d}.css' for d in range(import_depth)]
+        for level, path in enumerate(chain):
+            rules = []
+            if level + 1 < len(chain):
+                rules.append(f'@import url("{chain[level + 1]}");')
+            for _ in range(20):
+                rules.append(f'.c{rng.randint(0, 1 << 20):x}{{background:url({rng.choice(image_paths)})}}')
+            if font_paths:
+                rules.append(f'@font-face{{font-family:f{level};src:url("{rng.choice(font_paths)}") format("woff2")}}')
+            _write(root, path, '\n'.join(rules))
+
+    # JS：第一个为多MB主 bundle，其余为小 chunk
+    js_paths = [f'{static}chunks/chunk-{i}.js' for i in range(js)]
+    for i, path in enumerate(js_paths):
+        size = int(bundle_mb * 1024 * 1024) if i == 0 else rng.randint(8, 64) * 1024
+        _write(root, path, make_bundle(rng, all_prefixes, size))
+
+    inline = make_inline_script(rng, all_prefixes, 64 * 1024)
+    page_names = ['index.html'] + [f'page-{i}/index.html' for i in range(1, pages)]
+    for name in page_names:
+        head = [f'<link rel="stylesheet" href="{path}">' for path in css_paths]
+        head += [f'<script src="{path}" defer></script>' for path in js_paths]
+        body = [f'<img src="{path}" alt="">' for path in rng.sample(image_paths, min(len(image_paths), 50))]
+        body += [f'<a href="/page-{i}/">page {i}</a>' for i in range(1, pages)]
+        html = (f'<!DOCTYPE html><html><head><meta charset="utf-8">{"".join(head)}</head>'
+                f'<body>{"".join(body)}<script>{inline}</script></body></html>')
+        _write(root, name, html)
+
+    total_bytes = sum(os.path.getsize(os.path.join(dirpath, filename))
+                      for dirpath, _, filenames in os.walk(root) for filename in filenames)
+    return {'pages': len(page_names), 'css': css * (import_depth + 1), 'js': js,
+            'images': images, 'fonts': fonts, 'bytes': total_bytes}
+
+
+# ========== 本地服务器 ==========
+
+class LatencyHandler(SimpleHTTPRequestHandler):
+    """每个请求先等待固定延迟，模拟网络往返"""
+    latency = 0.0
+
+    def send_head(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return super().send_head()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_site(root, latency):
+    """在后台线程中启动站点服务器，返回 (server, base_url)"""
+    handler = type('Handler', (LatencyHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(handler, directory=root))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+# ========== 计时 ==========
+
+def instrument(crawler):
+    """包装各阶段方法，累计耗时；返回 {阶段: 秒}"""
+    totals = {stage: 0.0 for stage in STAGES}
+    lock = threading.Lock()
+
+    for stage, names in STAGES.items():
+        for name in names:
+            method = getattr(crawler, name)
+
+            @functools.wraps(method)
+            def timed(*args, _method=method, _stage=stage, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return _method(*args, **kwargs)
+                finally:
+                    with lock:
+                        totals[_stage] += time.perf_counter() - start
+
+            setattr(crawler, name, timed)
+    return totals
+
+
+def run_crawl(url, output_folder, options, results):
+    """在子进程中执行一次完整爬取（峰值RSS只统计本次爬取）"""
+    crawler = WebsiteCrawler(url, output_folder, **options)
+    stages = instrument(crawler)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        crawler.crawl()
+        wall = time.perf_counter() - start
+    files = len(crawler.downloaded_urls)
+    results.put({
+        'wall_seconds': round(wall, 4),
+        'stages': {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        # Linux 下 ru_maxrss 单位为 KB，macOS 为字节
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+        'files': files,
+        'unchanged': len(crawler.unchanged_files),
+        'files_per_second': round(files / wall, 1) if wall else None,
+    })
+
+
+def measure(url, output_folder, options):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_crawl, args=(url, output_folder, options, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(runs):
+    summary = {key: round(statistics.median(run[key] for run in runs), 4)
+               for key in ('wall_seconds', 'peak_rss_mb', 'files_per_second')}
+    summary['stages'] = {stage: round(statistics.median(run['stages'][stage] for run in runs), 4)
+                         for stage in STAGES}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='整站爬取基准（本地合成站点）')
+    parser.add_argument('--css', type=int, default=20, help='入口CSS数量（每个带一条 @import 链）')
+    parser.add_argument('--import-depth', type=int, default=3, help='@import 链深度')
+    parser.add_argument('--js', type=int, default=30, help='JS chunk 数量')
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--fonts', type=int, default=10)
+    parser.add_argument('--bundle-mb', type=float, default=4.0, help='主 bundle 大小（MB）')
+    parser.add_argument('--pages', type=int, default=1, help='页面数（>1 时启用多页面爬取）')
+    parser.add_argument('--prefixes', type=int, default=4, help='bundle 中出现的站点前缀数量')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='服务器每个请求的注入延迟')
+    parser.add_argument('--rewrite-mode', default='pipeline', choices=('pipeline', 'walk', 'process'))
+    parser.add_argument('--max-workers', type=int, default=8)
+    parser.add_argument('--rate-limit', type=float, default=0, help='每秒请求数，0 表示不限速')
+    parser.add_argument('--repeat', type=int, default=3, help='冷启动爬取次数（取中位数）')
+    parser.add_argument('--incremental', action='store_true', help='额外测量在已有输出上的增量重爬')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='结果 JSON 路径（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_site_')
+    site_root = os.path.join(workdir, 'site')
+    try:
+        site = generate_site(site_root, css=args.css, js=args.js, images=args.images, fonts=args.fonts,
+                             bundle_mb=args.bundle_mb, pages=args.pages, import_depth=args.import_depth,
+                             prefixes=args.prefixes, seed=args.seed)
+        server, url = serve_site(site_root, args.latency_ms / 1000)
+        options = {
+            'max_workers': args.max_workers,
+            'rate_limit': args.rate_limit or None,
+            'rewrite_mode': args.rewrite_mode,
+            'max_pages': args.pages,
+            'max_depth': 1 if args.pages > 1 else 0,
+        }
+        print(f"站点: {site['pages']} 页, CSS {site['css']}, JS {site['js']}, 图片 {site['images']}, "
+              f"字体 {site['fonts']}, 共 {site['bytes'] / 1024 / 1024:.1f}MB; 延迟 {args.latency_ms}ms")
+
+        runs = []
+        for i in range(args.repeat):
+            output_folder = os.path.join(workdir, f'out-{i}')
+            runs.append(measure(url, output_folder, options))
+            print(f"  冷启动 #{i + 1}: {runs[-1]['wall_seconds']:.2f}s, {runs[-1]['files_per_second']} 文件/秒, "
+                  f"峰值RSS {runs[-1]['peak_rss_mb']}MB")
+
+        incremental = None
+        if args.incremental:
+            incremental = measure(url, os.path.join(workdir, 'out-0'), options)
+            print(f"  增量重爬: {incremental['wall_seconds']:.2f}s（未修改 {incremental['unchanged']} 个）")
+        server.shutdown()
+
+        report = {
+            'benchmark': 'bench_site',
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': vars(args),
+            'site': site,
+            'runs': runs,
+            'summary': summarize(runs),
+            'incremental': incremental,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"结果已写入: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
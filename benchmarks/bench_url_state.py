@@ -0,0 +1,126 @@
+"""URL状态内存基准：已下载URL集合 + 路径映射在不同 url_state 后端下的每URL内存占用
+
+按 download_file 的方式登记合成的 Next.js 风格资源URL（带内容哈希的文件名、部分路径含百分号编码），
+用 tracemalloc 统计各后端在内存中保留的字节数，并测量成员检查和路径查询的耗时。
+memory 后端的数字包含URL字符串本身；compact / sqlite 后端的URL原文在 SQLite 文件中，另行列出文件大小。
+
+用法：
+    python benchmarks/bench_url_state.py [--urls 100000] [--dirs 2000] [--output results.json]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import quote, unquote, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from website_crawler import WebsiteCrawler  # noqa: E402
+
+BACKENDS = ('memory', 'compact', 'sqlite')
+
+
+def make_urls(count, dirs, seed=42):
+    """生成 count 个资源URL（分布在 dirs 个目录中，约 5% 的路径含需要编码的字符）"""
+    rng = random.Random(seed)
+    base = 'https://www.example.com/b/a/ecom-website/7f3c2d1e/_next/static/'
+    directories = [f"{base}{rng.choice(('chunks', 'css', 'media'))}/{rng.getrandbits(32):08x}/"
+                   for _ in range(dirs)]
+    for i in range(count):
+        name = f"{rng.choice(('img', 'font', 'chunk', 'page'))}-{i}.{rng.getrandbits(64):016x}"
+        if rng.random() < 0.05:
+            name = quote(f"[locale] {name}")
+        yield rng.choice(directories) + name + rng.choice(('.js', '.css', '.png', '.woff2'))
+
+
+def register(crawler, url):
+    """与 download_file 相同的登记方式"""
+    normalized_url = url.split('?')[0].split('#')[0]
+    original_path = urlparse(url).path
+    decoded_path = unquote(original_path)
+    rel_path = decoded_path.lstrip('/')
+    crawler.downloaded_urls.add(normalized_url)
+    crawler.path_mapping[original_path] = rel_path
+    if decoded_path != original_path:
+        crawler.path_mapping[decoded_path] = rel_path
+
+
+def measure(backend, args, workdir):
+    output_folder = os.path.join(workdir, backend)
+    gc.collect()
+    tracemalloc.start()
+    crawler = WebsiteCrawler('https://www.example.com/', output_folder, url_state=backend)
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for url in make_urls(args.urls, args.dirs, args.seed):
+        register(crawler, url)
+    add_seconds = time.perf_counter() - start
+    if crawler.state_db is not None:
+        crawler.state_db.flush()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    # 查询：一半为已登记的URL，一半为未登记的URL
+    probes = list(make_urls(args.probes, args.dirs, args.seed))
+    probes += [url.replace('/_next/', '/_missing/') for url in probes]
+    start = time.perf_counter()
+    hits = sum(1 for url in probes if url in crawler.downloaded_urls)
+    contains_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    mapped = sum(1 for url in probes if crawler.path_mapping.get(urlparse(url).path) is not None)
+    lookup_seconds = time.perf_counter() - start
+    assert hits == mapped == args.probes, (hits, mapped)
+
+    db_bytes = 0
+    if crawler.state_db is not None:
+        db_bytes = os.path.getsize(crawler.state_db.path)
+        crawler.state_db.close()
+    return {
+        'retained_mb': round(retained / 1024 / 1024, 2),
+        'bytes_per_url': round(retained / args.urls, 1),
+        'sqlite_mb': round(db_bytes / 1024 / 1024, 2),
+        'add_us': round(add_seconds / args.urls * 1e6, 2),
+        'contains_us': round(contains_seconds / len(probes) * 1e6, 2),
+        'lookup_us': round(lookup_seconds / len(probes) * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='URL状态后端的内存基准')
+    parser.add_argument('--urls', type=int, default=100000, help='登记的资源URL数量')
+    parser.add_argument('--dirs', type=int, default=2000, help='资源分布的目录数量')
+    parser.add_argument('--probes', type=int, default=20000, help='查询耗时测量的URL数量（另有同样数量的未命中查询）')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='结果 JSON 路径')
+    args = parser.parse_args()
+    args.probes = min(args.probes, args.urls)
+
+    workdir = tempfile.mkdtemp(prefix='bench_url_state_')
+    results = {}
+    try:
+        print(f"URL: {args.urls}, 目录: {args.dirs}")
+        for backend in args.backends:
+            results[backend] = result = measure(backend, args, workdir)
+            print(f"  {backend:8s} 内存 {result['retained_mb']:8.2f}MB（{result['bytes_per_url']:6.1f} 字节/URL）"
+                  f"  SQLite {result['sqlite_mb']:7.2f}MB  登记 {result['add_us']:.2f}us"
+                  f"  成员检查 {result['contains_us']:.2f}us  路径查询 {result['lookup_us']:.2f}us")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'bench_url_state', 'config': vars(args), 'results': results}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
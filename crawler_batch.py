@@ -0,0 +1,103 @@
+"""批量模式：在进程池中镜像多个站点，所有站点共用全局连接数和带宽上限"""
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from urllib.parse import urlparse
+
+from website_crawler import SharedTokenBucket, WebsiteCrawler
+
+
+# 工作进程内所有站点共用的 (全局连接信号量, 全局带宽令牌桶)，由 _init_batch_worker 设置
+_batch_limits = (None, None)
+
+
+def _init_batch_worker(connection_limit, bandwidth_limit):
+    """批量模式进程池初始化：保存主进程创建的跨进程连接/带宽限制"""
+    global _batch_limits
+    _batch_limits = (connection_limit, bandwidth_limit)
+
+
+def _batch_worker(job, fair_workers):
+    """在工作进程中镜像一个站点（控制台输出写入 output_folder 下的日志），返回汇总记录"""
+    url = job['url']
+    output_folder = job.get('output_folder') or urlparse(url).netloc.replace(':', '_')
+    options = dict(job.get('options') or {})
+    # 站点间公平：每个站点的下载线程数不超过全局连接数的平均份额
+    options['max_workers'] = min(int(options.get('max_workers', 8)), fair_workers)
+    options.setdefault('quiet', True)
+    connection_limit, bandwidth_limit = _batch_limits
+    if connection_limit is not None:
+        options['connection_limit'] = connection_limit
+    if bandwidth_limit is not None:
+        options['bandwidth_limit'] = bandwidth_limit
+
+    record = {'url': url, 'output_folder': output_folder}
+    start = time.perf_counter()
+    try:
+        os.makedirs(output_folder, exist_ok=True)
+        with open(os.path.join(output_folder, WebsiteCrawler.LOG_NAME), 'w', encoding='utf-8') as log, \
+                redirect_stdout(log):
+            with WebsiteCrawler(url, output_folder, **options) as crawler:
+                ok = crawler.crawl()
+                files = len(crawler.downloaded_urls)
+        totals = crawler.metrics.summary()['requests']
+        record.update(ok=bool(ok), files=files, bytes=totals['bytes'],
+                      requests=totals['count'], failures=totals['failed'])
+    except Exception as e:
+        record.update(ok=False, error=f"{type(e).__name__}: {str(e)}")
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_batch(jobs_path, results_path='batch_results.jsonl', processes=None, max_connections=64,
+              bandwidth_limit=None):
+    """批量镜像多个站点，返回各站点的汇总记录
+
+    jobs_path 为 JSONL 任务列表，每行 {"url": ..., "output_folder": ..., "options": {WebsiteCrawler 参数}}。
+    站点在进程池中并行爬取（每个进程依次处理多个站点，不必为每个站点重新启动解释器）；
+    max_connections 为所有站点同时进行的请求总数上限，每个站点的下载线程数不超过其平均份额，
+    bandwidth_limit 为所有站点合计的每秒字节数上限。每个站点完成后向 results_path 追加一行汇总
+    （文件数、字节数、请求数、失败数、耗时）
+    """
+    with open(jobs_path, 'r', encoding='utf-8') as f:
+        jobs = [json.loads(line) for line in f if line.strip()]
+    if not jobs:
+        return []
+    processes = max(1, min(processes or os.cpu_count() or 1, len(jobs)))
+    fair_workers = max(1, max_connections // processes)
+    context = multiprocessing.get_context()
+    connection_limit = context.BoundedSemaphore(max_connections)
+    bandwidth = SharedTokenBucket(bandwidth_limit, max(bandwidth_limit, 1024 * 1024), context) if bandwidth_limit else None
+
+    print(f"批量模式: {len(jobs)} 个站点，{processes} 个进程，全局连接上限 {max_connections}"
+          f"（每站点最多 {fair_workers} 个）" + (f"，带宽上限 {bandwidth_limit / 1024 / 1024:.1f}MB/s" if bandwidth_limit else ""))
+    results = []
+    start = time.perf_counter()
+    with open(results_path, 'w', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_batch_worker,
+                                initargs=(connection_limit, bandwidth)) as executor:
+        futures = {executor.submit(_batch_worker, job, fair_workers): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                # 工作进程异常退出
+                job = jobs[futures[future]]
+                record = {'url': job['url'], 'output_folder': job.get('output_folder'), 'ok': False,
+                          'error': f"{type(e).__name__}: {str(e)}"}
+            record['job'] = futures[future]
+            results.append(record)
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            if record['ok']:
+                print(f"  [OK] {record['url']}: {record['files']} 个文件，{record['bytes'] / 1024 / 1024:.2f}MB，"
+                      f"失败 {record['failures']} 个，{record['seconds']:.1f}s")
+            else:
+                print(f"  [FAIL] {record['url']}: {record.get('error', '起始页抓取失败')}")
+    failed = sum(1 for record in results if not record['ok'])
+    print(f"批量完成: 成功 {len(results) - failed} 个，失败 {failed} 个，耗时 {time.perf_counter() - start:.1f}s，"
+          f"结果已写入: {results_path}")
+    return results
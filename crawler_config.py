@@ -0,0 +1,122 @@
+"""WebsiteCrawler 的分组配置
+
+选项按用途分为网络、下载、爬取范围、存储和带宽预算几组，CrawlConfig 汇总各组和运行相关的开关。
+WebsiteCrawler 仍接受扁平的关键字参数（批量任务 JSONL 的 options 即为扁平参数），
+由 CrawlConfig.with_options 分派到所属的组
+"""
+from dataclasses import dataclass, field, fields, replace
+from typing import ClassVar
+
+
+@dataclass
+class NetworkConfig:
+    """请求并发、限速、重试与超时"""
+    # 下载线程数；单个host的初始并发上限（adaptive=True 时按 AIMD 在 1..max_workers 之间调整）
+    max_workers: int = 8
+    per_host_limit: int = 4
+    # 令牌桶限速（每秒请求数，None/0 表示不限速）与突发容量
+    rate_limit: float = 10.0
+    rate_burst: float = None
+    adaptive: bool = True
+    # 429/5xx 和连接错误的重试次数与退避基数（秒）
+    max_retries: int = 3
+    retry_backoff: float = 0.5
+    timeout: tuple = (10, 30)
+    # 每秒字节数或共用的令牌桶；多个爬虫共用的连接信号量（批量模式的全局上限）
+    bandwidth_limit: object = None
+    connection_limit: object = None
+
+
+@dataclass
+class DownloadConfig:
+    """响应体的流式写入、分段下载与内容寻址去重"""
+    chunk_size: int = 64 * 1024
+    max_in_memory: int = 1024 * 1024
+    segment_size: int = 8 * 1024 * 1024
+    segment_threshold: int = 32 * 1024 * 1024
+    max_segments: int = 4
+    # 共享的 BlobStore 仓库目录
+    blob_store: str = None
+
+
+@dataclass
+class ScopeConfig:
+    """抓取哪些页面和资源：多页面深度/页数、sitemap 种子、跨域镜像host"""
+    max_depth: int = 0
+    max_pages: int = 1
+    query_policy: str = 'drop'
+    sitemaps: object = None
+    respect_robots: bool = True
+    sitemap_since: object = None
+    mirror_hosts: tuple = None
+    mirror_host_workers: int = None
+    discover_chunks: bool = True
+
+
+@dataclass
+class StorageConfig:
+    """输出后端、路径重写方式、预压缩与URL状态后端"""
+    output: str = 'files'
+    archive_name: str = 'mirror.tar'
+    rewrite_mode: str = 'pipeline'
+    rewrite_processes: int = None
+    precompress: tuple = None
+    compress_min_size: int = 1024
+    url_state: str = 'memory'
+
+
+@dataclass
+class BudgetConfig:
+    """带宽预算：只下载选中的变体，按类型的大小上限和图片/媒体的总字节预算"""
+    select_variants: bool = False
+    target_width: int = 1280
+    target_density: float = 1.0
+    preferred_formats: tuple = None
+    max_sizes: dict = None
+    byte_budget: int = None
+
+
+@dataclass
+class CrawlConfig:
+    """WebsiteCrawler 的全部选项：各分组配置加上增量/续爬/输出/分析开关"""
+    network: NetworkConfig = field(default_factory=NetworkConfig)
+    download: DownloadConfig = field(default_factory=DownloadConfig)
+    scope: ScopeConfig = field(default_factory=ScopeConfig)
+    storage: StorageConfig = field(default_factory=StorageConfig)
+    budget: BudgetConfig = field(default_factory=BudgetConfig)
+    incremental: bool = True
+    resume: bool = False
+    # JSONL 文件路径或回调函数；quiet=True 时省略逐文件的输出；'cprofile' / 'tracemalloc'
+    metrics: object = None
+    quiet: bool = False
+    profile: str = None
+
+    GROUPS: ClassVar[tuple] = ('network', 'download', 'scope', 'storage', 'budget')
+
+    def with_options(self, **options):
+        """返回按关键字参数修改后的副本
+
+        参数可以是分组名（整组替换为给定的配置对象），也可以是某一组中的选项名（扁平参数，
+        在整组替换之后应用）；不属于任何一组的未知参数抛出 TypeError
+        """
+        config = replace(self, **{name: options.pop(name) for name in self.GROUPS if name in options})
+        changes = {name: {} for name in self.GROUPS}
+        top_level = {item.name for item in fields(self)} - set(self.GROUPS)
+        updates = {}
+        for name, value in options.items():
+            for group in self.GROUPS:
+                if name in _field_names(getattr(config, group)):
+                    changes[group][name] = value
+                    break
+            else:
+                if name not in top_level:
+                    raise TypeError(f"未知的爬虫参数: {name}")
+                updates[name] = value
+        for group, values in changes.items():
+            if values:
+                updates[group] = replace(getattr(config, group), **values)
+        return replace(config, **updates)
+
+
+def _field_names(config):
+    return {item.name for item in fields(config)}
@@ -0,0 +1,211 @@
+"""输出后端：逐文件落盘（LooseFileOutput）或追加到单个 tar 包（TarArchiveOutput）"""
+import hashlib
+import json
+import os
+import tarfile
+import threading
+import time
+
+# 新建文件的默认权限（0o666 & ~umask），首次写文件时读取
+_file_mode_value = None
+_file_mode_lock = threading.Lock()
+# 读取不到 umask 时使用的权限（即常见的 umask 0o022）
+_DEFAULT_FILE_MODE = 0o644
+
+
+def _file_mode():
+    """新建普通文件的默认权限（只读取一次 umask）
+
+    从 /proc/self/status 读取 umask，从不调用 os.umask（它会修改整个进程的设置，
+    与其他线程创建文件相互干扰）；没有 /proc 的系统使用 _DEFAULT_FILE_MODE
+    """
+    global _file_mode_value
+    with _file_mode_lock:
+        if _file_mode_value is None:
+            _file_mode_value = _DEFAULT_FILE_MODE
+            try:
+                with open('/proc/self/status', encoding='ascii', errors='replace') as f:
+                    for line in f:
+                        if line.startswith('Umask:'):
+                            _file_mode_value = 0o666 & ~int(line.split()[1], 8)
+                            break
+            except (OSError, ValueError):
+                pass
+        return _file_mode_value
+
+
+class LooseFileOutput:
+    """默认输出后端：每个资源一个文件，目录结构与站点路径一致
+
+    所有方法接收 output_folder 下的本地路径（与 get_local_path 返回值一致）
+    """
+
+    archive_path = None
+
+    def __init__(self, root):
+        self.root = root
+
+    def open(self):
+        os.makedirs(self.root, exist_ok=True)
+
+    def close(self):
+        pass
+
+    def prepare(self, local_path):
+        """写入前创建目录结构"""
+        directory = os.path.dirname(local_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+    def temp_dir(self, local_path):
+        """写入 local_path 用的临时文件所在目录（与目标同目录才能原子重命名）"""
+        return os.path.dirname(local_path) or '.'
+
+    def staging_path(self, local_path, suffix):
+        """分段下载等中间文件的路径"""
+        return local_path + suffix
+
+    def commit(self, tmp_path, local_path):
+        """把写好的临时文件放到 local_path"""
+        os.replace(tmp_path, local_path)
+
+    def exists(self, local_path):
+        return os.path.isfile(local_path)
+
+    def getsize(self, local_path):
+        return os.path.getsize(local_path)
+
+    def read(self, local_path):
+        with open(local_path, 'rb') as f:
+            return f.read()
+
+    def iter_files(self):
+        """按 os.walk 顺序列出输出目录中的文件（跳过未完成的 .part 文件）"""
+        for root, dirs, files in os.walk(self.root):
+            for filename in files:
+                if not filename.endswith('.part'):
+                    yield os.path.join(root, filename)
+
+
+class TarArchiveOutput(LooseFileOutput):
+    """归档输出后端：所有资源依次追加到 output_folder 下的一个 tar 包，并维护 路径 -> (数据偏移, 大小) 索引
+
+    同一路径再次写入（路径重写、增量更新）时在包尾追加新记录，索引指向最新的一条，
+    解包时后出现的记录同样会覆盖前面的。写入只在包尾顺序进行；索引在 close 时保存为
+    <archive>.index.json，读取方按偏移 seek 后直接读出数据。发布镜像只需复制 tar 包
+    """
+
+    INDEX_SUFFIX = '.index.json'
+
+    def __init__(self, root, archive_name='mirror.tar'):
+        super().__init__(root)
+        self.archive_path = os.path.join(root, archive_name)
+        self.staging = os.path.join(root, '.staging')
+        self.index = {}
+        self.lock = threading.Lock()
+        self._tar = None
+        self._reader = None
+
+    @classmethod
+    def load_index(cls, archive_path):
+        """读取归档索引：索引文件不比归档旧时直接使用，否则扫描 tar 头重建"""
+        index_path = archive_path + cls.INDEX_SUFFIX
+        if os.path.isfile(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(archive_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                return {rel: tuple(item) for rel, item in json.load(f)['entries'].items()}
+        return cls._scan(archive_path)[0]
+
+    @staticmethod
+    def _scan(archive_path):
+        """扫描 tar 头重建索引，返回 (索引, 最后一个完整成员的结束偏移)；进程被杀死时留下的半截记录被忽略"""
+        index = {}
+        end = 0
+        size = os.path.getsize(archive_path)
+        try:
+            with tarfile.open(archive_path, 'r') as tar:
+                for member in tar:
+                    member_end = member.offset_data + -(-member.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                    if member_end > size:
+                        break
+                    if member.isfile():
+                        index[member.name] = (member.offset_data, member.size)
+                    end = member_end
+        except tarfile.ReadError:
+            pass
+        return index, end
+
+    def open(self):
+        os.makedirs(self.staging, exist_ok=True)
+        end = 0
+        if os.path.isfile(self.archive_path):
+            # 中断的运行可能没有写入包尾和索引文件：截掉半截记录，补上包尾后继续追加
+            self.index, end = self._scan(self.archive_path)
+            with open(self.archive_path, 'r+b') as f:
+                f.truncate(end)
+                f.seek(end)
+                f.write(b'\0' * tarfile.BLOCKSIZE * 2)
+        self._tar = tarfile.open(self.archive_path, 'a' if end else 'w', format=tarfile.PAX_FORMAT)
+        self._reader = open(self.archive_path, 'rb')
+
+    def close(self):
+        with self.lock:
+            if self._tar is None:
+                return
+            self._tar.close()
+            self._tar = None
+            self._reader.close()
+            self._reader = None
+            payload = json.dumps({'archive': os.path.basename(self.archive_path),
+                                  'entries': {rel: list(item) for rel, item in self.index.items()}},
+                                 ensure_ascii=False)
+            tmp_path = self.archive_path + self.INDEX_SUFFIX + '.part'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.archive_path + self.INDEX_SUFFIX)
+        try:
+            os.rmdir(self.staging)
+        except OSError:
+            # 还有未完成的分段下载，保留以便续传
+            pass
+
+    def _rel(self, local_path):
+        return os.path.relpath(local_path, self.root).replace('\\', '/')
+
+    def prepare(self, local_path):
+        pass
+
+    def temp_dir(self, local_path):
+        return self.staging
+
+    def staging_path(self, local_path, suffix):
+        name = hashlib.sha1(self._rel(local_path).encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.staging, name + suffix)
+
+    def commit(self, tmp_path, local_path):
+        rel = self._rel(local_path)
+        info = tarfile.TarInfo(rel)
+        info.size = os.path.getsize(tmp_path)
+        info.mtime = int(time.time())
+        info.mode = _file_mode()
+        with open(tmp_path, 'rb') as f, self.lock:
+            self._tar.addfile(info, f)
+            # 数据按 512 字节块对齐，紧接在成员头之后
+            padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            self.index[rel] = (self._tar.offset - padded, info.size)
+        os.remove(tmp_path)
+
+    def exists(self, local_path):
+        return self._rel(local_path) in self.index
+
+    def getsize(self, local_path):
+        return self.index[self._rel(local_path)][1]
+
+    def read(self, local_path):
+        offset, size = self.index[self._rel(local_path)]
+        with self.lock:
+            self._tar.fileobj.flush()
+            self._reader.seek(offset)
+            return self._reader.read(size)
+
+    def iter_files(self):
+        return [os.path.join(self.root, rel) for rel in list(self.index)]
@@ -0,0 +1,263 @@
+"""镜像浏览服务器：在本地浏览/验证 WebsiteCrawler 生成的镜像（目录或 tar 归档）"""
+import asyncio
+import json
+import mimetypes
+import os
+import re
+from collections import OrderedDict
+from email.utils import formatdate
+from urllib.parse import unquote, urlparse
+
+from crawler_output import LooseFileOutput, TarArchiveOutput
+from website_crawler import WebsiteCrawler
+
+
+class MirrorServer:
+    """用于本地浏览/验证镜像的静态文件服务器（asyncio，HTTP/1.1 keep-alive）
+
+    - 大文件用 loop.sendfile（底层为 os.sendfile）零拷贝发送，小文件缓存在内存 LRU 中
+    - 支持单区间 Range 请求、ETag / If-None-Match
+    - 客户端接受压缩且存在 .br / .gz 同名文件时直接发送压缩版本
+    - 支持 output='tar' 生成的归档：按索引偏移从归档中 sendfile
+    - 根据增量清单重建 path_mapping，重写遗漏的绝对路径仍能找到文件；
+      再找不到时按路径后缀匹配（如相对路径被解析到子页面目录下），仍失败才立即返回 404
+    """
+
+    SIBLINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, output_folder, host='127.0.0.1', port=8000, cache_bytes=64 * 1024 * 1024,
+                 cache_file_limit=256 * 1024, archive_name='mirror.tar', verbose=False):
+        self.root = os.path.abspath(output_folder)
+        self.host = host
+        self.port = port
+        self.cache_bytes = cache_bytes
+        self.cache_file_limit = cache_file_limit
+        self.verbose = verbose
+        # 内存缓存：(来源, 编码) -> (版本, 内容)，按最近使用排序
+        self.cache = OrderedDict()
+        self.cache_used = 0
+
+        archive_path = os.path.join(self.root, archive_name)
+        if os.path.isfile(archive_path):
+            self.archive_index = TarArchiveOutput.load_index(archive_path)
+            self.archive_file = open(archive_path, 'rb')
+            self.archive_mtime = os.path.getmtime(archive_path)
+            self.files = set(self.archive_index)
+        else:
+            self.archive_index = None
+            self.archive_file = None
+            self.files = {os.path.relpath(filepath, self.root).replace('\\', '/')
+                          for filepath in LooseFileOutput(self.root).iter_files()}
+        self.path_mapping = self._load_path_mapping()
+
+    def _load_path_mapping(self):
+        """从增量清单重建 原始URL路径 -> 本地相对路径 的映射"""
+        mapping = {}
+        manifest_path = os.path.join(self.root, WebsiteCrawler.MANIFEST_NAME)
+        if not os.path.isfile(manifest_path):
+            return mapping
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f).get('entries', {})
+        for entry in entries.values():
+            if entry['path'].startswith(WebsiteCrawler.MIRROR_HOSTS_DIR + '/'):
+                # 跨域镜像资源的引用已重写为 _hosts/ 下的路径，不参与原始路径映射
+                continue
+            original_path = urlparse(entry['url']).path
+            mapping[original_path] = entry['path']
+            mapping[unquote(original_path)] = entry['path']
+        return mapping
+
+    def resolve(self, path):
+        """把请求路径解析为镜像中的相对路径，找不到时返回 None"""
+        rel = os.path.normpath(unquote(path)).replace('\\', '/').lstrip('/')
+        if rel.startswith('..'):
+            return None
+        if rel == '.':
+            rel = ''
+        for candidate in (rel, (rel + '/' if rel else '') + 'index.html'):
+            if candidate in self.files:
+                return candidate
+        mapped = self.path_mapping.get(path) or self.path_mapping.get(unquote(path))
+        if mapped in self.files:
+            return mapped
+        # 相对路径被浏览器按错误的目录解析时，去掉前面的目录逐级重试
+        parts = rel.split('/')
+        for i in range(1, len(parts)):
+            candidate = '/'.join(parts[i:])
+            if candidate in self.files:
+                return candidate
+        return None
+
+    def _stat(self, rel, encoding=None):
+        """返回 (大小, 修改时间, 来源)；来源为本地文件路径，或归档中的数据偏移"""
+        if self.archive_index is not None:
+            offset, size = self.archive_index[rel]
+            return size, self.archive_mtime, offset
+        filepath = os.path.join(self.root, rel)
+        if encoding:
+            filepath += dict(self.SIBLINGS)[encoding]
+        st = os.stat(filepath)
+        return st.st_size, st.st_mtime, filepath
+
+    def _read(self, source, size, version, encoding):
+        """读取小文件内容（经过 LRU 缓存）"""
+        key = (source, encoding)
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == version:
+            self.cache.move_to_end(key)
+            return cached[1]
+        if isinstance(source, int):
+            self.archive_file.seek(source)
+            data = self.archive_file.read(size)
+        else:
+            with open(source, 'rb') as f:
+                data = f.read()
+        if cached is not None:
+            self.cache_used -= len(cached[1])
+        self.cache[key] = (version, data)
+        self.cache_used += len(data)
+        while self.cache_used > self.cache_bytes and self.cache:
+            _, (_, evicted) = self.cache.popitem(last=False)
+            self.cache_used -= len(evicted)
+        return data
+
+    @staticmethod
+    def _parse_range(value, size):
+        """解析单区间 Range，返回 (起始, 结束)；无法满足时返回 None，多区间等不支持的写法返回 False（按完整响应处理）"""
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', value.strip())
+        if not match or match.group(1) == match.group(2) == '':
+            return False
+        if match.group(1) == '':
+            length = int(match.group(2))
+            return (max(0, size - length), size - 1) if length else None
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        return (start, end) if start <= end else None
+
+    async def _send(self, writer, status, reason, headers, body=b''):
+        lines = [f'HTTP/1.1 {status} {reason}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _respond(self, writer, method, target, headers, keep_alive):
+        connection = 'keep-alive' if keep_alive else 'close'
+        if method not in ('GET', 'HEAD'):
+            await self._send(writer, 405, 'Method Not Allowed',
+                             {'Allow': 'GET, HEAD', 'Content-Length': 0, 'Connection': connection})
+            return 405
+        path = urlparse(target).path or '/'
+        rel = self.resolve(path)
+        if rel is None:
+            body = b'Not Found'
+            await self._send(writer, 404, 'Not Found', {'Content-Type': 'text/plain; charset=utf-8',
+                                                         'Content-Length': len(body), 'Connection': connection},
+                             body if method == 'GET' else b'')
+            return 404
+
+        # 选择压缩版本（Range 请求总是针对原始内容）
+        encoding = None
+        vary = False
+        if self.archive_index is None:
+            accepted = headers.get('accept-encoding', '')
+            for name, suffix in self.SIBLINGS:
+                if os.path.isfile(os.path.join(self.root, rel + suffix)):
+                    vary = True
+                    if encoding is None and name in accepted and 'range' not in headers:
+                        encoding = name
+        size, mtime, source = self._stat(rel, encoding)
+        version = f'"{int(mtime * 1000):x}-{size:x}{"-" + encoding if encoding else ""}"'
+        response_headers = {
+            'Content-Type': mimetypes.guess_type(rel)[0] or 'application/octet-stream',
+            'Last-Modified': formatdate(mtime, usegmt=True),
+            'ETag': version,
+            'Accept-Ranges': 'bytes',
+            'Connection': connection,
+        }
+        if encoding:
+            response_headers['Content-Encoding'] = encoding
+        if vary:
+            response_headers['Vary'] = 'Accept-Encoding'
+        if headers.get('if-none-match') == version:
+            await self._send(writer, 304, 'Not Modified', response_headers)
+            return 304
+
+        status, reason = 200, 'OK'
+        start, end = 0, size - 1
+        if 'range' in headers and size:
+            byte_range = self._parse_range(headers['range'], size)
+            if byte_range is None:
+                response_headers['Content-Range'] = f'bytes */{size}'
+                response_headers['Content-Length'] = 0
+                await self._send(writer, 416, 'Range Not Satisfiable', response_headers)
+                return 416
+            if byte_range:
+                start, end = byte_range
+                status, reason = 206, 'Partial Content'
+                response_headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        length = max(0, end - start + 1)
+        response_headers['Content-Length'] = length
+
+        if method == 'HEAD' or not length:
+            await self._send(writer, status, reason, response_headers)
+        elif size <= self.cache_file_limit:
+            data = self._read(source, size, version, encoding)
+            await self._send(writer, status, reason, response_headers, data[start:end + 1])
+        else:
+            await self._send(writer, status, reason, response_headers)
+            if isinstance(source, int):
+                await asyncio.get_running_loop().sendfile(writer.transport, self.archive_file,
+                                                          source + start, length)
+            else:
+                with open(source, 'rb') as f:
+                    await asyncio.get_running_loop().sendfile(writer.transport, f, start, length)
+        return status
+
+    async def _handle(self, reader, writer):
+        """处理一个连接上的所有请求"""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=30)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                        ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                request_line = lines[0].split(' ')
+                if len(request_line) != 3:
+                    await self._send(writer, 400, 'Bad Request', {'Content-Length': 0, 'Connection': 'close'})
+                    break
+                method, target, version = request_line
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+                status = await self._respond(writer, method, target, headers, keep_alive)
+                if self.verbose:
+                    print(f"  {status} {method} {target}")
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        mode = '归档' if self.archive_index is not None else '目录'
+        print(f"镜像服务器已启动: http://{self.host}:{self.port}/ （{mode}: {self.root}，"
+              f"{len(self.files)} 个文件，路径映射 {len(self.path_mapping)} 条）")
+        async with server:
+            await server.serve_forever()
+
+
+def serve(output_folder, host='127.0.0.1', port=8000, **options):
+    """启动镜像浏览服务器，阻塞直到 Ctrl+C"""
+    server = MirrorServer(output_folder, host, port, **options)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\n服务器已停止")
@@ -0,0 +1,203 @@
+"""URL状态后端：url_state='compact' / 'sqlite' 时代替内存中的 set/dict 保存已下载URL和路径映射"""
+import hashlib
+import os
+import sqlite3
+import threading
+from urllib.parse import quote, unquote
+
+
+class CrawlStateDB:
+    """紧凑URL状态的 SQLite 存储：URL原文（哈希命中时精确比较）和溢出到磁盘的路径映射
+
+    连接在多个下载线程间共享（加锁）；写入按批提交，同一连接可以读到尚未提交的数据。
+    只是本次运行的缓存（断点续爬和增量爬取仍依赖日志和清单），打开时重建、WebsiteCrawler.close() 时删除
+    """
+    BATCH = 10000
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = 0
+        if readonly:
+            # 进程池重写时，子进程以只读方式打开主进程的文件
+            self.conn = sqlite3.connect(f'file:{quote(os.path.abspath(path))}?mode=ro', uri=True,
+                                        check_same_thread=False)
+            return
+        if os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        self.conn.execute('CREATE TABLE urls (hash INTEGER NOT NULL, url TEXT NOT NULL)')
+        self.conn.execute('CREATE INDEX urls_hash ON urls (hash)')
+        self.conn.execute('CREATE TABLE paths (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID')
+
+    def write(self, sql, params):
+        with self.lock:
+            if not self.pending:
+                self.conn.execute('BEGIN')
+            self.conn.execute(sql, params)
+            self.pending += 1
+            if self.pending >= self.BATCH:
+                self.conn.execute('COMMIT')
+                self.pending = 0
+
+    def read(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def flush(self):
+        """提交未提交的写入（其他进程打开前调用）"""
+        with self.lock:
+            if self.pending:
+                self.conn.execute('COMMIT')
+                self.pending = 0
+
+    def close(self, remove=True):
+        self.flush()
+        self.conn.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class CompactUrlSet:
+    """已下载URL集合的紧凑实现：内存中只保存 64 位哈希（占用与URL长度无关），
+    URL原文保存在 CrawlStateDB 中，哈希命中时按原文确认，哈希冲突时结果仍然精确
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.hashes = set()
+        self.count = 0
+
+    @staticmethod
+    def url_hash(url):
+        # SQLite INTEGER 为有符号 64 位
+        return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+    def _stored(self, key, url):
+        return bool(self.db.read('SELECT 1 FROM urls WHERE hash = ? AND url = ? LIMIT 1', (key, url)))
+
+    def __contains__(self, url):
+        key = self.url_hash(url)
+        return key in self.hashes and self._stored(key, url)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, url):
+        key = self.url_hash(url)
+        if key in self.hashes:
+            if self._stored(key, url):
+                return
+        else:
+            self.hashes.add(key)
+        self.db.write('INSERT INTO urls (hash, url) VALUES (?, ?)', (key, url))
+        self.count += 1
+
+
+class CompactPathMapping:
+    """路径映射（原始URL路径 -> 本地相对路径）的紧凑实现
+
+    每个资源只保存解码后的路径一份（按原始路径查询时先解码）；键中的目录部分替换为目录表中的编号，
+    同一目录只保存一次；本地路径等于键去掉开头的 / 时（绝大多数资源）不保存值
+    """
+
+    def __init__(self):
+        self.entries = {}
+        # 目录 -> 编号 / 编号 -> 目录
+        self.dir_ids = {}
+        self.dirs = []
+
+    def _pack(self, key):
+        directory, _, name = key.rpartition('/')
+        dir_id = self.dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = self.dir_ids[directory] = len(self.dirs)
+            self.dirs.append(directory)
+        # 文件名中不含 /，编号与文件名以 / 分隔
+        return f'{dir_id:x}/{name}'
+
+    def _unpack(self, packed):
+        dir_id, _, name = packed.partition('/')
+        return f'{self.dirs[int(dir_id, 16)]}/{name}'
+
+    def _load(self, key):
+        directory, _, name = key.rpartition('/')
+        dir_id = self.dir_ids.get(directory)
+        if dir_id is None:
+            return False, None
+        packed = f'{dir_id:x}/{name}'
+        if packed not in self.entries:
+            return False, None
+        return True, self.entries[packed]
+
+    def _store(self, key, value):
+        self.entries[self._pack(key)] = value
+
+    def _find(self, key):
+        """按原样、再按解码后的路径查找，返回 (键, 保存的值)；不存在时键为 None"""
+        found, value = self._load(key)
+        if found:
+            return key, value
+        decoded = unquote(key)
+        if decoded != key:
+            found, value = self._load(decoded)
+            if found:
+                return decoded, value
+        return None, None
+
+    def __setitem__(self, key, value):
+        key = unquote(key)
+        self._store(key, None if value == key.lstrip('/') else value)
+
+    def get(self, key, default=None):
+        stored_key, value = self._find(key)
+        if stored_key is None:
+            return default
+        return stored_key.lstrip('/') if value is None else value
+
+    def __getitem__(self, key):
+        stored_key, value = self._find(key)
+        if stored_key is None:
+            raise KeyError(key)
+        return stored_key.lstrip('/') if value is None else value
+
+    def __contains__(self, key):
+        return self._find(key)[0] is not None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def items(self):
+        for packed, value in self.entries.items():
+            key = self._unpack(packed)
+            yield key, key.lstrip('/') if value is None else value
+
+
+class SqlitePathMapping(CompactPathMapping):
+    """溢出到 CrawlStateDB 的路径映射：内存中不保存任何条目，可传给重写子进程（只读打开同一文件）"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def _load(self, key):
+        rows = self.db.read('SELECT value FROM paths WHERE key = ?', (key,))
+        return (True, rows[0][0]) if rows else (False, None)
+
+    def _store(self, key, value):
+        self.db.write('INSERT OR REPLACE INTO paths (key, value) VALUES (?, ?)', (key, value))
+
+    def __len__(self):
+        return self.db.read('SELECT COUNT(*) FROM paths')[0][0]
+
+    def items(self):
+        for key, value in self.db.read('SELECT key, value FROM paths'):
+            yield key, key.lstrip('/') if value is None else value
+
+    def __getstate__(self):
+        self.db.flush()
+        return {'path': self.db.path}
+
+    def __setstate__(self, state):
+        self.db = CrawlStateDB(state['path'], readonly=True)
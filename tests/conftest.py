@@ -0,0 +1,70 @@
+"""测试用的本地站点：把 {路径: 内容} 写入临时目录，用 http.server 在随机端口上提供"""
+import functools
+import os
+import sys
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from website_crawler import WebsiteCrawler  # noqa: E402
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def write_site(root, files):
+    """写入（或覆盖）站点文件，files 为 {相对路径: str 或 bytes}"""
+    for rel_path, data in files.items():
+        path = os.path.join(root, rel_path.lstrip('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data.encode('utf-8') if isinstance(data, str) else data)
+
+
+@pytest.fixture
+def site(tmp_path):
+    """serve(files) 启动站点服务器并返回根URL；站点目录为 serve.root，可在测试中修改
+
+    handler 可替换为 QuietHandler 的子类，用于模拟延迟、限流等服务器行为
+    """
+    servers = []
+    root = str(tmp_path / 'site')
+
+    def serve(files, handler=QuietHandler):
+        write_site(root, files)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(handler, directory=root))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}/'
+
+    serve.root = root
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_crawler(url, output_folder, **options):
+    """测试用的爬虫：不限速、省略逐文件输出"""
+    options.setdefault('rate_limit', None)
+    options.setdefault('quiet', True)
+    return WebsiteCrawler(url, str(output_folder), **options)
+
+
+def read_tree(folder):
+    """输出目录中的所有文件 {相对路径: bytes}（不含清单等状态文件）"""
+    tree = {}
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            if filename.startswith('.crawl_'):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                tree[os.path.relpath(path, folder).replace('\\', '/')] = f.read()
+    return tree
@@ -0,0 +1,85 @@
+"""自适应并发：AIMD 调整单host并发上限，429/503 按 Retry-After 或指数退避重试"""
+import threading
+import time
+from collections import Counter
+
+from conftest import QuietHandler, make_crawler, read_tree
+from website_crawler import AdaptiveLimiter
+
+SITE = {
+    'index.html': '<html><body><img src="/img/a.png"><img src="/img/b.png"><img src="/img/c.png">'
+                  '<img src="/img/down.png"></body></html>',
+    'img/a.png': b'a' * 32,
+    'img/b.png': b'b' * 32,
+    'img/c.png': b'c' * 32,
+    'img/down.png': b'd' * 32,
+}
+
+
+class FlakyHandler(QuietHandler):
+    """/img/a.png 第一次返回 429（Retry-After: 0），/img/b.png 前两次返回 503，/img/down.png 始终返回 503"""
+    lock = threading.Lock()
+    hits = Counter()
+
+    def do_GET(self):
+        with FlakyHandler.lock:
+            FlakyHandler.hits[self.path] += 1
+            hit = FlakyHandler.hits[self.path]
+        if (self.path == '/img/a.png' and hit == 1) or (self.path == '/img/b.png' and hit <= 2):
+            self.send_response(429 if self.path == '/img/a.png' else 503)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path == '/img/down.png':
+            self.send_error(503)
+        else:
+            super().do_GET()
+
+
+def test_limiter_aimd():
+    limiter = AdaptiveLimiter(4, 8)
+    limiter.acquire()
+    assert limiter.release(latency=0.01, throttled=True) == 2
+    # 同一个基线周期内只减半一次
+    limiter.acquire()
+    assert limiter.release(latency=0.01, throttled=True) == 2
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(latency=0.01)
+    assert limiter.limit > 3
+    # 延迟超过基线 latency_factor 倍视为拥塞
+    time.sleep(0.05)
+    limiter.acquire()
+    assert limiter.release(latency=1.0) == int(limiter.limit) < 3
+
+
+def test_limiter_fixed():
+    limiter = AdaptiveLimiter(3, 8, adaptive=False)
+    limiter.acquire()
+    assert limiter.release(latency=0.01, throttled=True) == 3
+
+
+def test_limiter_retry_after_blocks():
+    limiter = AdaptiveLimiter(2, 2)
+    limiter.acquire()
+    limiter.release(throttled=True, retry_after=0.2)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.15
+
+
+def test_retries_throttled_requests(site, tmp_path, capsys):
+    FlakyHandler.hits = Counter()
+    base = site(SITE, handler=FlakyHandler)
+    crawler = make_crawler(base, tmp_path / 'out', max_retries=2, retry_backoff=0.01)
+    crawler.crawl()
+    tree = read_tree(tmp_path / 'out')
+    assert tree['img/a.png'] == SITE['img/a.png'] and tree['img/b.png'] == SITE['img/b.png']
+    assert FlakyHandler.hits['/img/a.png'] == 2 and FlakyHandler.hits['/img/b.png'] == 3
+    # 重试用尽后放弃
+    assert FlakyHandler.hits['/img/down.png'] == 3
+    assert 'img/down.png' not in tree
+    # quiet 模式下不输出逐次重试；连接池大小固定，并发只由 AdaptiveLimiter 控制
+    assert '[RETRY]' not in capsys.readouterr().out
+    pool = crawler.session.get_adapter(base).poolmanager.connection_from_url(base)
+    assert pool.pool.maxsize == crawler.max_workers
@@ -0,0 +1,30 @@
+"""整站基准的冒烟测试：合成站点可以完整爬取，计时包装的阶段方法都存在"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import bench_site  # noqa: E402
+from website_crawler import WebsiteCrawler  # noqa: E402
+
+
+def test_generated_site_crawls(tmp_path):
+    stats = bench_site.generate_site(str(tmp_path / 'site'), css=2, js=3, images=10, fonts=2, bundle_mb=0.05,
+                                     import_depth=2)
+    assert stats['css'] == 6 and stats['pages'] == 1
+    server, url = bench_site.serve_site(str(tmp_path / 'site'), 0)
+    try:
+        result = bench_site.measure(url, str(tmp_path / 'out'), {'rate_limit': None})
+    finally:
+        server.shutdown()
+        server.server_close()
+    # 入口和 @import 链上的全部 CSS、全部 JS，以及被引用到的图片和字体
+    assert result['files'] >= stats['css'] + stats['js'] + 10
+    assert set(result['stages']) == set(bench_site.STAGES)
+    assert os.path.isfile(tmp_path / 'out' / 'index.html')
+
+
+def test_instrumented_methods_exist():
+    crawler = WebsiteCrawler('http://127.0.0.1/', 'unused')
+    totals = bench_site.instrument(crawler)
+    assert set(totals) == set(bench_site.STAGES)
@@ -0,0 +1,53 @@
+"""内容寻址去重：多个镜像共用一个仓库时相同内容只保存一份（硬链接），替换文件不影响其他镜像"""
+import os
+
+from conftest import make_crawler, read_tree, write_site
+from website_crawler import BlobStore
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/css/site.css"></head>'
+                  '<body><img src="/img/a.png"><img src="/img/copy-of-a.png"><img src="/img/b.png"></body></html>',
+    'css/site.css': '.a{background:url(/img/a.png)}',
+    'img/a.png': b'a' * 256,
+    'img/copy-of-a.png': b'a' * 256,
+    'img/b.png': b'b' * 256,
+}
+
+
+def test_mirrors_share_blobs(site, tmp_path):
+    base = site(SITE)
+    store = str(tmp_path / 'blobs')
+    make_crawler(base, tmp_path / 'one', blob_store=store).crawl()
+    two = make_crawler(base, tmp_path / 'two', blob_store=store)
+    two.crawl()
+    assert read_tree(tmp_path / 'one') == read_tree(tmp_path / 'two')
+
+    def inode(folder, rel_path):
+        return os.stat(tmp_path / folder / rel_path).st_ino
+
+    # 同一镜像中内容相同的文件、两个镜像中的同一资源都指向同一个仓库文件
+    assert inode('one', 'img/a.png') == inode('one', 'img/copy-of-a.png') == inode('two', 'img/a.png')
+    assert inode('one', 'css/site.css') == inode('two', 'css/site.css')
+    assert os.stat(tmp_path / 'one' / 'img/a.png').st_nlink == 5
+    assert two.blob_store.stats['hits'] >= 4
+
+    # 资源更新后只替换本镜像中的文件，仓库和另一个镜像中的旧内容不变
+    write_site(site.root, {'img/b.png': b'B' * 256})
+    later = os.path.getmtime(os.path.join(site.root, 'img/b.png')) + 10
+    os.utime(os.path.join(site.root, 'img/b.png'), (later, later))
+    make_crawler(base, tmp_path / 'two', blob_store=store).crawl()
+    assert (tmp_path / 'two' / 'img/b.png').read_bytes() == b'B' * 256
+    assert (tmp_path / 'one' / 'img/b.png').read_bytes() == b'b' * 256
+
+
+def test_adopt_and_link(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'))
+    assert not store.link('0' * 64, str(tmp_path / 'missing'))
+    tmp_file = tmp_path / 'x.part'
+    tmp_file.write_bytes(b'x')
+    store.adopt(str(tmp_file), 'ab' + '0' * 62, str(tmp_path / 'x'))
+    assert not tmp_file.exists()
+    assert os.path.isfile(store.blob_path('ab' + '0' * 62))
+    assert store.link('ab' + '0' * 62, str(tmp_path / 'y'))
+    assert (tmp_path / 'y').read_bytes() == b'x'
+    assert store.stats == {'files': 2, 'hits': 1, 'new_blobs': 1, 'bytes_saved': 1, 'fallbacks': 0}
@@ -0,0 +1,75 @@
+"""带宽预算：只下载选中的变体并把其他候选重写为保留的文件，超过大小上限或总预算的文件不下载"""
+import threading
+
+from conftest import QuietHandler, make_crawler, read_tree
+
+SITE = {
+    'index.html': '<html><body>'
+                  '<img src="/img/hero-400.jpg" srcset="/img/hero-400.jpg 400w, /img/hero-1400.jpg 1400w, '
+                  '/img/hero-2400.jpg 2400w">'
+                  '<picture><source type="image/avif" srcset="/img/pic.avif">'
+                  '<source type="image/webp" srcset="/img/pic.webp"><img src="/img/pic.jpg"></picture>'
+                  '<video><source src="/media/clip.webm" type="video/webm">'
+                  '<source src="/media/clip.mp4" type="video/mp4"></video>'
+                  '</body></html>',
+    'img/hero-400.jpg': b'4' * 400,
+    'img/hero-1400.jpg': b'1' * 1400,
+    'img/hero-2400.jpg': b'2' * 2400,
+    'img/pic.avif': b'a' * 300,
+    'img/pic.webp': b'w' * 300,
+    'img/pic.jpg': b'j' * 300,
+    'media/clip.webm': b'm' * 5000,
+    'media/clip.mp4': b'p' * 5000,
+}
+
+
+class RecordingHandler(QuietHandler):
+    """记录收到的请求路径"""
+    lock = threading.Lock()
+    paths = []
+
+    def do_GET(self):
+        with RecordingHandler.lock:
+            RecordingHandler.paths.append(self.path)
+        super().do_GET()
+
+
+def test_select_variants(site, tmp_path):
+    base = site(SITE, handler=RecordingHandler)
+    RecordingHandler.paths = []
+    crawler = make_crawler(base, tmp_path / 'out', select_variants=True)
+    crawler.crawl()
+
+    tree = read_tree(tmp_path / 'out')
+    assert sorted(rel for rel in tree if rel != 'index.html') == [
+        'img/hero-1400.jpg', 'img/pic.webp', 'media/clip.mp4']
+    assert set(RecordingHandler.paths) == {'/', '/img/hero-1400.jpg', '/img/pic.webp', '/media/clip.mp4'}
+    # 被跳过的候选都指向保留的文件，HTML中不再有指向未下载文件的引用
+    html = tree['index.html'].decode('utf-8')
+    for skipped in ('hero-400.jpg', 'hero-2400.jpg', 'pic.avif', 'pic.jpg', 'clip.webm'):
+        assert skipped not in html
+    assert 'img/hero-1400.jpg 1400w' in html
+
+
+def test_all_variants_by_default(site, tmp_path):
+    base = site(SITE)
+    make_crawler(base, tmp_path / 'out').crawl()
+    assert len(read_tree(tmp_path / 'out')) == len(SITE)
+
+
+def test_size_caps_and_budget(site, tmp_path):
+    base = site(SITE, handler=RecordingHandler)
+    crawler = make_crawler(base, tmp_path / 'caps', max_sizes={'image': 1000}, byte_budget=None)
+    crawler.crawl()
+    tree = read_tree(tmp_path / 'caps')
+    assert 'img/hero-1400.jpg' not in tree and 'img/hero-2400.jpg' not in tree
+    assert 'img/hero-400.jpg' in tree and 'media/clip.mp4' in tree
+    assert crawler.budget_stats['oversize'] == 2
+
+    # 图片和媒体合计的预算：两个视频只能下载一个
+    crawler = make_crawler(base, tmp_path / 'budget', byte_budget=8000, max_workers=1)
+    crawler.crawl()
+    tree = read_tree(tmp_path / 'budget')
+    assert sum(len(data) for rel, data in tree.items() if rel != 'index.html') <= 8000
+    assert crawler.budget_stats['over_budget'] >= 1
+    assert crawler.budget_stats['used'] <= 8000
@@ -0,0 +1,57 @@
+"""跨域镜像：mirror_hosts 中的host保存到 _hosts/<host>/ 下，HTML/CSS/JS 中的引用改写为本地副本
+
+测试用同一个站点目录起两个服务器，127.0.0.1 作为源站、localhost 作为 CDN
+"""
+from conftest import make_crawler, read_tree, write_site
+
+
+def cdn_site(site):
+    origin = site({})
+    cdn = site({}).replace('127.0.0.1', 'localhost')
+    files = {
+        'index.html': f'<html><head><link rel="stylesheet" href="{cdn}lib/site.css">'
+                      f'<script src="{cdn}lib/app.js"></script></head>'
+                      f'<body><a href="https://other.invalid/page">other</a><img src="{cdn}img/b.png" srcset="{cdn}img/a.png 1x, /img/local.png 2x">'
+                      f'<script>var u="{cdn.replace("/", chr(92) + "/")}img/b.png";</script></body></html>',
+        'lib/site.css': '.hero{background:url(/img/bg.png)}',
+        'lib/app.js': f'var logo="{cdn}img/b.png";',
+        'img/a.png': b'a' * 64,
+        'img/b.png': b'b' * 64,
+        'img/bg.png': b'g' * 64,
+        'img/local.png': b'l' * 64,
+    }
+    write_site(site.root, files)
+    return origin, cdn
+
+
+def test_cdn_assets_mirrored(site, tmp_path):
+    origin, cdn = cdn_site(site)
+    host_dir = '_hosts/' + cdn.split('//')[1].rstrip('/').replace(':', '_')
+    crawler = make_crawler(origin, tmp_path / 'out', mirror_hosts=['localhost'])
+    crawler.crawl()
+    tree = read_tree(tmp_path / 'out')
+
+    for rel in ('lib/site.css', 'lib/app.js', 'img/a.png', 'img/b.png', 'img/bg.png'):
+        assert f'{host_dir}/{rel}' in tree
+    assert 'img/local.png' in tree
+    # 源站自己的 lib/ 没有被请求
+    assert 'lib/site.css' not in tree
+
+    html = tree['index.html'].decode('utf-8')
+    assert '//localhost' not in html and '\\/\\/localhost' not in html
+    assert f'href="{host_dir}/lib/site.css"' in html
+    assert f'{host_dir}/img/a.png 1x' in html
+    assert 'https://other.invalid/page' in html
+    assert 'var u="' + host_dir.replace('/', '\\/') + '\\/img/b.png"' in html
+    # CDN 样式表中的根相对路径指向 CDN 自己的根
+    css = tree[f'{host_dir}/lib/site.css'].decode('utf-8')
+    assert 'url(../img/bg.png)' in css
+    assert tree[f'{host_dir}/lib/app.js'].decode('utf-8') == f'var logo="{host_dir}/img/b.png";'
+
+
+def test_without_mirror_hosts_cdn_untouched(site, tmp_path):
+    origin, cdn = cdn_site(site)
+    make_crawler(origin, tmp_path / 'out').crawl()
+    tree = read_tree(tmp_path / 'out')
+    assert not any(rel.startswith('_hosts/') for rel in tree)
+    assert f'{cdn}lib/site.css' in tree['index.html'].decode('utf-8')
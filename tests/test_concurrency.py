@@ -0,0 +1,68 @@
+"""并发下载：输出与单线程顺序下载逐字节一致，单host并发不超过上限，令牌桶限速"""
+import threading
+import time
+
+from conftest import QuietHandler, make_crawler, read_tree
+from website_crawler import TokenBucket
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/static/css/site.css">'
+                  '<script src="/static/js/app.js"></script></head>'
+                  '<body><img src="/static/img/logo.png" srcset="/static/img/logo.png 1x, /static/img/logo@2x.png 2x">'
+                  '<img src="/static/img/a.jpg"><img src="/static/img/b.jpg"><img src="/static/img/c.jpg">'
+                  '</body></html>',
+    'static/css/site.css': '.logo{background:url(/static/img/logo.png)}'
+                           '@font-face{font-family:x;src:url(../fonts/x.woff2)}',
+    'static/js/app.js': 'var img="/static/img/logo.png";',
+    'static/img/logo.png': b'l' * 128,
+    'static/img/logo@2x.png': b'L' * 128,
+    'static/img/a.jpg': b'a' * 64,
+    'static/img/b.jpg': b'b' * 64,
+    'static/img/c.jpg': b'c' * 64,
+    'static/fonts/x.woff2': b'f' * 64,
+}
+
+
+class SlowHandler(QuietHandler):
+    """每个资源请求延迟 50ms，并记录同时处理的最大请求数"""
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_GET(self):
+        if self.path.startswith('/static/'):
+            with SlowHandler.lock:
+                SlowHandler.active += 1
+                SlowHandler.peak = max(SlowHandler.peak, SlowHandler.active)
+            try:
+                time.sleep(0.05)
+                super().do_GET()
+            finally:
+                with SlowHandler.lock:
+                    SlowHandler.active -= 1
+        else:
+            super().do_GET()
+
+
+def test_concurrent_matches_sequential_baseline(site, tmp_path):
+    base = site(SITE)
+    make_crawler(base, tmp_path / 'seq', max_workers=1, per_host_limit=1).crawl()
+    make_crawler(base, tmp_path / 'par', max_workers=8, per_host_limit=4).crawl()
+    baseline = read_tree(tmp_path / 'seq')
+    assert {'index.html', 'static/img/logo@2x.png', 'static/fonts/x.woff2', 'static/img/c.jpg'} <= set(baseline)
+    assert read_tree(tmp_path / 'par') == baseline
+
+
+def test_per_host_limit(site, tmp_path):
+    base = site(SITE, handler=SlowHandler)
+    make_crawler(base, tmp_path / 'out', max_workers=8, per_host_limit=2).crawl()
+    assert SlowHandler.peak == 2
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(50, 1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    # 第一个令牌立即可用，其余 10 个按每秒 50 个补充
+    assert time.monotonic() - start >= 0.18
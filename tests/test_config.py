@@ -0,0 +1,29 @@
+"""分组配置：扁平关键字参数与 CrawlConfig 等价，分组对象可整体传入，未知参数报错"""
+import pytest
+
+from conftest import make_crawler
+from website_crawler import CrawlConfig, NetworkConfig, ScopeConfig, StorageConfig, WebsiteCrawler
+
+
+def test_flat_options_match_config_groups():
+    flat = make_crawler('http://127.0.0.1/', 'unused', max_workers=3, max_pages=7, rewrite_mode='walk')
+    config = CrawlConfig(network=NetworkConfig(max_workers=3, rate_limit=None), scope=ScopeConfig(max_pages=7),
+                         storage=StorageConfig(rewrite_mode='walk'), quiet=True)
+    grouped = WebsiteCrawler('http://127.0.0.1/', 'unused', config)
+    assert flat.config == grouped.config
+    assert (grouped.max_workers, grouped.max_pages, grouped.rewrite_mode) == (3, 7, 'walk')
+
+
+def test_flat_options_override_groups():
+    crawler = WebsiteCrawler('http://127.0.0.1/', 'unused', scope=ScopeConfig(max_pages=5, max_depth=2),
+                             max_pages=9, quiet=True)
+    assert (crawler.max_pages, crawler.max_depth) == (9, 2)
+    # 传入的配置对象本身不被修改
+    base = CrawlConfig()
+    WebsiteCrawler('http://127.0.0.1/', 'unused', base, max_workers=2)
+    assert base.network.max_workers == NetworkConfig().max_workers
+
+
+def test_unknown_option():
+    with pytest.raises(TypeError):
+        WebsiteCrawler('http://127.0.0.1/', 'unused', max_worker=3)
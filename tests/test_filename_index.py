@@ -0,0 +1,101 @@
+"""FilenameIndex 的查找结果与排序后的 os.walk 兜底查找一致，且与登记顺序无关"""
+import os
+import random
+
+from website_crawler import FilenameIndex
+
+FILES = [
+    'z/font.abc123.woff2',
+    'font.woff2',
+    'a/b/font-x.woff2',
+    'a/font-y.woff2',
+    'a/b/c/logo.hash.png',
+    'a/logo.png',
+    'logo-2x.png',
+    'css/main.css',
+]
+
+
+def walk_find(folder, filename):
+    """原 _find_file_by_name 的目录遍历（目录和文件按名称排序）"""
+    file_base, file_ext = os.path.splitext(filename)
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for f in sorted(files):
+            f_base, f_ext = os.path.splitext(f)
+            if f == filename or (file_base in f_base and f_ext.lower() == file_ext.lower()):
+                return os.path.relpath(os.path.join(root, f), folder).replace('\\', '/')
+    return None
+
+
+def test_multiple_matches_follow_walk_order(tmp_path):
+    for rel_path in FILES:
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x')
+    queries = ['font.woff2', 'font-x.woff2', 'font-y.woff2', 'logo.png', 'logo.PNG', 'main.css', 'missing.png']
+    expected = {name: walk_find(tmp_path, name) for name in queries}
+    assert expected['font.woff2'] == 'font.woff2'
+    assert expected['logo.png'] == 'logo-2x.png'
+    assert expected['font-x.woff2'] == 'a/b/font-x.woff2'
+
+    rng = random.Random(7)
+    for _ in range(20):
+        order = FILES[:]
+        rng.shuffle(order)
+        index = FilenameIndex()
+        # 一部分文件在查询之后才登记（模拟并发下载陆续落盘）
+        for rel_path in order[:4]:
+            index.add(rel_path)
+        for name in queries:
+            index.find(name)
+        for rel_path in order[4:]:
+            index.add(rel_path)
+        assert {name: index.find(name) for name in queries} == expected
+
+
+def test_scan_matches_walk(tmp_path):
+    for rel_path in FILES:
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x')
+    index = FilenameIndex()
+    index.scan(str(tmp_path))
+    assert index.seeded
+    for name in ('font.woff2', 'font-x.woff2', 'font-y.woff2', 'logo.png', 'logo.PNG', 'main.css',
+                 'abc123.woff2', 'missing.png'):
+        assert index.find(name) == walk_find(tmp_path, name)
+
+
+def test_miss_rechecks_files_added_later():
+    index = FilenameIndex()
+    index.add('css/main.css')
+    assert index.find('app.js') is None
+    index.add('js/app.1f2e.js')
+    assert index.find('app.js') == 'js/app.1f2e.js'
+    # 之后登记的文件在遍历顺序中更靠前时替换缓存的结果
+    index.add('app.js')
+    assert index.find('app.js') == 'app.js'
+    index.add('z/app.js')
+    assert index.find('app.js') == 'app.js'
+    assert index.find('') is None
+
+
+def test_trigram_lookup_matches_linear_scan():
+    rng = random.Random(11)
+    words = ('logo', 'lo', 'icon', 'font', 'app', 'ap', 'main')
+    paths = [f"{rng.choice('abc')}/{rng.choice(words)}{rng.choice(('', '-', '.'))}{rng.choice(words)}"
+             f"{rng.choice(('', '.1f2e', '-2x'))}{rng.choice(('.png', '.PNG', '.js'))}" for _ in range(300)]
+    queries = [f"{rng.choice(words)}{rng.choice(('', '-', '.'))}{rng.choice(('', 'o', 'icon'))}"
+               f"{rng.choice(('.png', '.js', '.css'))}" for _ in range(200)] + ['.png', 'x.png']
+    index = FilenameIndex()
+    for i, rel_path in enumerate(paths):
+        index.add(rel_path)
+        # 查询与登记交替：已缓存的结果随后续登记的文件更新
+        index.find(queries[i % len(queries)])
+    for name in queries:
+        file_base, file_ext = os.path.splitext(name)
+        matches = [p for p in set(paths) if os.path.splitext(p)[1].lower() == file_ext.lower()
+                   and file_base in os.path.splitext(p.rsplit('/', 1)[-1])[0]]
+        expected = min(matches, key=FilenameIndex.walk_key) if matches else None
+        assert index.find(name) == expected, name
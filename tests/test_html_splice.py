@@ -0,0 +1,109 @@
+"""HtmlDocument 的属性偏移与拼接：无值、无引号、引号风格、重复属性，未改动的字节保持原样"""
+from html import unescape
+from html.parser import HTMLParser
+
+from conftest import make_crawler
+from website_crawler import HtmlDocument
+
+# 属性切分的边界情况：空白与换行、无值、无引号、=号两侧空白、多个=号、斜杠分隔、重复属性、字符引用
+TAGS = [
+    '<img src="a.png" alt=\'x\'>',
+    '<img\n  src = "a.png"\talt=x  data-x=\'y "z"\'>',
+    '<input disabled value=1 checked>',
+    '<a href=/p?q=1&amp;r=2 title="a&quot;b">',
+    '<img src==a.png alt=="b">',
+    '<img/src="a.png"/alt="b"/>',
+    '<img src="a.png" SRC="b.png" Src=c.png>',
+    '<link rel=stylesheet href="x.css"/>',
+    '<div data-json=\'{"a":1}\' class="x y"  >',
+    '<svg viewBox="0 0 1 1" xlink:href="#i">',
+    '<img src="" alt>',
+    '<img src= "a b.png" alt =b>',
+]
+
+
+class AttrRecorder(HTMLParser):
+    """当前解释器的 HTMLParser 给出的属性"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.attrs = []
+
+    def handle_starttag(self, tag, attrs):
+        self.attrs.append(dict(attrs))
+
+    handle_startendtag = handle_starttag
+
+
+def rewrite(html, name, value, tag_name=None):
+    doc = HtmlDocument(html)
+    tags = doc.find_all(*([tag_name] if tag_name else []), attr=name)
+    return doc.splice([doc.attr_edit(tag, name, value) for tag in tags])
+
+
+def test_attribute_spans_match_html_parser():
+    """HtmlDocument 按私有复制的正则定位属性值，切分结果必须与运行中的 HTMLParser 一致"""
+    for html in TAGS:
+        recorder = AttrRecorder()
+        recorder.feed(html)
+        recorder.close()
+        doc = HtmlDocument(html)
+        assert len(doc.tags) == len(recorder.attrs) == 1, html
+        tag = doc.tags[0]
+        located = {name: None if quote is None else unescape(html[start:end])
+                   for name, (start, end, quote) in tag.spans.items()}
+        assert located == recorder.attrs[0], html
+        assert tag.attrs == recorder.attrs[0], html
+
+
+def test_valueless_attribute_stays_inside_tag():
+    html = '<link href><script src></script><img src alt="x">'
+    doc = HtmlDocument(html)
+    assert [tag.get('href', tag.get('src')) for tag in doc.tags if tag.name != 'script'] == [None, None]
+    assert rewrite(html, 'href', 'a.css') == '<link href="a.css"><script src></script><img src alt="x">'
+    assert rewrite(html, 'src', 'b.js', 'script') == '<link href><script src="b.js"></script><img src alt="x">'
+    assert rewrite(html, 'src', 'c.png', 'img') == '<link href><script src></script><img src="c.png" alt="x">'
+
+
+def test_valueless_self_closing_attribute():
+    assert rewrite('<img src/>', 'src', 'a.png') == '<img src="a.png"/>'
+    assert rewrite('<img src />', 'src', 'a.png') == '<img src="a.png" />'
+
+
+def test_unquoted_attribute_gets_quotes():
+    html = '<img src=/a/b.png alt=x><a href=/p?q=1&amp;r=2>t</a>'
+    doc = HtmlDocument(html)
+    assert doc.find_all('a')[0].get('href') == '/p?q=1&r=2'
+    assert rewrite(html, 'src', 'a/b.png') == '<img src="a/b.png" alt=x><a href=/p?q=1&amp;r=2>t</a>'
+    assert rewrite(html, 'href', 'p.html?q=1&r=2') == '<img src=/a/b.png alt=x><a href="p.html?q=1&amp;r=2">t</a>'
+
+
+def test_quoted_attribute_keeps_quote_style():
+    assert rewrite("<img src='/a.png'>", 'src', "it's.png") == "<img src='it&#x27;s.png'>"
+    assert rewrite('<img src="/a.png">', 'src', 'say "hi".png') == '<img src="say &quot;hi&quot;.png">'
+
+
+def test_duplicate_attribute_last_wins():
+    html = '<img src="/first.png" src="/second.png">'
+    doc = HtmlDocument(html)
+    assert doc.tags[0].get('src') == '/second.png'
+    assert rewrite(html, 'src', 'second.png') == '<img src="/first.png" src="second.png">'
+
+
+def test_untouched_bytes_preserved():
+    html = '<HTML>\n<IMG  SRC = "/a.png"   data-x>\n<!-- <img src="/c.png"> --></HTML>'
+    doc = HtmlDocument(html)
+    assert len(doc.find_all('img')) == 1
+    assert doc.splice([]) == html
+    assert rewrite(html, 'src', 'a.png') == html.replace('"/a.png"', '"a.png"')
+
+
+def test_crawled_page_changes_only_rewritten_values(site, tmp_path):
+    page = ('<!DOCTYPE html>\n<html lang=en><head>\n  <meta charset="utf-8">\n'
+            "  <link rel=stylesheet href='/css/a.css' >\n</head>\n"
+            '<body>\n<!-- <img src="/img/x.png"> -->\n<IMG SRC=/img/x.png  alt="&lt;x&gt;">\n'
+            '<a href="https://example.com/">ext</a></body></html>\n')
+    base = site({'index.html': page, 'css/a.css': 'a{}', 'img/x.png': b'x'})
+    make_crawler(base, tmp_path / 'out').crawl()
+    assert (tmp_path / 'out' / 'index.html').read_text(encoding='utf-8') == (
+        page.replace("'/css/a.css'", "'css/a.css'").replace('SRC=/img/x.png', 'SRC="img/x.png"'))
@@ -0,0 +1,73 @@
+"""增量重爬：清单中的 ETag / Last-Modified 用于条件请求，304 的资源保留本地文件"""
+import os
+import threading
+import time
+
+from conftest import QuietHandler, make_crawler, read_tree, write_site
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/static/css/site.css">'
+                  '<script src="/static/js/app.js"></script></head>'
+                  '<body><img src="/static/img/logo.png"></body></html>',
+    'static/css/site.css': '@import url("base.css");.logo{background:url(/static/img/logo.png)}'
+                           '@font-face{font-family:x;src:url(../fonts/x.woff2)}',
+    'static/css/base.css': 'body{margin:0}',
+    'static/js/app.js': 'var img="/static/img/logo.png";',
+    'static/img/logo.png': b'l' * 128,
+    'static/fonts/x.woff2': b'f' * 64,
+}
+
+
+class CountingHandler(QuietHandler):
+    """记录带条件请求头的请求数"""
+    lock = threading.Lock()
+    conditional = 0
+
+    def do_GET(self):
+        if self.headers.get('If-Modified-Since') or self.headers.get('If-None-Match'):
+            with CountingHandler.lock:
+                CountingHandler.conditional += 1
+        super().do_GET()
+
+
+def crawl(base, folder, **options):
+    crawler = make_crawler(base, folder, **options)
+    crawler.crawl()
+    return crawler
+
+
+def test_recrawl_uses_conditional_requests(site, tmp_path):
+    CountingHandler.conditional = 0
+    base = site(SITE, handler=CountingHandler)
+    crawl(base, tmp_path / 'out')
+    first = read_tree(tmp_path / 'out')
+    assert os.path.isfile(tmp_path / 'out' / '.crawl_manifest.json')
+    assert CountingHandler.conditional == 0
+
+    # 所有资源返回 304，输出不变（CSS 中的字体来自清单记录的解析结果）
+    again = crawl(base, tmp_path / 'out')
+    assert len(again.unchanged_files) == len(again.downloaded_urls) == 5
+    assert CountingHandler.conditional == 5
+    assert read_tree(tmp_path / 'out') == first
+
+    # 修改一个资源（Last-Modified 只精确到秒，把修改时间往后推）
+    write_site(site.root, {'static/js/app.js': 'var img="/static/img/other.png";'})
+    later = time.time() + 10
+    os.utime(os.path.join(site.root, 'static/js/app.js'), (later, later))
+    changed = crawl(base, tmp_path / 'out')
+    assert os.path.normpath(str(tmp_path / 'out' / 'static/js/app.js')) not in changed.unchanged_files
+    assert len(changed.unchanged_files) == 4
+    tree = read_tree(tmp_path / 'out')
+    assert tree.pop('static/js/app.js') == b'var img="/static/img/other.png";'
+    first.pop('static/js/app.js')
+    assert tree == first
+
+
+def test_incremental_disabled(site, tmp_path):
+    CountingHandler.conditional = 0
+    base = site(SITE, handler=CountingHandler)
+    crawl(base, tmp_path / 'out', incremental=False)
+    again = crawl(base, tmp_path / 'out', incremental=False)
+    assert not os.path.exists(tmp_path / 'out' / '.crawl_manifest.json')
+    assert CountingHandler.conditional == 0
+    assert not again.unchanged_files
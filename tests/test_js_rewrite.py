@@ -0,0 +1,42 @@
+"""JS / 内联脚本路径重写的输出与旧的逐前缀多趟实现逐字节一致（对照实现见 benchmarks/bench_js_rewrite.py）"""
+import importlib.util
+import os
+import random
+
+import pytest
+
+from website_crawler import WebsiteCrawler
+
+_spec = importlib.util.spec_from_file_location(
+    'bench_js_rewrite', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'benchmarks', 'bench_js_rewrite.py'))
+bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench)
+
+
+def make_crawler(prefixes):
+    crawler = WebsiteCrawler('https://example.com/', 'unused')
+    crawler.detected_prefixes.update(prefixes)
+    crawler.path_mapping['/assets/img/1.png'] = 'assets/img/1.png'
+    return crawler
+
+
+@pytest.mark.parametrize('seed,count', [(1, 1), (2, 3), (3, 8)])
+def test_matches_legacy(seed, count):
+    rng = random.Random(seed)
+    prefixes = bench.make_prefixes(count)
+    crawler = make_crawler(prefixes)
+    bundle = bench.make_bundle(rng, prefixes, 64 * 1024)
+    inline = bench.make_inline_script(rng, prefixes, 16 * 1024)
+    assert crawler.fix_js_paths(bundle) == bench.legacy_fix_js_paths(crawler, bundle)
+    assert crawler._fix_inline_script_paths(inline) == bench.legacy_fix_inline_script_paths(crawler, inline)
+
+
+def test_public_path_forms():
+    crawler = make_crawler(['/b/x/'])
+    js = ('t.p="/b/x/_next/";__webpack_public_path__ = \'/static/\';'
+          'c={assetPrefix:"/b/x"};d="/b/x/_next/a.js";e="/b/y/_next/a.js";f="/b/x/"')
+    assert crawler.fix_js_paths(js) == (
+        't.p="b/x/_next/";__webpack_public_path__ = \'static/\';'
+        'c={assetPrefix:"b/x"};d="b/x/_next/a.js";e="/b/y/_next/a.js";f="b/x/"')
+    assert crawler.fix_js_paths(js) == bench.legacy_fix_js_paths(crawler, js)
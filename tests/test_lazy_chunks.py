@@ -0,0 +1,69 @@
+"""rel=preload 资源和运行时按需加载的 Next.js / webpack chunk 随页面一起下载"""
+from conftest import make_crawler, read_tree
+from website_crawler import WebsiteCrawler
+
+RUNTIME = ('(()=>{var r={};r.p="/_next/";'
+           'r.u=e=>"static/chunks/"+({12:"pages-a",34:"pages-b"}[e]||e)+"."+{12:"aaa",34:"bbb",56:"ccc"}[e]+".js",'
+           'r.miniCssF=e=>"static/css/"+{12:"d1"}[e]+".css"})()')
+BUILD_MANIFEST = ('self.__BUILD_MANIFEST={"/":["static/chunks/pages/index-1.js"],'
+                  '"/about":["static/css/x.css","static/chunks/pages/about-2.js"]};')
+SSG_MANIFEST = 'self.__SSG_MANIFEST=new Set(["/","/blog/[slug]","/about"]);self.__SSG_MANIFEST_CB&&self.__SSG_MANIFEST_CB()'
+
+SITE = {
+    'index.html': '<html><head><link rel="preload" href="/fonts/p.woff2" as="font" crossorigin>'
+                  '<link rel="preload" href="/img/hero.png" as="image">'
+                  '<script src="/_next/static/chunks/webpack-x.js"></script>'
+                  '<script src="/_next/static/BID/_buildManifest.js"></script>'
+                  '<script src="/_next/static/BID/_ssgManifest.js"></script></head><body></body></html>',
+    '_next/static/chunks/webpack-x.js': RUNTIME,
+    '_next/static/BID/_buildManifest.js': BUILD_MANIFEST,
+    '_next/static/BID/_ssgManifest.js': SSG_MANIFEST,
+    '_next/static/chunks/pages-a.aaa.js': 'a',
+    '_next/static/chunks/pages-b.bbb.js': 'b',
+    '_next/static/chunks/56.ccc.js': 'c',
+    '_next/static/css/d1.css': '.d{background:url(../media/d.png)}',
+    '_next/static/media/d.png': b'd',
+    '_next/static/chunks/pages/index-1.js': 'i',
+    '_next/static/chunks/pages/about-2.js': 'ab',
+    '_next/static/css/x.css': '.x{}',
+    '_next/data/BID/index.json': '{}',
+    '_next/data/BID/about.json': '{}',
+    'fonts/p.woff2': b'p',
+    'img/hero.png': b'h',
+}
+
+CHUNKS = {
+    '_next/static/chunks/pages-a.aaa.js', '_next/static/chunks/pages-b.bbb.js', '_next/static/chunks/56.ccc.js',
+    '_next/static/css/d1.css', '_next/static/media/d.png', '_next/static/chunks/pages/index-1.js',
+    '_next/static/chunks/pages/about-2.js', '_next/static/css/x.css', '_next/data/BID/index.json',
+    '_next/data/BID/about.json',
+}
+
+
+def test_discover_js_chunks():
+    crawler = WebsiteCrawler('http://h/', 'unused')
+    assert crawler.discover_js_chunks(RUNTIME, 'http://h/_next/static/chunks/webpack-x.js') == [
+        'http://h/_next/static/chunks/pages-a.aaa.js', 'http://h/_next/static/chunks/pages-b.bbb.js',
+        'http://h/_next/static/chunks/56.ccc.js', 'http://h/_next/static/css/d1.css']
+    assert crawler.discover_js_chunks(BUILD_MANIFEST, 'http://h/_next/static/BID/_buildManifest.js') == [
+        'http://h/_next/static/chunks/pages/index-1.js', 'http://h/_next/static/css/x.css',
+        'http://h/_next/static/chunks/pages/about-2.js']
+    # 动态路由没有固定的数据文件，跳过
+    assert crawler.discover_js_chunks(SSG_MANIFEST, 'http://h/_next/static/BID/_ssgManifest.js') == [
+        'http://h/_next/data/BID/index.json', 'http://h/_next/data/BID/about.json']
+
+
+def test_crawl_downloads_preload_and_chunks(site, tmp_path):
+    base = site(SITE)
+    make_crawler(base, tmp_path / 'out').crawl()
+    tree = read_tree(tmp_path / 'out')
+    assert {'fonts/p.woff2', 'img/hero.png'} | CHUNKS <= set(tree)
+    assert 'href="fonts/p.woff2"' in tree['index.html'].decode()
+
+
+def test_discover_chunks_disabled(site, tmp_path):
+    base = site(SITE)
+    make_crawler(base, tmp_path / 'out', discover_chunks=False).crawl()
+    tree = read_tree(tmp_path / 'out')
+    assert {'fonts/p.woff2', 'img/hero.png'} <= set(tree)
+    assert not CHUNKS & set(tree)
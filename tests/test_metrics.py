@@ -0,0 +1,61 @@
+"""结构化指标：逐请求事件写入 JSONL 或回调，quiet 模式省略逐文件输出，profile 选项采集分析数据"""
+import json
+
+import pytest
+
+from conftest import make_crawler
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/css/site.css"><script src="/js/app.js"></script>'
+                  '</head><body><img src="/img/a.png"><img src="/img/missing.png"></body></html>',
+    'css/site.css': '.a{background:url(../img/b.png)}',
+    'js/app.js': 'var a=1;',
+    'img/a.png': b'a' * 100,
+    'img/b.png': b'b' * 50,
+}
+
+
+def test_metrics_jsonl(site, tmp_path):
+    base = site(SITE)
+    path = tmp_path / 'metrics' / 'events.jsonl'
+    make_crawler(base, tmp_path / 'out', metrics=str(path)).crawl()
+    events = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    requests = {event['url'].rsplit('/', 1)[-1]: event for event in events if event['event'] == 'request'}
+    assert set(requests) == {'site.css', 'app.js', 'a.png', 'b.png', 'missing.png'}
+    assert requests['a.png']['status'] == 200 and requests['a.png']['bytes'] == 100
+    assert requests['missing.png']['status'] == 404
+    assert {'download', 'html'} <= {event['stage'] for event in events if event['event'] == 'stage'}
+    summary = events[-1]
+    assert summary['event'] == 'summary'
+    assert summary['requests']['count'] == 5 and summary['requests']['failed'] == 1
+
+
+def test_metrics_callback_and_quiet(site, tmp_path, capsys):
+    base = site(SITE)
+    events = []
+    make_crawler(base, tmp_path / 'out', metrics=events.append, quiet=True).crawl()
+    assert sum(event['event'] == 'request' for event in events) == 5
+    assert events[-1]['event'] == 'summary'
+    out = capsys.readouterr().out
+    assert '[OK] 下载成功' not in out
+    assert '爬取完成' in out
+
+    make_crawler(base, tmp_path / 'loud', quiet=False).crawl()
+    assert '[OK] 下载成功' in capsys.readouterr().out
+
+
+def test_profile(site, tmp_path):
+    base = site(SITE)
+    events = []
+    crawler = make_crawler(base, tmp_path / 'out', metrics=events.append, profile='cprofile')
+    crawler.crawl()
+    assert (tmp_path / 'out' / crawler.PROFILE_NAME).is_file()
+    profile = [event for event in events if event['event'] == 'profile']
+    assert len(profile) == 1 and profile[0]['top']
+
+    events.clear()
+    make_crawler(base, tmp_path / 'mem', metrics=events.append, profile='tracemalloc').crawl()
+    memory = [event for event in events if event['event'] == 'memory']
+    assert len(memory) == 1 and memory[0]['peak'] > 0
+    with pytest.raises(ValueError):
+        make_crawler(base, tmp_path / 'out', profile='perf')
@@ -0,0 +1,121 @@
+"""多页面爬取：同源链接按深度和页数上限入队、URL规范化去重、页面之间的链接改写为本地文件"""
+import posixpath
+import re
+
+from conftest import make_crawler, read_tree
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/css/site.css"></head><body>'
+                  '<a href="/about.html">about</a><a href="about.html#team">team</a>'
+                  '<a href="/about.html?utm=1">tracked</a><a href="/blog/post.html">post</a>'
+                  '<a href="https://example.com/">external</a><a href="mailto:a@b.c">mail</a>'
+                  '<a href="/files/report.pdf">pdf</a></body></html>',
+    'about.html': '<html><head><link rel="stylesheet" href="css/site.css"></head>'
+                  '<body><a href="/">home</a><img src="img/team.png"></body></html>',
+    'blog/post.html': '<html><head><link rel="stylesheet" href="/css/site.css"></head><body>'
+                      '<img src="img/cover.png"><a href="deep.html">deep</a><a href="#top">top</a>'
+                      '<a href="../about.html">about</a></body></html>',
+    'blog/deep.html': '<html><body>deep</body></html>',
+    'css/site.css': 'body{background:url(../img/bg.png)}',
+    'img/bg.png': b'b' * 32,
+    'img/team.png': b't' * 32,
+    'blog/img/cover.png': b'c' * 32,
+    'files/report.pdf': b'%PDF',
+}
+
+
+def links(html):
+    return re.findall(r'(?:href|src)="([^"]*)"', html)
+
+
+def resolve(tree, page, link):
+    """按浏览器的规则把页面中的相对链接解析为输出目录中的路径"""
+    path = link.split('#')[0]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(page), path)) if path else page
+
+
+def test_canonicalize_url():
+    crawler = make_crawler('http://Example.com/', 'unused')
+    assert crawler.canonicalize_url('HTTP://EXAMPLE.com:80/a/b.html#x') == 'http://example.com/a/b.html'
+    assert crawler.canonicalize_url('https://example.com:443/a%7eb/') == 'https://example.com/a~b'
+    assert crawler.canonicalize_url('http://example.com/p?b=2&a=1') == 'http://example.com/p'
+    assert crawler.canonicalize_url('http://example.com') == 'http://example.com/'
+    keep = make_crawler('http://example.com/', 'unused', query_policy='keep')
+    assert keep.canonicalize_url('http://example.com/p?b=2&a=1') == 'http://example.com/p?a=1&b=2'
+
+
+def test_crawl_follows_same_origin_links(site, tmp_path):
+    base = site(SITE)
+    crawler = make_crawler(base, tmp_path / 'out', max_depth=1, max_pages=10)
+    crawler.crawl()
+    tree = read_tree(tmp_path / 'out')
+    # 深度 2 的页面和非HTML链接不抓取；带片段/查询参数的重复链接只抓一次
+    assert sorted(crawler.page_mapping.values()) == ['about.html', 'blog/post.html', 'index.html']
+    assert 'blog/deep.html' not in tree and 'files/report.pdf' not in tree
+    assert {'css/site.css', 'img/bg.png', 'img/team.png', 'blog/img/cover.png'} <= set(tree)
+
+    # 每个页面中指向已抓取页面和资源的链接都能在输出目录中找到，其他链接保持原样
+    skipped = {'https://example.com/', 'mailto:a@b.c', '/files/report.pdf', 'deep.html'}
+    for page in ('index.html', 'about.html', 'blog/post.html'):
+        for link in links(tree[page].decode('utf-8')):
+            if link not in skipped:
+                assert resolve(tree, page, link) in tree, (page, link)
+    index = tree['index.html'].decode('utf-8')
+    assert 'href="https://example.com/"' in index and 'href="/files/report.pdf"' in index
+    # 子目录页面不插入 <base>：页内锚点保持原样，未抓取页面的相对链接仍按页面自身的位置解析
+    post = tree['blog/post.html'].decode('utf-8')
+    assert '<base' not in post
+    assert 'href="#top"' in post and 'href="deep.html"' in post
+    assert 'href="../css/site.css"' in post and 'href="../about.html"' in post
+
+
+def test_max_pages(site, tmp_path):
+    base = site(SITE)
+    crawler = make_crawler(base, tmp_path / 'out', max_depth=3, max_pages=2)
+    crawler.crawl()
+    assert sorted(crawler.page_mapping.values()) == ['about.html', 'index.html']
+    assert sorted(p for p in read_tree(tmp_path / 'out') if p.endswith('.html')) == ['about.html', 'index.html']
+
+
+def test_directory_page_resolves_relative_links(site, tmp_path):
+    base = site({'index.html': '<html><body><a href="/docs/">docs</a></body></html>',
+                 'docs/index.html': '<html><body><img src="rel.png"><a href="guide.html">guide</a></body></html>',
+                 'docs/rel.png': b'r' * 32,
+                 'docs/guide.html': '<html><body>guide</body></html>'})
+    crawler = make_crawler(base, tmp_path / 'out', max_depth=2, max_pages=10)
+    crawler.crawl()
+    tree = read_tree(tmp_path / 'out')
+    # /docs/ 的相对链接按 /docs/ 解析，而不是去掉末尾斜杠后的 /
+    assert {'docs/index.html', 'docs/rel.png', 'docs/guide.html'} <= set(tree)
+    for link in links(tree['docs/index.html'].decode('utf-8')):
+        assert resolve(tree, 'docs/index.html', link) in tree, link
+
+
+def test_inline_css_urls_in_nested_page(site, tmp_path):
+    base = site({'index.html': '<html><body><a href="/blog/post.html">post</a></body></html>',
+                 'blog/post.html': '<html><head><style>.a{background:url(img/a.png)}</style></head>'
+                                   '<body><div style="background:url(\'../img/b.png\')"></div></body></html>',
+                 'blog/img/a.png': b'a' * 32,
+                 'img/b.png': b'b' * 32})
+    make_crawler(base, tmp_path / 'out', max_depth=1, max_pages=10).crawl()
+    tree = read_tree(tmp_path / 'out')
+    assert {'blog/img/a.png', 'img/b.png'} <= set(tree)
+    html = tree['blog/post.html'].decode('utf-8')
+    for link in re.findall(r'url\([\'"]?([^\'")]*)', html):
+        assert resolve(tree, 'blog/post.html', link) in tree, link
+
+
+def test_nested_page_scripts_and_existing_base(site, tmp_path):
+    base = site({'index.html': '<html><body><a href="/blog/post.html">post</a></body></html>',
+                 'blog/post.html': '<html><head><base href="/"></head><body>'
+                                   '<img src="/img/a.png"><form action=""></form>'
+                                   '<script>var a="/img/b.png";</script></body></html>',
+                 'img/a.png': b'a' * 32,
+                 'img/b.png': b'b' * 32})
+    make_crawler(base, tmp_path / 'out', max_depth=1, max_pages=10).crawl()
+    html = read_tree(tmp_path / 'out')['blog/post.html'].decode('utf-8')
+    # 原有的 <base> 不再改变解析位置，内联脚本中的路径同样相对于页面
+    assert '<base href="./">' in html
+    assert 'src="../img/a.png"' in html
+    assert 'var a="../img/b.png"' in html
+    assert '<form action="">' in html
@@ -0,0 +1,41 @@
+"""预压缩：为可压缩文件生成 .gz 同名文件，内容未变时跳过，过小的文件不压缩"""
+import gzip
+
+import pytest
+
+from conftest import make_crawler
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/css/site.css">'
+                  '<script src="/js/app.js"></script></head>'
+                  '<body><img src="/img/logo.png">' + '<p>hello world</p>' * 200 + '</body></html>',
+    'css/site.css': 'body{margin:0}' * 200,
+    'js/app.js': 'var x=1;',
+    'img/logo.png': b'\x89PNG' + b'l' * 4096,
+}
+
+
+def test_gzip_siblings(site, tmp_path):
+    base = site(SITE)
+    out = tmp_path / 'out'
+    crawler = make_crawler(base, out, precompress=['gzip'], compress_min_size=1024, rewrite_processes=2)
+    crawler.crawl()
+
+    for rel in ('index.html', 'css/site.css'):
+        data = (out / rel).read_bytes()
+        assert gzip.decompress((out / (rel + '.gz')).read_bytes()) == data
+    # 过小的 JS 与不可压缩的图片都不生成
+    assert not (out / 'js' / 'app.js.gz').exists()
+    assert not (out / 'img' / 'logo.png.gz').exists()
+    assert set(crawler.compressed_files) == {'index.html', 'css/site.css'}
+
+    # 再次预压缩：内容未变的文件跳过
+    crawler.previous_manifest = {'compressed': dict(crawler.compressed_files)}
+    statuses = dict(crawler.precompress_files())
+    assert statuses['index.html'] == statuses['css/site.css'] == 'unchanged'
+    assert statuses['js/app.js'] == 'small'
+
+
+def test_unknown_encoding(tmp_path):
+    with pytest.raises(ValueError):
+        make_crawler('http://127.0.0.1/', tmp_path / 'out', precompress=['zstd'])
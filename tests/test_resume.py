@@ -0,0 +1,93 @@
+"""断点续爬：中断后以 resume=True 继续，已完成的页面和已下载的资源不再请求，输出与一次完成的爬取一致"""
+import os
+import threading
+
+import pytest
+
+from conftest import QuietHandler, make_crawler, read_tree
+from website_crawler import CrawlJournal
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/static/css/site.css">'
+                  '<script src="/static/js/app.js"></script></head>'
+                  '<body><a href="/about.html">about</a><a href="/blog/post.html">post</a>'
+                  '<img src="/static/img/logo.png"></body></html>',
+    'about.html': '<html><head><link rel="stylesheet" href="static/css/site.css"></head>'
+                  '<body><img src=static/img/team.jpg><a href="/">home</a></body></html>',
+    'blog/post.html': '<html><body><img src="/static/img/logo.png"><img src="cover.jpg">'
+                      '<a href="/about.html">about</a></body></html>',
+    'static/css/site.css': '@import url("base.css");.logo{background:url(/static/img/logo.png)}'
+                           '@font-face{font-family:x;src:url(../fonts/x.woff2)}',
+    'static/css/base.css': 'body{margin:0}',
+    'static/js/app.js': 'var img="/static/img/logo.png";',
+    'static/img/logo.png': b'l' * 128,
+    'static/img/team.jpg': b't' * 64,
+    'static/fonts/x.woff2': b'f' * 64,
+    'blog/cover.jpg': b'c' * 64,
+}
+
+OPTIONS = {'max_pages': 5, 'max_depth': 2}
+
+
+class RecordingHandler(QuietHandler):
+    lock = threading.Lock()
+    paths = []
+
+    def do_GET(self):
+        with RecordingHandler.lock:
+            RecordingHandler.paths.append(self.path)
+        super().do_GET()
+
+
+def test_interrupted_crawl_resumes(site, tmp_path):
+    base = site(SITE, handler=RecordingHandler)
+    make_crawler(base, tmp_path / 'clean', **OPTIONS).crawl()
+
+    RecordingHandler.paths = []
+    crawler = make_crawler(base, tmp_path / 'out', **OPTIONS)
+    crawl_page = crawler._crawl_page
+    calls = []
+
+    def interrupt_after_first_page(*args):
+        if calls:
+            raise KeyboardInterrupt
+        calls.append(args)
+        return crawl_page(*args)
+
+    crawler._crawl_page = interrupt_after_first_page
+    with pytest.raises(KeyboardInterrupt):
+        crawler.crawl()
+    assert os.path.exists(tmp_path / 'out' / crawler.JOURNAL_NAME)
+    first_run = set(RecordingHandler.paths)
+
+    RecordingHandler.paths = []
+    resumed = make_crawler(base, tmp_path / 'out', resume=True, **OPTIONS)
+    resumed.crawl()
+    assert resumed._resumed_pages == 1
+    # 第一个页面及其资源不再请求
+    assert not first_run & set(RecordingHandler.paths)
+    assert not os.path.exists(tmp_path / 'out' / crawler.JOURNAL_NAME)
+    assert read_tree(tmp_path / 'out') == read_tree(tmp_path / 'clean')
+
+
+def test_resume_without_journal_starts_over(site, tmp_path):
+    base = site(SITE)
+    make_crawler(base, tmp_path / 'clean', **OPTIONS).crawl()
+    crawler = make_crawler(base, tmp_path / 'out', resume=True, **OPTIONS)
+    crawler.crawl()
+    assert crawler._resumed_pages == 0
+    assert read_tree(tmp_path / 'out') == read_tree(tmp_path / 'clean')
+
+
+def test_replay_skips_truncated_line(tmp_path):
+    journal = CrawlJournal(str(tmp_path / 'journal.jsonl'))
+    journal.open(truncate=True)
+    journal.write('page', url='http://example.com/', path='index.html', depth=0)
+    journal.write('page_done', url='http://example.com/')
+    journal.close()
+    with open(tmp_path / 'journal.jsonl', 'a', encoding='utf-8') as f:
+        f.write('{"t": "asset", "url": "http://exa')
+    assert [record['t'] for record in journal.replay()] == ['page', 'page_done']
+    journal.close(remove=True)
+    assert not os.path.exists(tmp_path / 'journal.jsonl')
+    assert journal.replay() == []
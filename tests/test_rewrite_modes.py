@@ -0,0 +1,73 @@
+"""pipeline（落盘前在内存中重写）、walk（下载完成后遍历重写）与 process（多进程重写）的输出逐字节一致"""
+import pytest
+
+from conftest import make_crawler, read_tree
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/p1/_next/static/css/main.css">'
+                  '<script src="/p1/_next/static/chunks/main.js"></script></head>'
+                  '<body><img src="/p1/_next/static/media/a.png">'
+                  '<script>self.__next_f.push([1,"\\/p1\\/_next\\/static\\/media\\/a.png"])</script></body></html>',
+    'p1/_next/static/css/main.css': '@import url("/p1/_next/static/css/base.css");'
+                                    '.a{background:url(/p1/_next/static/media/a.png)}',
+    'p1/_next/static/css/base.css': '.b{background:url(../media/b.png)}',
+    'p1/_next/static/chunks/main.js': 'var e={};e.p="/p1/_next/";var y="/p1/_next/static/media/a.png";',
+    'p1/_next/static/media/a.png': b'a' * 64,
+    'p1/_next/static/media/b.png': b'b' * 64,
+}
+
+# 第二个页面才出现的前缀 /p2/ 同样出现在第一个页面的JS中
+MULTI_PAGE_SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/p1/_next/static/css/main.css">'
+                  '<script src="/p1/_next/static/chunks/main.js"></script></head>'
+                  '<body><a href="/shop/">shop</a><img src="/p1/_next/static/media/a.png">'
+                  '<script>self.__next_f.push([1,"\\/p1\\/_next\\/static\\/media\\/a.png"])</script></body></html>',
+    'shop/index.html': '<html><head><link rel="stylesheet" href="/p2/_next/static/css/shop.css">'
+                       '<script src="/p2/_next/static/chunks/shop.js"></script></head>'
+                       '<body><img src="rel.png"><a href="/">home</a></body></html>',
+    'p1/_next/static/css/main.css': '@import url("/p1/_next/static/css/base.css");'
+                                    '.a{background:url(/p1/_next/static/media/a.png)}',
+    'p1/_next/static/css/base.css': '.b{background:url(../media/b.png)}',
+    'p1/_next/static/chunks/main.js': 'var e={};e.p="/p1/_next/";'
+                                      'var x="/p2/_next/static/media/c.png",y="/p1/_next/static/media/a.png";',
+    'p2/_next/static/css/shop.css': '.c{background:url(/p2/_next/static/media/c.png)}',
+    'p2/_next/static/chunks/shop.js': 'var z="/p1/_next/static/chunks/main.js";',
+    'p1/_next/static/media/a.png': b'a' * 64,
+    'p1/_next/static/media/b.png': b'b' * 64,
+    'p2/_next/static/media/c.png': b'c' * 64,
+    'shop/rel.png': b'r' * 64,
+}
+
+
+def crawl_tree(base, folder, mode, **options):
+    with make_crawler(base, folder, rewrite_mode=mode, rewrite_processes=2, **options) as crawler:
+        assert crawler.crawl()
+    return read_tree(folder)
+
+
+def test_modes_identical(site, tmp_path):
+    base = site(SITE)
+    trees = {mode: crawl_tree(base, tmp_path / mode, mode) for mode in ('walk', 'pipeline', 'process')}
+    assert trees['pipeline'] == trees['walk']
+    assert trees['process'] == trees['walk']
+    main_js = trees['walk']['p1/_next/static/chunks/main.js'].decode()
+    assert 'e.p="p1/_next/"' in main_js
+    assert '"p1/_next/static/media/a.png"' in main_js
+    # 增量重爬时未修改的文件不再重写，输出保持不变
+    assert crawl_tree(base, tmp_path / 'pipeline', 'pipeline') == trees['walk']
+
+
+def test_modes_identical_on_multi_page_site(site, tmp_path):
+    base = site(MULTI_PAGE_SITE)
+    trees = {mode: crawl_tree(base, tmp_path / mode, mode, max_pages=5, max_depth=1)
+             for mode in ('walk', 'pipeline', 'process')}
+    assert trees['pipeline'] == trees['walk']
+    assert trees['process'] == trees['walk']
+    main_js = trees['walk']['p1/_next/static/chunks/main.js'].decode()
+    assert '"p2/_next/static/media/c.png"' in main_js
+    assert 'e.p="p1/_next/"' in main_js
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        make_crawler('http://127.0.0.1/', 'out', rewrite_mode='bogus')
@@ -0,0 +1,48 @@
+"""依赖图调度：资源按类型优先级出队，CSS 解析出的子资源（包括 @import 样式表的子资源）随下载随入队"""
+import threading
+
+from conftest import QuietHandler, make_crawler, read_tree
+
+SITE = {
+    'index.html': '<html><head><script src="/js/app.js"></script><link rel="stylesheet" href="/css/a.css">'
+                  '</head><body><img src="/img/photo.jpg"><video><source src="/media/clip.mp4"></video></body></html>',
+    'css/a.css': '@import url("b.css");.a{background:url(../img/a.png)}',
+    'css/b.css': '@import "c.css";.b{background:url(../img/b.png)}',
+    'css/c.css': '@font-face{font-family:x;src:url(../fonts/x.woff2)}.c{background:url(/img/c.png)}',
+    'js/app.js': 'var a=1;',
+    'img/photo.jpg': b'p' * 32,
+    'img/a.png': b'a' * 32,
+    'img/b.png': b'b' * 32,
+    'img/c.png': b'c' * 32,
+    'fonts/x.woff2': b'f' * 32,
+    'media/clip.mp4': b'm' * 32,
+}
+
+
+class RecordingHandler(QuietHandler):
+    lock = threading.Lock()
+    paths = []
+
+    def do_GET(self):
+        with RecordingHandler.lock:
+            RecordingHandler.paths.append(self.path)
+        super().do_GET()
+
+
+def test_nested_imports_are_followed(site, tmp_path):
+    base = site(SITE)
+    make_crawler(base, tmp_path / 'out').crawl()
+    tree = read_tree(tmp_path / 'out')
+    assert {'css/b.css', 'css/c.css', 'img/a.png', 'img/b.png', 'img/c.png', 'fonts/x.woff2'} <= set(tree)
+    assert tree['css/c.css'] == b'@font-face{font-family:x;src:url(../fonts/x.woff2)}.c{background:url(../img/c.png)}'
+
+
+def test_priority_order_with_one_worker(site, tmp_path):
+    RecordingHandler.paths = []
+    base = site(SITE, handler=RecordingHandler)
+    make_crawler(base, tmp_path / 'out', max_workers=1).crawl()
+    # 单线程时按优先级出队：CSS、JS、字体、图片、媒体；样式表的子资源在样式表下载完成后入队
+    assert RecordingHandler.paths == [
+        '/', '/css/a.css', '/css/b.css', '/css/c.css', '/js/app.js', '/fonts/x.woff2',
+        '/img/photo.jpg', '/img/a.png', '/img/b.png', '/img/c.png', '/media/clip.mp4',
+    ]
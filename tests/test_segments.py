@@ -0,0 +1,115 @@
+"""分段下载：大媒体文件按 Range 分段并行下载，中断后按 .part.json 中的进度续传"""
+import json
+import os
+import re
+import threading
+
+from conftest import QuietHandler, make_crawler, read_tree
+
+CLIP = bytes(range(256)) * 40  # 10240 字节，每段 1024 字节共 10 段
+
+SITE = {
+    'index.html': '<html><body><video><source src="/media/clip.mp4"></video><img src="/img/a.png"></body></html>',
+    'media/clip.mp4': CLIP,
+    'img/a.png': b'a' * 32,
+}
+
+OPTIONS = {'segment_size': 1024, 'segment_threshold': 4096, 'max_segments': 3}
+
+
+class RangeHandler(QuietHandler):
+    """支持单区间 Range / If-Range 的静态服务器；drop_once 中的起始偏移第一次只发送 100 字节就断开"""
+    lock = threading.Lock()
+    ranges = []
+    drop_once = set()
+
+    def do_GET(self):
+        header = self.headers.get('Range')
+        path = self.translate_path(self.path)
+        if not header or not os.path.isfile(path):
+            return super().do_GET()
+        with open(path, 'rb') as f:
+            data = f.read()
+        stat = os.stat(path)
+        etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range != etag:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        first, last = re.match(r'bytes=(\d+)-(\d*)', header).groups()
+        first, last = int(first), min(int(last) if last else len(data) - 1, len(data) - 1)
+        with RangeHandler.lock:
+            RangeHandler.ranges.append((first, last))
+            drop = first in RangeHandler.drop_once
+            RangeHandler.drop_once.discard(first)
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {first}-{last}/{len(data)}')
+        self.send_header('Content-Length', str(last - first + 1))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        body = data[first:last + 1]
+        self.wfile.write(body[:100] if drop else body)
+        if drop:
+            self.wfile.flush()
+            self.close_connection = True
+
+
+def reset(drop_once=()):
+    RangeHandler.ranges = []
+    RangeHandler.drop_once = set(drop_once)
+
+
+def test_segmented_download(site, tmp_path):
+    reset()
+    base = site(SITE, handler=RangeHandler)
+    make_crawler(base, tmp_path / 'out', **OPTIONS).crawl()
+    assert read_tree(tmp_path / 'out')['media/clip.mp4'] == CLIP
+    assert sorted(RangeHandler.ranges) == [(i * 1024, i * 1024 + 1023) for i in range(10)]
+    assert not [name for name in os.listdir(tmp_path / 'out' / 'media') if '.part' in name]
+
+
+def test_server_without_range_support(site, tmp_path):
+    base = site(SITE)
+    make_crawler(base, tmp_path / 'out', **OPTIONS).crawl()
+    assert read_tree(tmp_path / 'out')['media/clip.mp4'] == CLIP
+
+
+def test_interrupted_segments_resume(site, tmp_path):
+    reset(drop_once={5120})
+    base = site(SITE, handler=RangeHandler)
+    make_crawler(base, tmp_path / 'out', max_retries=0, **OPTIONS).crawl()
+    media = tmp_path / 'out' / 'media'
+    assert not (media / 'clip.mp4').exists()
+    done = json.loads((media / 'clip.mp4.part.json').read_text())['done']
+    assert done.get('5', 0) < 1024
+    missing = [(i * 1024 + done.get(str(i), 0), i * 1024 + 1023) for i in range(10) if done.get(str(i), 0) < 1024]
+
+    # 续传：探测 1 字节确认文件未变，只请求未完成的部分（中断的分段从已写入的位置继续）
+    reset()
+    make_crawler(base, tmp_path / 'out', **OPTIONS).crawl()
+    assert (media / 'clip.mp4').read_bytes() == CLIP
+    assert RangeHandler.ranges[0] == (0, 0)
+    assert sorted(RangeHandler.ranges[1:]) == missing
+    assert len(missing) < 10
+    assert sorted(os.listdir(media)) == ['clip.mp4']
+
+
+def test_changed_file_restarts_segments(site, tmp_path):
+    reset(drop_once={5120})
+    base = site(SITE, handler=RangeHandler)
+    make_crawler(base, tmp_path / 'out', max_retries=0, **OPTIONS).crawl()
+
+    # 文件在两次运行之间发生变化（ETag 不同），旧进度作废，重新下载全部分段
+    changed = CLIP[::-1]
+    with open(os.path.join(site.root, 'media/clip.mp4'), 'wb') as f:
+        f.write(changed)
+    later = os.path.getmtime(os.path.join(site.root, 'media/clip.mp4')) + 10
+    os.utime(os.path.join(site.root, 'media/clip.mp4'), (later, later))
+    reset()
+    make_crawler(base, tmp_path / 'out', **OPTIONS).crawl()
+    assert (tmp_path / 'out' / 'media' / 'clip.mp4').read_bytes() == changed
+    assert len(RangeHandler.ranges) == 11
@@ -0,0 +1,111 @@
+"""镜像服务器：目录与 tar 归档两种镜像，Range / ETag / 预压缩同名文件，大文件走 sendfile"""
+import asyncio
+import gzip
+import http.client
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from conftest import make_crawler, write_site
+from crawler_server import MirrorServer
+
+BIG = bytes(range(256)) * 2048
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def mirror():
+    """mirror(folder) 在后台线程中启动 MirrorServer，返回 HTTP 连接工厂"""
+    loops = []
+
+    def start(folder, **options):
+        server = MirrorServer(str(folder), port=free_port(), **options)
+        loop = asyncio.new_event_loop()
+        loops.append((loop, server))
+        task = loop.create_task(server.serve_forever())
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', server.port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.02)
+        server.task = task
+        return lambda: http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+
+    yield start
+    for loop, server in loops:
+        loop.call_soon_threadsafe(server.task.cancel)
+        if server.archive_file:
+            server.archive_file.close()
+
+
+def get(conn, path, **headers):
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    return response, response.read()
+
+
+def test_directory_mirror(tmp_path, mirror):
+    files = {'index.html': '<html>home</html>', 'css/site.css': 'body{margin:0}' * 100,
+             'media/big.bin': BIG}
+    write_site(str(tmp_path), files)
+    css = (tmp_path / 'css' / 'site.css').read_bytes()
+    (tmp_path / 'css' / 'site.css.gz').write_bytes(gzip.compress(css))
+    conn = mirror(tmp_path, cache_file_limit=1024)()
+
+    response, body = get(conn, '/')
+    assert response.status == 200 and body == b'<html>home</html>'
+    assert response.getheader('Content-Type') == 'text/html'
+    response, body = get(conn, '/', **{'If-None-Match': response.getheader('ETag')})
+    assert response.status == 304 and body == b''
+
+    # 预压缩同名文件；Range 请求总是针对原始内容
+    response, body = get(conn, '/css/site.css', **{'Accept-Encoding': 'gzip, br'})
+    assert response.getheader('Content-Encoding') == 'gzip' and gzip.decompress(body) == css
+    assert response.getheader('Vary') == 'Accept-Encoding'
+    response, body = get(conn, '/css/site.css', **{'Accept-Encoding': 'gzip', 'Range': 'bytes=0-3'})
+    assert response.status == 206 and body == css[:4]
+
+    # 超过 cache_file_limit 的文件用 sendfile 发送
+    response, body = get(conn, '/media/big.bin')
+    assert body == BIG
+    response, body = get(conn, '/media/big.bin', Range='bytes=1000-')
+    assert response.status == 206 and body == BIG[1000:]
+    assert response.getheader('Content-Range') == f'bytes 1000-{len(BIG) - 1}/{len(BIG)}'
+    response, body = get(conn, '/media/big.bin', Range='bytes=-10')
+    assert body == BIG[-10:]
+    response, _ = get(conn, '/media/big.bin', Range=f'bytes={len(BIG)}-')
+    assert response.status == 416
+
+    # 相对路径被解析到错误目录时按后缀找回；真正不存在的立即 404
+    response, body = get(conn, '/blog/post/css/site.css')
+    assert response.status == 200 and body == css
+    response, _ = get(conn, '/missing.js')
+    assert response.status == 404
+    response, _ = get(conn, '/../etc/passwd')
+    assert response.status == 404
+
+
+def test_archive_mirror(site, tmp_path, mirror):
+    base = site({'index.html': '<html><body><video><source src="/media/clip.mp4"></video></body></html>',
+                 'media/clip.mp4': BIG})
+    out = tmp_path / 'out'
+    make_crawler(base, out, output='tar').crawl()
+    assert not os.path.exists(out / 'index.html')
+    conn = mirror(out, cache_file_limit=1024)()
+
+    response, body = get(conn, '/media/clip.mp4', Range='bytes=100-199')
+    assert response.status == 206 and body == BIG[100:200]
+    response, body = get(conn, '/media/clip.mp4')
+    assert body == BIG
+    response, body = get(conn, '/')
+    assert response.status == 200 and b'clip.mp4' in body
@@ -0,0 +1,86 @@
+"""sitemap 种子：robots.txt 的 Sitemap 行、sitemap 索引与 gzip 子 sitemap，Disallow 过滤，lastmod 未变的页面不再抓取"""
+import gzip
+import threading
+
+from conftest import QuietHandler, make_crawler, read_tree, write_site
+
+
+class RecordingHandler(QuietHandler):
+    """记录收到的请求路径"""
+    lock = threading.Lock()
+    paths = []
+
+    def do_GET(self):
+        with RecordingHandler.lock:
+            RecordingHandler.paths.append(self.path)
+        super().do_GET()
+
+
+def urlset(base, entries):
+    items = ''.join(f'<url><loc>{base}{path}</loc><lastmod>{lastmod}</lastmod></url>' for path, lastmod in entries)
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{items}</urlset>')
+
+
+def sitemap_files(base, b_lastmod='2020-01-01'):
+    return {
+        'robots.txt': f'User-agent: *\nDisallow: /private/\nSitemap: {base}sitemap_index.xml\n',
+        'sitemap_index.xml': '<?xml version="1.0" encoding="UTF-8"?>'
+                             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                             '<sitemap><loc>/sitemap-a.xml</loc></sitemap>'
+                             '<sitemap><loc>/sitemap-b.xml.gz</loc></sitemap></sitemapindex>',
+        'sitemap-a.xml': urlset(base, [('a.html', '2020-01-01'), ('private/secret.html', '2020-01-01')]),
+        'sitemap-b.xml.gz': gzip.compress(urlset(base, [('b.html', b_lastmod)]).encode('utf-8')),
+    }
+
+
+SITE = {
+    'index.html': '<html><body><a href="/private/other.html">private</a></body></html>',
+    'a.html': '<html><body><a href="b.html">b</a></body></html>',
+    'b.html': '<html><body>b</body></html>',
+    'private/secret.html': '<html><body>secret</body></html>',
+    'private/other.html': '<html><body>other</body></html>',
+}
+
+
+def test_seed_from_robots_and_sitemaps(site, tmp_path):
+    base = site(SITE, handler=RecordingHandler)
+    write_site(site.root, sitemap_files(base))
+    RecordingHandler.paths = []
+    make_crawler(base, tmp_path / 'out', max_pages=10, sitemaps=True).crawl()
+
+    pages = {rel for rel in read_tree(tmp_path / 'out') if rel.endswith('.html')}
+    assert pages == {'index.html', 'a.html', 'b.html'}
+    assert not any(path.startswith('/private/') for path in RecordingHandler.paths)
+    assert {'/robots.txt', '/sitemap_index.xml', '/sitemap-a.xml', '/sitemap-b.xml.gz'} <= set(RecordingHandler.paths)
+
+
+def test_max_pages_stops_seeding(site, tmp_path):
+    base = site(SITE)
+    write_site(site.root, sitemap_files(base))
+    make_crawler(base, tmp_path / 'out', max_pages=2, sitemaps=True).crawl()
+    pages = {rel for rel in read_tree(tmp_path / 'out') if rel.endswith('.html')}
+    assert len(pages) == 2 and 'index.html' in pages
+
+
+def test_unchanged_pages_not_refetched(site, tmp_path):
+    base = site(SITE, handler=RecordingHandler)
+    write_site(site.root, sitemap_files(base))
+    make_crawler(base, tmp_path / 'out', max_pages=10, sitemaps=True).crawl()
+    first = read_tree(tmp_path / 'out')
+
+    # lastmod 早于上次爬取的页面沿用已保存的HTML，b.html 的 lastmod 更新后重新抓取
+    write_site(site.root, sitemap_files(base, b_lastmod='2999-01-01'))
+    RecordingHandler.paths = []
+    make_crawler(base, tmp_path / 'out', max_pages=10, sitemaps=True).crawl()
+    assert '/a.html' not in RecordingHandler.paths
+    assert '/b.html' in RecordingHandler.paths
+    assert read_tree(tmp_path / 'out') == first
+
+
+def test_single_sitemap_url_string(site, tmp_path, capsys):
+    base = site(SITE)
+    write_site(site.root, sitemap_files(base))
+    make_crawler(base, tmp_path / 'out', max_pages=10, sitemaps=base + 'sitemap-a.xml').crawl()
+    assert '[FAIL]' not in capsys.readouterr().out
+    assert (tmp_path / 'out' / 'a.html').exists()
@@ -0,0 +1,68 @@
+"""流式下载：大文件分块写入临时文件后原子重命名，中断时不留下半截文件"""
+import os
+
+from conftest import QuietHandler, make_crawler
+import crawler_output
+
+BIG = bytes(range(256)) * 40
+
+
+class TruncatingHandler(QuietHandler):
+    """/broken.bin 声明的长度大于实际发送的内容，发送一部分后断开连接"""
+
+    def do_GET(self):
+        if self.path != '/broken.bin':
+            return super().do_GET()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(BIG) * 10))
+        self.end_headers()
+        self.wfile.write(BIG)
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def current_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def test_large_file_streamed(site, tmp_path):
+    base = site({'big.bin': BIG, 'small.txt': 'hello'})
+    crawler = make_crawler(base, tmp_path / 'out', chunk_size=256, max_in_memory=1024)
+    for name in ('big.bin', 'small.txt'):
+        local_path = str(tmp_path / 'out' / name)
+        assert crawler.download_file(base + name, local_path)
+        assert os.stat(local_path).st_mode & 0o777 == 0o666 & ~current_umask()
+    assert (tmp_path / 'out' / 'big.bin').read_bytes() == BIG
+    assert (tmp_path / 'out' / 'small.txt').read_bytes() == b'hello'
+    assert sorted(os.listdir(tmp_path / 'out')) == ['big.bin', 'small.txt']
+
+
+def test_interrupted_download_leaves_no_file(site, tmp_path):
+    base = site({}, handler=TruncatingHandler)
+    crawler = make_crawler(base, tmp_path / 'out', chunk_size=256, max_in_memory=1024)
+    os.makedirs(tmp_path / 'out')
+    assert not crawler.download_file(base + 'broken.bin', str(tmp_path / 'out' / 'broken.bin'))
+    assert os.listdir(tmp_path / 'out') == []
+    assert base + 'broken.bin' not in crawler.downloaded_urls
+
+
+def test_file_mode_never_changes_umask(monkeypatch):
+    def forbidden(mask):
+        raise AssertionError('os.umask 会修改整个进程的设置')
+
+    monkeypatch.setattr(os, 'umask', forbidden)
+    monkeypatch.setattr(crawler_output, '_file_mode_value', None)
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            umask = next(int(line.split()[1], 8) for line in f if line.startswith('Umask:'))
+        assert crawler_output._file_mode() == 0o666 & ~umask
+
+    # 没有 /proc 时使用默认权限
+    def no_proc(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(crawler_output, '_file_mode_value', None)
+    monkeypatch.setattr(crawler_output, 'open', no_proc, raising=False)
+    assert crawler_output._file_mode() == crawler_output._DEFAULT_FILE_MODE
@@ -0,0 +1,88 @@
+"""tar 输出：归档解包后与逐文件镜像一致，索引偏移可直接读出成员，半截记录在续写时被截掉"""
+import os
+import tarfile
+
+import pytest
+
+from conftest import make_crawler, read_tree
+from crawler_output import TarArchiveOutput
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/static/css/site.css">'
+                  '<script src="/static/js/app.js"></script></head>'
+                  '<body><img src="/static/img/logo.png"><a href="/about.html">about</a></body></html>',
+    'about.html': '<html><body><img src="static/img/logo.png"></body></html>',
+    'static/css/site.css': '.logo{background:url(/static/img/logo.png)}',
+    'static/js/app.js': 'var img="/static/img/logo.png";',
+    'static/img/logo.png': b'l' * 3000,
+}
+
+
+def untar(archive_path):
+    """按顺序解包，后出现的同名记录覆盖前面的（与 tar -x 相同）"""
+    tree = {}
+    with tarfile.open(archive_path) as tar:
+        for member in tar:
+            if member.isfile():
+                tree[member.name] = tar.extractfile(member).read()
+    return tree
+
+
+def read_indexed(archive_path):
+    index = TarArchiveOutput.load_index(archive_path)
+    tree = {}
+    with open(archive_path, 'rb') as f:
+        for rel, (offset, size) in index.items():
+            f.seek(offset)
+            tree[rel] = f.read(size)
+    return tree
+
+
+@pytest.mark.parametrize('mode', ['pipeline', 'walk'])
+def test_tar_matches_loose_files(site, tmp_path, mode):
+    base = site(SITE)
+    make_crawler(base, tmp_path / 'files', max_pages=5, rewrite_mode=mode).crawl()
+    make_crawler(base, tmp_path / 'tar', max_pages=5, rewrite_mode=mode, output='tar').crawl()
+
+    expected = read_tree(tmp_path / 'files')
+    archive = str(tmp_path / 'tar' / 'mirror.tar')
+    assert untar(archive) == expected
+    assert read_indexed(archive) == expected
+    # 索引文件过期时扫描 tar 头重建
+    os.remove(archive + TarArchiveOutput.INDEX_SUFFIX)
+    assert read_indexed(archive) == expected
+    assert not os.path.exists(tmp_path / 'tar' / '.staging')
+
+
+def test_truncated_archive_resumes(tmp_path):
+    root = str(tmp_path / 'out')
+    output = TarArchiveOutput(root)
+    output.open()
+    for rel, data in (('a.txt', b'a' * 700), ('b.txt', b'b' * 10)):
+        part = output.staging_path(os.path.join(root, rel), '.tmp')
+        with open(part, 'wb') as f:
+            f.write(data)
+        output.commit(part, os.path.join(root, rel))
+    output._tar.fileobj.flush()
+    output._reader.close()
+    # 模拟进程被杀死：没有包尾和索引，最后一条记录只写了一半
+    with open(output.archive_path, 'ab') as f:
+        info = tarfile.TarInfo('c.txt')
+        info.size = 4096
+        f.write(info.tobuf(tarfile.PAX_FORMAT) + b'c' * 100)
+
+    resumed = TarArchiveOutput(root)
+    resumed.open()
+    assert set(resumed.index) == {'a.txt', 'b.txt'}
+    part = resumed.staging_path(os.path.join(root, 'c.txt'), '.tmp')
+    with open(part, 'wb') as f:
+        f.write(b'c' * 5)
+    resumed.commit(part, os.path.join(root, 'c.txt'))
+    resumed.close()
+    assert untar(resumed.archive_path) == {'a.txt': b'a' * 700, 'b.txt': b'b' * 10, 'c.txt': b'c' * 5}
+    assert read_indexed(resumed.archive_path) == untar(resumed.archive_path)
+
+
+def test_tar_rejects_loose_file_features(tmp_path):
+    with pytest.raises(ValueError):
+        make_crawler('http://127.0.0.1/', tmp_path / 'out', output='tar', precompress=['gzip'])
@@ -0,0 +1,98 @@
+"""url_state 各后端：与 set/dict 行为一致，哈希冲突时结果仍然精确，镜像结果和爬取结束后的查询结果相同"""
+import os
+import pickle
+
+import pytest
+
+from conftest import make_crawler, read_tree
+from crawler_state import CompactPathMapping, CompactUrlSet, CrawlStateDB, SqlitePathMapping
+
+SITE = {
+    'index.html': '<html><head><link rel="stylesheet" href="/css/main.css"></head>'
+                  '<body><img src="/img/a.png"><img src="/img/%5Blocale%5D/b.png"></body></html>',
+    'css/main.css': '.a{background:url(/img/c.png)}',
+    'img/a.png': b'a' * 100,
+    'img/[locale]/b.png': b'b' * 100,
+    'img/c.png': b'c' * 100,
+}
+
+
+def test_url_set_exact_on_hash_collision(tmp_path, monkeypatch):
+    db = CrawlStateDB(str(tmp_path / 'state.sqlite'))
+    urls = CompactUrlSet(db)
+    monkeypatch.setattr(CompactUrlSet, 'url_hash', staticmethod(lambda url: 42))
+    urls.add('https://example.com/a.js')
+    urls.add('https://example.com/a.js')
+    assert 'https://example.com/a.js' in urls
+    assert 'https://example.com/b.js' not in urls
+    urls.add('https://example.com/b.js')
+    assert 'https://example.com/b.js' in urls and len(urls) == 2
+    db.close()
+    assert not os.path.exists(tmp_path / 'state.sqlite')
+
+
+@pytest.mark.parametrize('backend', ['compact', 'sqlite'])
+def test_path_mapping_matches_dict(tmp_path, backend):
+    db = CrawlStateDB(str(tmp_path / 'state.sqlite'))
+    mapping = CompactPathMapping() if backend == 'compact' else SqlitePathMapping(db)
+    mapping['/img/a.png'] = 'img/a.png'
+    mapping['/img/%5Blocale%5D/b.png'] = 'img/[locale]/b.png'
+    mapping['/b/a/app/js/main.js'] = 'js/main.js'
+    for key in ('/img/a.png', '/img/[locale]/b.png', '/img/%5Blocale%5D/b.png'):
+        assert key in mapping
+    assert mapping['/img/%5Blocale%5D/b.png'] == 'img/[locale]/b.png'
+    assert mapping.get('/b/a/app/js/main.js') == 'js/main.js'
+    assert mapping.get('/img/missing.png') is None and '/img/missing.png' not in mapping
+    with pytest.raises(KeyError):
+        mapping['/missing']
+    assert dict(mapping.items()) == {'/img/a.png': 'img/a.png', '/img/[locale]/b.png': 'img/[locale]/b.png',
+                                     '/b/a/app/js/main.js': 'js/main.js'}
+    assert len(mapping) == 3
+    if backend == 'sqlite':
+        # 重写子进程只读打开同一文件
+        copy = pickle.loads(pickle.dumps(mapping))
+        assert dict(copy.items()) == dict(mapping.items())
+        copy.db.close(remove=False)
+    db.close()
+
+
+def test_backends_produce_same_mirror(site, tmp_path):
+    base = site(SITE)
+    trees = {}
+    for backend in ('memory', 'compact', 'sqlite'):
+        with make_crawler(base, tmp_path / backend, url_state=backend) as crawler:
+            assert crawler.crawl()
+        trees[backend] = read_tree(tmp_path / backend)
+    assert trees['memory'] == trees['compact'] == trees['sqlite']
+    assert 'img/[locale]/b.png' in trees['memory']
+
+
+def snapshot(crawler, base):
+    urls = [f'{base}css/main.css', f'{base}img/a.png', f'{base}img/c.png', f'{base}img/missing.png']
+    paths = ['/img/a.png', '/img/%5Blocale%5D/b.png', '/img/[locale]/b.png', '/img/missing.png']
+    return ([url in crawler.downloaded_urls for url in urls],
+            [crawler.path_mapping.get(path) for path in paths],
+            len(crawler.downloaded_urls))
+
+
+def test_state_readable_after_crawl(site, tmp_path):
+    base = site(SITE)
+    results = {}
+    for backend in ('memory', 'compact', 'sqlite'):
+        with make_crawler(base, tmp_path / backend, url_state=backend) as crawler:
+            assert crawler.crawl()
+            results[backend] = snapshot(crawler, base)
+        assert not os.path.exists(os.path.join(tmp_path / backend, crawler.STATE_NAME))
+    assert results['memory'] == results['compact'] == results['sqlite']
+    assert results['memory'][0] == [True, True, True, False]
+    assert results['memory'][1] == ['img/a.png', 'img/[locale]/b.png', 'img/[locale]/b.png', None]
+
+
+@pytest.mark.parametrize('backend', ['compact', 'sqlite'])
+def test_close_removes_state_file(tmp_path, backend):
+    crawler = make_crawler('http://127.0.0.1:9/', tmp_path, url_state=backend)
+    path = os.path.join(tmp_path, crawler.STATE_NAME)
+    assert os.path.exists(path)
+    crawler.close()
+    crawler.close()
+    assert not os.path.exists(path)
@@ -1,14 +1,693 @@
+import io
 import os
+import posixpath
+import sys
+import json
+import mimetypes
+import multiprocessing
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse, parse_qs, unquote, quote
+from requests.adapters import HTTPAdapter
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, parse_qsl, unquote, quote, urlencode
+from urllib.robotparser import RobotFileParser
+from lxml import etree
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import tempfile
+import threading
 import time
+import random
 import re
 import hashlib
+import heapq
+import gzip
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from fnmatch import fnmatchcase
+from itertools import chain, count
+
+from crawler_config import BudgetConfig, CrawlConfig, DownloadConfig, NetworkConfig, ScopeConfig, StorageConfig
+from crawler_output import LooseFileOutput, TarArchiveOutput, _file_mode
+from crawler_state import CompactPathMapping, CompactUrlSet, CrawlStateDB, SqlitePathMapping
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# JS 中的 webpack publicPath / __webpack_public_path__ / Next.js assetPrefix 赋值（各含一个路径分组）
+_JS_PUBLIC_PATH_PATTERNS = [
+    r'\.p\s*=\s*["\'](/[^"\']*)["\']',
+    r'__webpack_public_path__\s*=\s*["\'](/[^"\']*)["\']',
+    r'assetPrefix\s*[=:]\s*["\'](/[^"\']*)["\']',
+]
+# 内联脚本中引号内以/开头的资源路径（排除 // 开头的协议相对路径和API路径）
+_QUOTED_ABS_PATH_RE = re.compile(r"""(['\"])(\/(?!\/|api\/|graphql)[a-zA-Z0-9_\-\.\/\%\[\]@]+\.[a-zA-Z0-9]+(?:\?[^'\"]*)?)\1""")
+# webpack 运行时中的 chunk 文件名函数：__webpack_require__.u（JS）/ .miniCssF（CSS）
+_WEBPACK_CHUNK_FN_RE = re.compile(r'\.(?:u|miniCssF)\s*=\s*(?:function\s*\(\s*([\w$]+)\s*\)\s*\{\s*return\s*'
+                                  r'|\(?\s*([\w$]+)\s*\)?\s*=>\s*)')
+# Next.js 构建清单等文件中相对于 /_next/ 的静态资源路径
+_NEXT_STATIC_PATH_RE = re.compile(r'["\'](static/(?:chunks|css|media)/[^"\'\s]+?\.(?:js|css|woff2?|ttf|otf|png|jpe?g|gif|svg|webp|avif))["\']')
+# _ssgManifest.js 中的静态生成路由
+_SSG_MANIFEST_RE = re.compile(r'__SSG_MANIFEST\s*=\s*new\s+Set\(\s*\[(.*?)\]\s*\)', re.S)
+_OBJECT_ENTRY_RE = re.compile(r'(?:"([^"]*)"|\'([^\']*)\'|([\w$]+))\s*:\s*(?:"([^"]*)"|\'([^\']*)\')')
+# 预压缩输出的文件类型（图片、字体、视频等已压缩格式不处理）
+_COMPRESSIBLE_EXTS = frozenset({'.html', '.htm', '.css', '.js', '.mjs', '.json', '.svg', '.xml', '.txt',
+                                '.map', '.ico', '.ttf', '.otf', '.eot', '.webmanifest'})
+_CONTENT_RANGE_RE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+)')
+# 跨域绝对URL的协议和host部分：(https:)//host/，或JSON转义的 https:\/\/host\/（分组为转义反斜杠和 host）
+_HOST_URL_RE = re.compile(r'(?:https?:)?(\\*)/\1/([A-Za-z0-9.-]+(?::\d+)?)\1/')
+# sitemap 协议的命名空间（<image:loc> 等扩展标签不属于此命名空间）
+_SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+_RESOURCE_EXT_RE = re.compile(r'\.(js|css|png|jpg|jpeg|gif|svg|woff2?|ttf|eot|otf|json|webp|ico|mp4|webm)(\?|$)')
+# 开始标签中的标签名与属性（HtmlDocument 用来定位属性值的偏移）。复制自 CPython 3.11 html.parser 的
+# tagfind_tolerant / attrfind_tolerant（私有名称，不同版本可能改动）；与当前解释器 HTMLParser 的属性切分
+# 是否一致由 tests/test_html_splice.py 验证
+_TAG_NAME_RE = re.compile(r'([a-zA-Z][^\t\n\r\f />\x00]*)(?:\s|/(?!>))*')
+_TAG_ATTR_RE = re.compile(
+    r'((?<=[\'"\s/])[^\s/>][^\s/=>]*)(\s*=+\s*'
+    r'(\'[^\']*\'|"[^"]*"|(?![\'"])[^>\s]*))?(?:\s|/(?!>))*')
+
+def _relative_to_page(path, page_dir):
+    """相对于站点根的本地路径 -> 相对于 page_dir 中页面的路径（保留查询参数和片段）
+
+    外部链接、协议相对URL、页内锚点等非本地路径原样返回
+    """
+    if not page_dir or not path or path.startswith(('/', '#', '?')) or re.match(r'[A-Za-z][\w+.-]*:', path):
+        return path
+    target, sep, suffix = path.partition('?') if '?' in path else path.partition('#')
+    relative = posixpath.relpath(target or '.', page_dir)
+    if not target or target.endswith('/'):
+        relative += '/'
+    return relative + sep + suffix
+
+
+class TokenBucket:
+    """令牌桶限速器：按 rate 个/秒补充令牌，最多积攒 capacity 个（允许突发）"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """取走令牌，令牌不足时阻塞等待（超过 capacity 的请求在桶满时取走，差额记为欠账）"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= min(tokens, self.capacity):
+                    self.tokens -= tokens
+                    return
+                wait = (min(tokens, self.capacity) - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """跨进程共享的令牌桶：令牌数和更新时间保存在共享内存中（批量模式下所有爬虫进程共用一个带宽额度）"""
+
+    def __init__(self, rate, capacity=None, context=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1.0, self.rate))
+        self.state = (context or multiprocessing).Array('d', [self.capacity, time.monotonic()])
+        self.lock = self.state.get_lock()
+
+    @property
+    def tokens(self):
+        return self.state[0]
+
+    @tokens.setter
+    def tokens(self, value):
+        self.state[0] = value
+
+    @property
+    def updated(self):
+        return self.state[1]
+
+    @updated.setter
+    def updated(self, value):
+        self.state[1] = value
+
+
+class AdaptiveLimiter:
+    """单个host的 AIMD 并发控制器
+
+    每完成约 limit 个延迟平稳的请求，并发上限加 1（加性增）；遇到 429/503、连接错误或
+    首字节延迟超过基线 latency_factor 倍时上限减半（乘性减，每个基线延迟周期内最多一次）。
+    Retry-After 期间该host不再发出新请求。adaptive=False 时上限固定为 initial
+    """
+
+    def __init__(self, initial, maximum, adaptive=True, latency_factor=3.0):
+        self.limit = float(max(1, min(initial, maximum)))
+        self.maximum = max(1, maximum)
+        self.adaptive = adaptive
+        self.latency_factor = latency_factor
+        self.active = 0
+        self.baseline = None
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        """占用一个并发名额，超过当前上限或处于 Retry-After 期间时阻塞"""
+        with self.cond:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait > 0:
+                    self.cond.wait(wait)
+                elif self.active < int(self.limit):
+                    self.active += 1
+                    return
+                else:
+                    self.cond.wait()
+
+    def release(self, latency=None, throttled=False, retry_after=None):
+        """归还名额并根据本次请求的结果调整上限，返回调整后的整数上限"""
+        with self.cond:
+            self.active -= 1
+            now = time.monotonic()
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            if self.adaptive:
+                congested = throttled or (latency is not None and self.baseline is not None
+                                          and latency > self.baseline * self.latency_factor)
+                if congested:
+                    if now - self.last_decrease > (self.baseline or 0.1):
+                        self.limit = max(1.0, self.limit / 2)
+                        self.last_decrease = now
+                elif latency is not None:
+                    self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+                if latency is not None and not throttled:
+                    # 基线跟随较慢，短暂的延迟尖峰不会立即抬高基线
+                    self.baseline = latency if self.baseline is None else self.baseline * 0.9 + latency * 0.1
+            self.cond.notify_all()
+            return int(self.limit)
+
+
+class FilenameIndex:
+    """输出目录的文件名索引，替代逐次 os.walk 查找
+
+    按扩展名分桶保存 (文件名主干, 相对路径)。查找语义与目录遍历一致：扩展名相同且主干包含目标主干的文件
+    （精确同名是其特例）；有多个匹配时按排序后的 os.walk 顺序（同一目录中文件先于子目录、名称按字典序）
+    取第一个，结果只取决于已登记的文件集合，与扫描和并发下载落盘的先后无关。
+
+    每个桶维护主干的三字母组倒排表，查找时只检查含有目标主干中最少见的三字母组的条目
+    （目标主干不足 3 个字符时逐个比较整个桶）。查询结果按文件名缓存；已缓存的查询按其主干中
+    最少见的三字母组登记，新文件登记时只与该三字母组出现在新文件主干中的查询比较
+    """
+
+    def __init__(self):
+        self.seeded = False
+        self._paths = set()
+        # 登记顺序（用于把索引原样复制到其他进程）
+        self.ordered_paths = []
+        # 扩展名 -> [(主干, 相对路径)]
+        self._by_ext = {}
+        # 扩展名 -> {三字母组: [条目下标]}
+        self._grams = {}
+        # 扩展名 -> {文件名: (排序键, 相对路径) 或 None（未命中）}
+        self._cache = {}
+        # 扩展名 -> {查询主干开头的三字母组（不足 3 个字符为 ''）: [(文件名, 查询主干)]}
+        self._queries = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def walk_key(rel_path):
+        """排序后的 os.walk 顺序：逐级比较，同一目录中文件（0）先于子目录（1）"""
+        parts = rel_path.split('/')
+        return [(1, part) for part in parts[:-1]] + [(0, parts[-1])]
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, rel_path):
+        """登记一个已落盘的文件（相对 output_folder 的路径）"""
+        name = rel_path.rsplit('/', 1)[-1]
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        with self.lock:
+            if rel_path in self._paths:
+                return
+            self._paths.add(rel_path)
+            self.ordered_paths.append(rel_path)
+            entries = self._by_ext.setdefault(ext, [])
+            grams = self._grams.setdefault(ext, {})
+            for gram in self._trigrams(stem):
+                grams.setdefault(gram, []).append(len(entries))
+            entries.append((stem, rel_path))
+
+            queries = self._queries.get(ext)
+            if not queries:
+                return
+            # 可能被新文件命中的已缓存查询：主干过短的，以及登记键出现在新文件主干中的
+            candidates = list(queries.get('', ()))
+            for gram in self._trigrams(stem):
+                candidates.extend(queries.get(gram, ()))
+            cached = self._cache[ext]
+            key = None
+            for filename, query_stem in candidates:
+                if query_stem in stem:
+                    key = key or self.walk_key(rel_path)
+                    hit = cached[filename]
+                    if hit is None or key < hit[0]:
+                        cached[filename] = (key, rel_path)
+
+    def scan(self, folder, files=None):
+        """登记目录中已有的文件（例如上次运行留下的文件）；
+        files 为输出后端列出的文件路径，省略时直接遍历目录"""
+        if files is None:
+            files = LooseFileOutput(folder).iter_files()
+        for filepath in files:
+            self.add(os.path.relpath(filepath, folder).replace('\\', '/'))
+        self.seeded = True
+
+    def _candidates(self, ext, file_base):
+        """同扩展名中可能包含 file_base 的条目：file_base 中最少见的三字母组所在的条目"""
+        entries = self._by_ext.get(ext, ())
+        if len(file_base) < 3:
+            return entries
+        grams = self._grams.get(ext, {})
+        rarest = min((grams.get(gram, ()) for gram in self._trigrams(file_base)), key=len)
+        return [entries[i] for i in rarest]
+
+    def _query_key(self, ext, file_base):
+        """已缓存查询的登记键：主干中目前最少见的三字母组（不足 3 个字符为 ''）
+
+        文件主干包含查询主干时必然含有它的每个三字母组，取最少见的一个可让登记新文件时比较的查询最少
+        """
+        if len(file_base) < 3:
+            return ''
+        grams = self._grams.get(ext, {})
+        return min(sorted(self._trigrams(file_base)), key=lambda gram: len(grams.get(gram, ())))
+
+    def find(self, filename):
+        """返回排序后遍历顺序中第一个匹配的相对路径，没有则返回 None"""
+        if not filename:
+            return None
+        file_base, file_ext = os.path.splitext(filename)
+        file_ext = file_ext.lower()
+        with self.lock:
+            cached = self._cache.setdefault(file_ext, {})
+            if filename not in cached:
+                matches = [(self.walk_key(rel_path), rel_path)
+                           for stem, rel_path in self._candidates(file_ext, file_base) if file_base in stem]
+                cached[filename] = min(matches) if matches else None
+                self._queries.setdefault(file_ext, {}).setdefault(self._query_key(file_ext, file_base),
+                                                                  []).append((filename, file_base))
+            hit = cached[filename]
+            return hit[1] if hit else None
+
+
+class BlobStore:
+    """内容寻址的共享文件仓库：每份内容按 sha256 只保存一份（<root>/ab/<sha256>），
+    镜像目录中的文件是指向仓库文件的硬链接。多个镜像目录共用一个仓库时，相同内容不会重复占用磁盘。
+
+    注意：仓库文件与镜像文件是同一个 inode，镜像中的文件只能整体替换（写临时文件后 os.replace），
+    不能原地修改，否则会改坏所有共享该内容的镜像
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        # files: 经过仓库的文件数；hits: 内容已存在、直接硬链接的文件数；
+        # bytes_saved: 因去重少占用的字节数；fallbacks: 无法硬链接（如跨文件系统）而保留独立副本的文件数
+        self.stats = {'files': 0, 'hits': 0, 'new_blobs': 0, 'bytes_saved': 0, 'fallbacks': 0}
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _count(self, key, size=0):
+        with self.lock:
+            self.stats['files'] += 1
+            self.stats[key] += 1
+            if key == 'hits':
+                self.stats['bytes_saved'] += size
+
+    def link(self, digest, local_path):
+        """仓库中已有该内容时，把 local_path 原子替换为指向它的硬链接，返回是否成功"""
+        blob = self.blob_path(digest)
+        if not os.path.isfile(blob):
+            return False
+        tmp_path = f"{local_path}.{threading.get_ident()}.{time.monotonic_ns()}.part"
+        try:
+            os.link(blob, tmp_path)
+            os.replace(tmp_path, local_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self._count('hits', os.path.getsize(blob))
+        return True
+
+    def adopt(self, tmp_path, digest, local_path):
+        """把刚写好的临时文件放到 local_path，并登记进仓库（已存在则改为链接仓库中的那一份）"""
+        if self.link(digest, local_path):
+            os.remove(tmp_path)
+            return
+        blob = self.blob_path(digest)
+        try:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(tmp_path, blob)
+            self._count('new_blobs')
+        except FileExistsError:
+            # 其他线程/进程刚刚登记了同样的内容
+            if self.link(digest, local_path):
+                os.remove(tmp_path)
+                return
+            self._count('fallbacks')
+        except OSError:
+            self._count('fallbacks')
+        os.replace(tmp_path, local_path)
+
+
+class CrawlJournal:
+    """断点续爬日志：追加写入的 JSONL 文件，每条记录一行，写入后立即 flush
+
+    进程被杀死时已 flush 的记录仍在系统缓存中；每完成一个页面 fsync 一次以防断电。
+    回放时忽略最后一行可能被截断的记录
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._file = None
+
+    def open(self, truncate=False):
+        self._file = open(self.path, 'w' if truncate else 'a', encoding='utf-8')
+
+    def write(self, record_type, **fields):
+        if self._file is None:
+            return
+        line = json.dumps(dict(fields, t=record_type), ensure_ascii=False)
+        with self.lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def sync(self):
+        if self._file is not None:
+            with self.lock:
+                os.fsync(self._file.fileno())
+
+    def close(self, remove=False):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def replay(self):
+        """读取日志中的全部有效记录"""
+        records = []
+        if not os.path.isfile(self.path):
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # 崩溃时写了一半的行
+                    continue
+        return records
+
+
+class CrawlMetrics:
+    """结构化指标：逐URL的下载事件、各阶段耗时和逐文件的重写耗时
+
+    sink 为 JSONL 文件路径（每个事件一行）或回调函数（接收事件字典，可能在下载线程中调用）；
+    为 None 时不输出事件，只在内存中汇总，供爬取结束时打印
+    """
+
+    def __init__(self, sink=None):
+        self.path = None if sink is None or callable(sink) else sink
+        self.callback = sink if callable(sink) else None
+        self.lock = threading.Lock()
+        self._file = None
+        self.stages = {}
+        self.rewrites = {}
+        self.requests = {'count': 0, 'failed': 0, 'bytes': 0, 'queue_wait': 0.0, 'ttfb': 0.0, 'transfer': 0.0}
+
+    @property
+    def enabled(self):
+        return self.path is not None or self.callback is not None
+
+    def open(self):
+        if self.path is not None and self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def emit(self, event, **fields):
+        if not self.enabled:
+            return
+        record = {'event': event, 'ts': round(time.time(), 6), **fields}
+        with self.lock:
+            if self._file is not None:
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if self.callback is not None:
+                self.callback(record)
+
+    def request(self, url, status, size=0, queue_wait=0.0, ttfb=0.0, transfer=0.0, **fields):
+        """记录一次资源请求：排队等待（调度队列+限速+host并发）、首字节时间（含DNS/建连）、响应体传输与写盘时间"""
+        with self.lock:
+            totals = self.requests
+            totals['count'] += 1
+            totals['failed'] += status is None or status >= 400
+            totals['bytes'] += size
+            totals['queue_wait'] += queue_wait
+            totals['ttfb'] += ttfb
+            totals['transfer'] += transfer
+        self.emit('request', url=url, status=status, bytes=size, queue_wait=round(queue_wait, 6),
+                  ttfb=round(ttfb, 6), transfer=round(transfer, 6), **fields)
+
+    def rewrite(self, kind, path, seconds, size, changed):
+        """记录单个文件的路径重写耗时"""
+        with self.lock:
+            totals = self.rewrites.setdefault(kind, {'files': 0, 'changed': 0, 'seconds': 0.0, 'bytes': 0})
+            totals['files'] += 1
+            totals['changed'] += bool(changed)
+            totals['seconds'] += seconds
+            totals['bytes'] += size
+        self.emit('rewrite', kind=kind, path=path, seconds=round(seconds, 6), bytes=size, changed=changed)
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """统计一个阶段的耗时（同一阶段多次出现时累加，如每个页面的 download）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+            self.emit('stage', stage=stage, seconds=round(elapsed, 6), **fields)
+
+    def summary(self):
+        with self.lock:
+            return {
+                'stages': {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+                'requests': dict(self.requests),
+                'rewrites': {kind: dict(totals) for kind, totals in self.rewrites.items()},
+            }
+
+    def close(self):
+        if self.enabled:
+            self.emit('summary', **self.summary())
+        if self._file is not None:
+            with self.lock:
+                self._file.close()
+                self._file = None
+
+
+class HtmlTag:
+    """HtmlDocument 中的一个开始标签：属性值（已解码）及其在原文中的位置"""
+
+    __slots__ = ('name', 'attrs', 'spans', 'start', 'end', 'content_start', 'content_end', 'container')
+
+    def __init__(self, name, start, end):
+        self.name = name
+        self.attrs = {}
+        # 属性名 -> (值起始偏移, 值结束偏移, 引号字符)；无引号时引号字符为空串，
+        # 无值属性的起止偏移均为属性名的结尾位置、引号字符为 None
+        self.spans = {}
+        self.start = start
+        self.end = end
+        # <style>/<script> 的原始内容位置
+        self.content_start = None
+        self.content_end = None
+        # 所在的 <picture>/<video>/<audio> 开始标签（不在其中时为 None）
+        self.container = None
+
+    def get(self, name, default=None):
+        value = self.attrs.get(name)
+        return default if value is None else value
+
+    def has(self, name):
+        return name in self.attrs
+
+
+class HtmlDocument(HTMLParser):
+    """单次解析HTML：记录每个开始标签的属性及其在原文中的偏移，以及 <style>/<script> 内容的位置
+
+    资源发现和路径重写共用同一次解析；重写时只把改动过的属性值/内容按偏移拼回原文，
+    其余字节（空白、属性顺序、引号风格等）保持原样
+    """
+
+    # 记录子标签归属的元素（<source>/<img> 按所在的 <picture>/<video>/<audio> 分组）
+    MEDIA_CONTAINERS = ('picture', 'video', 'audio')
+
+    def __init__(self, html_content):
+        super().__init__(convert_charrefs=True)
+        self.html = html_content
+        self.tags = []
+        self._line_starts = [0] + [m.end() for m in re.finditer('\n', html_content)]
+        self._raw_tag = None
+        self._containers = []
+        self.feed(html_content)
+        self.close()
+        if self._raw_tag is not None:
+            # 未闭合的 <script>/<style>：内容一直到文档结尾
+            self._raw_tag.content_end = len(html_content)
+            self._raw_tag = None
+
+    def _offset(self):
+        line, column = self.getpos()
+        return self._line_starts[line - 1] + column
+
+    def _add_tag(self, name, attrs):
+        start = self._offset()
+        raw = self.get_starttag_text()
+        tag = HtmlTag(name, start, start + len(raw))
+        # 与 HTMLParser.parse_starttag 相同的方式扫描属性，额外记录属性值的位置
+        k = _TAG_NAME_RE.match(raw, 1).end()
+        while k < len(raw):
+            m = _TAG_ATTR_RE.match(raw, k)
+            if not m:
+                break
+            attr_name = m.group(1).lower()
+            value = m.group(3)
+            if value is None:
+                # 无值属性：编辑插入在属性名之后（仍在标签内）
+                name_end = start + m.end(1)
+                span = (name_end, name_end, None)
+            elif value[:1] in ('"', "'") and value[:1] == value[-1:] and len(value) > 1:
+                span = (start + m.start(3) + 1, start + m.end(3) - 1, value[0])
+            else:
+                span = (start + m.start(3), start + m.end(3), '')
+            tag.spans[attr_name] = span
+            k = m.end()
+        # 重复属性以最后一个为准（与 BeautifulSoup 一致）
+        tag.attrs = dict(attrs)
+        if self._containers:
+            tag.container = self._containers[-1]
+        self.tags.append(tag)
+        return tag
+
+    def handle_starttag(self, name, attrs):
+        tag = self._add_tag(name, attrs)
+        if name in self.CDATA_CONTENT_ELEMENTS:
+            tag.content_start = tag.end
+            self._raw_tag = tag
+        elif name in self.MEDIA_CONTAINERS:
+            self._containers.append(tag)
+
+    def handle_startendtag(self, name, attrs):
+        self._add_tag(name, attrs)
+
+    def handle_endtag(self, name):
+        if self._raw_tag is not None and self._raw_tag.name == name:
+            self._raw_tag.content_end = self._offset()
+            self._raw_tag = None
+        elif self._containers and self._containers[-1].name == name:
+            self._containers.pop()
+
+    def find_all(self, *names, attr=None):
+        """按标签名（可选：必须含有某属性）筛选开始标签"""
+        return [tag for tag in self.tags
+                if (not names or tag.name in names) and (attr is None or attr in tag.attrs)]
+
+    def content(self, tag):
+        """<style>/<script> 的原始文本"""
+        if tag.content_start is None:
+            return None
+        return self.html[tag.content_start:tag.content_end]
+
+    def attr_edit(self, tag, name, value):
+        """生成替换属性值的编辑 (start, end, text)"""
+        start, end, quote_char = tag.spans[name]
+        escaped = value.replace('&', '&amp;')
+        if quote_char:
+            escaped = escaped.replace(quote_char, '&quot;' if quote_char == '"' else '&#x27;')
+            return start, end, escaped
+        # 原值无引号或无值时统一补上双引号
+        escaped = '"' + escaped.replace('"', '&quot;') + '"'
+        if quote_char is None:
+            return start, end, f'={escaped}'
+        return start, end, escaped
+
+    def splice(self, edits):
+        """按偏移把编辑拼回原文"""
+        parts = []
+        position = 0
+        for start, end, text in sorted(edits, key=lambda e: e[0]):
+            parts.append(self.html[position:start])
+            parts.append(text)
+            position = end
+        parts.append(self.html[position:])
+        return ''.join(parts)
+
+
+class BudgetExceeded(Exception):
+    """资源超过 max_sizes 中该类型的大小上限或超出 byte_budget，跳过下载"""
+
+    def __init__(self, message, reason, size=None):
+        super().__init__(message)
+        # 'oversize' / 'over_budget'；size 为响应头给出的文件大小（未发出请求时为 None）
+        self.reason = reason
+        self.size = size
 
 
 class WebsiteCrawler:
-    def __init__(self, url, output_folder='crawled_website'):
+    # 增量爬取清单文件名（保存在 output_folder 下）
+    MANIFEST_NAME = '.crawl_manifest.json'
+    # 断点续爬日志文件名（保存在 output_folder 下，爬取正常结束后删除）
+    JOURNAL_NAME = '.crawl_journal.jsonl'
+    # profile='cprofile' 时的性能分析结果文件名（保存在 output_folder 下，可用 pstats / snakeviz 查看）
+    PROFILE_NAME = '.crawl_profile.prof'
+    # 批量模式下每个站点的控制台输出（保存在 output_folder 下）
+    LOG_NAME = '.crawl_log.txt'
+    # url_state='compact' / 'sqlite' 时的URL状态文件（保存在 output_folder 下，调用 close() 时删除）
+    STATE_NAME = '.crawl_state.sqlite'
+    # 可重试的HTTP状态码（限流和临时性服务端错误）
+    RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+    # 依赖图调度的优先级（数字越小越先下载）：CSS 会引出更多资源，位于关键路径上
+    RESOURCE_PRIORITY = {'css': 0, 'js': 1, 'font': 2, 'image': 3, 'other': 4, 'media': 5}
+    # 跨域镜像资源的存放目录（output_folder/_hosts/<host>/<原路径>）
+    MIRROR_HOSTS_DIR = '_hosts'
+    # select_variants=True 时 <picture>/<video>/<audio> 保留格式的默认优先顺序
+    PREFERRED_FORMATS = ('image/webp', 'image/avif', 'image/jpeg', 'image/png', 'video/mp4', 'video/webm',
+                         'audio/mpeg', 'audio/ogg')
+    # 计入 byte_budget 的资源类型（CSS/JS/字体是渲染所必需的，不受总预算限制）
+    BUDGET_KINDS = frozenset({'image', 'media'})
+
+    def __init__(self, url, output_folder='crawled_website', config=None, **options):
+        """url 为起始页面，output_folder 为镜像目录
+
+        config 为 CrawlConfig（分组的选项，见 crawler_config）；关键字参数可以是分组名或任一组中的选项名，
+        在 config 的基础上覆盖，例如 WebsiteCrawler(url, folder, max_workers=4, scope=ScopeConfig(max_pages=50))
+        """
+        config = (config or CrawlConfig()).with_options(**options)
+        self.config = config
+        network, download, scope, storage, budget = (config.network, config.download, config.scope,
+                                                      config.storage, config.budget)
         self.base_url = url
         self.parsed_base = urlparse(url)
         self.base_origin = f"{self.parsed_base.scheme}://{self.parsed_base.netloc}"
@@ -21,55 +700,1031 @@ class WebsiteCrawler:
         self.downloaded_urls = set()
         # 资源路径映射：原始绝对路径 -> 相对于output_folder的本地路径
         self.path_mapping = {}
+        # URL状态后端：'memory' 为普通 set/dict；'compact' 时已下载URL集合只在内存中保存 64 位哈希
+        # （原文在 output_folder 下的 SQLite 文件中，用于哈希命中时精确确认），路径映射按目录压缩；
+        # 'sqlite' 在 compact 的基础上把路径映射也放到 SQLite 中。适用于百万级资源的爬取
+        if storage.url_state not in ('memory', 'compact', 'sqlite'):
+            raise ValueError(f"未知的 url_state: {storage.url_state}")
+        self.state_db = None
+        if storage.url_state != 'memory':
+            os.makedirs(output_folder, exist_ok=True)
+            self.state_db = CrawlStateDB(os.path.join(output_folder, self.STATE_NAME))
+            self.downloaded_urls = CompactUrlSet(self.state_db)
+            self.path_mapping = (CompactPathMapping() if storage.url_state == 'compact'
+                                 else SqlitePathMapping(self.state_db))
         # 站点资源前缀：检测到的绝对路径前缀（如 /b/a/ecom-website/.../）
         self.detected_prefixes = set()
 
-    def create_folder_structure(self, file_path):
-        """创建文件夹结构"""
-        directory = os.path.dirname(file_path)
-        if directory and not os.path.exists(directory):
-            os.makedirs(directory, exist_ok=True)
+        # 并发下载配置：线程数、单个host的初始并发上限、令牌桶限速（每秒请求数，None/0 表示不限速）
+        self.max_workers = max(1, int(network.max_workers))
+        self.per_host_limit = max(1, int(network.per_host_limit))
+        self.rate_limiter = TokenBucket(network.rate_limit, network.rate_burst) if network.rate_limit else None
+        # 带宽上限：bandwidth_limit 为每秒字节数，或可被多个爬虫共用的令牌桶（如 SharedTokenBucket）；
+        # connection_limit 为多个爬虫共用的信号量，限制同时进行的请求总数（批量模式的全局上限）
+        bandwidth_limit = network.bandwidth_limit
+        if isinstance(bandwidth_limit, (int, float)):
+            bandwidth_limit = TokenBucket(bandwidth_limit, max(bandwidth_limit, download.chunk_size)) if bandwidth_limit else None
+        self.bandwidth_limiter = bandwidth_limit
+        self.connection_limit = network.connection_limit
+        # 带宽预算模式：select_variants=True 时每个 srcset 只下载一个候选（w 描述符取不小于 target_width 的
+        # 最小宽度，x 描述符取不小于 target_density 的最小密度，都没有时取最大的），每个 <picture> 只下载
+        # preferred_formats 中最靠前的一种格式，每个 <video>/<audio> 只下载一个 <source>；
+        # 被跳过的候选在HTML中重写为保留的文件。max_sizes 为 类型(image/media/font/css/js) -> 字节上限，
+        # byte_budget 为图片和媒体文件的总字节预算；按响应头的大小提前判断，超出的文件不下载
+        self.select_variants = budget.select_variants
+        self.target_width = budget.target_width
+        self.target_density = budget.target_density
+        self.preferred_formats = tuple(budget.preferred_formats or self.PREFERRED_FORMATS)
+        self.max_sizes = dict(budget.max_sizes or {})
+        self.byte_budget = budget.byte_budget
+        # 被跳过的变体URL -> 保留的URL；保留的URL -> 其 srcset 描述符；已在某个页面中保留过的变体（之后不再映射到其他文件）
+        self.variant_mapping = {}
+        self.variant_descriptors = {}
+        self._kept_variants = set()
+        # 预算统计：已计入预算的字节数、超过大小上限 / 超出总预算而跳过的文件数和字节数
+        self.budget_stats = {'used': 0, 'oversize': 0, 'over_budget': 0, 'bytes_avoided': 0}
+        # adaptive=True 时每个host的并发上限按 AIMD 在 1..max_workers 之间调整；
+        # 429/5xx 和连接错误最多重试 max_retries 次（指数退避 + 抖动，优先遵守 Retry-After）
+        self.adaptive = network.adaptive
+        self.max_retries = max(0, int(network.max_retries))
+        self.retry_backoff = network.retry_backoff
+        self.timeout = network.timeout
+        # 连接池固定为单个host可能达到的最大并发（AIMD 上限不超过 max_workers），
+        # 实际并发由每个host的 AdaptiveLimiter 控制，池中多出的连接只是空闲
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # 流式下载配置：分块大小、单个响应体允许留在内存中的最大字节数（超出则边下边写临时文件）
+        self.chunk_size = max(1, int(download.chunk_size))
+        self.max_in_memory = max(0, int(download.max_in_memory))
+        # 保护 downloaded_urls / path_mapping 等共享状态
+        self._state_lock = threading.Lock()
+        # 正在下载中的URL -> Event，让重复请求等待第一次下载的结果
+        self._inflight = {}
+        # host -> AdaptiveLimiter，控制单个host的并发
+        self._host_limiters = {}
+
+        # 跨域镜像：mirror_hosts 为允许镜像的其他host（支持 *.cdn.example.com 形式的通配符），
+        # 其资源保存到 _hosts/<host>/ 下并重写引用；每个host使用独立的会话和连接池，
+        # 同时最多占用 mirror_host_workers 个下载线程（默认 max_workers 的一半），慢速CDN不会挤占主站
+        self.mirror_hosts = tuple(pattern.lower() for pattern in (scope.mirror_hosts or ()))
+        self.mirror_host_workers = max(1, int(scope.mirror_host_workers or self.max_workers // 2))
+        # netloc -> 是否允许镜像
+        self._mirror_host_cache = {}
+        # 跨域镜像host -> 独立的 requests.Session
+        self._host_sessions = {}
+
+        # 增量爬取：上次运行的清单（URL -> ETag/Last-Modified/sha256/本地路径），用于条件请求
+        self.incremental = config.incremental
+        self.manifest_path = os.path.join(output_folder, self.MANIFEST_NAME)
+        self.previous_manifest = {'entries': {}, 'contexts': {}, 'compressed': {}, 'pages': {}, 'crawled_at': None}
+        # 本次爬取的开始时间（UTC，ISO 8601），作为下次 sitemap lastmod 过滤的默认基准
+        self.crawled_at = None
+        self.manifest_entries = {}
+        # 本次运行中内容未变化（304 或内容哈希相同）的本地文件，重写阶段可跳过
+        self.unchanged_files = set()
+        # 重写阶段的上下文指纹（detected_prefixes / path_mapping 的哈希）
+        self.rewrite_contexts = {}
+
+        # 已落盘文件的文件名索引，供 CSS url() 按文件名查找
+        self.file_index = FilenameIndex()
+
+        # 路径重写方式：
+        #   pipeline - 下载时在内存中重写JS/CSS后只写一次；CSS依赖后续下载的资源，延迟到下载结束后写入
+        #   walk     - 先原样落盘，下载结束后遍历整个输出目录读回重写
+        #   process  - 同 walk，但重写阶段在进程池中并行（正则重写是CPU密集型，线程受GIL限制）
+        if storage.rewrite_mode not in ('pipeline', 'walk', 'process'):
+            raise ValueError(f"未知的 rewrite_mode: {storage.rewrite_mode}")
+        self.rewrite_mode = storage.rewrite_mode
+        self.rewrite_processes = storage.rewrite_processes or os.cpu_count() or 1
+        # 输出后端：'files' 为逐文件落盘；'tar' 把所有资源顺序追加到 output_folder/<archive_name>，
+        # 附带偏移索引（清单、日志仍为 output_folder 下的独立文件）
+        if storage.output not in ('files', 'tar'):
+            raise ValueError(f"未知的 output: {storage.output}")
+        if storage.output == 'tar':
+            # 硬链接去重、预压缩同名文件和多进程重写都要求资源是独立文件
+            if download.blob_store or storage.precompress or storage.rewrite_mode == 'process':
+                raise ValueError("output='tar' 不支持 blob_store、precompress 和 rewrite_mode='process'")
+            self.output = TarArchiveOutput(output_folder, storage.archive_name)
+        else:
+            self.output = LooseFileOutput(output_folder)
+
+        # 预压缩输出：precompress 为编码列表（'gzip'、'br'），为 CSS/JS/HTML/SVG 等不小于 compress_min_size
+        # 的文件生成 .gz / .br 同名文件，供 nginx gzip_static / brotli_static 直接发送；进程数同 rewrite_processes。
+        # 源文件内容哈希与上次相同且压缩文件仍在时跳过
+        self.precompress = tuple(storage.precompress or ())
+        for encoding in self.precompress:
+            if encoding not in ('gzip', 'br'):
+                raise ValueError(f"未知的预压缩编码: {encoding}")
+        if 'br' in self.precompress and brotli is None:
+            print("  [SKIP] 未安装 brotli，不生成 .br 文件（pip install brotli）")
+            self.precompress = tuple(encoding for encoding in self.precompress if encoding != 'br')
+        self.compress_min_size = storage.compress_min_size
+        # 本次运行的预压缩记录：相对路径 -> 源文件 sha256
+        self.compressed_files = {}
+        # 延迟重写的CSS：本地路径 -> 原始内容（bytes；None 表示已原样落盘，需读回）
+        self._pending_css = {}
+        # 路径重写用的组合正则缓存：(前缀集合, 编译结果)
+        self._matchers = None
+        # 本次运行中重写过的JS文件 -> 重写时的前缀集合（None 表示未知，如从断点日志恢复的文件）；
+        # pipeline 模式在后续页面检测到新前缀时据此重新修复，结果与下载结束后统一重写一致
+        self._js_rewrite_prefixes = {}
+
+        # 多页面爬取：沿同源 <a href> 广度优先抓取，max_depth=0 / max_pages=1 即只抓取 base_url
+        # query_policy：'drop' 忽略查询参数（同一路径视为同一页面），'keep' 保留排序后的查询参数
+        if scope.query_policy not in ('drop', 'keep'):
+            raise ValueError(f"未知的 query_policy: {scope.query_policy}")
+        self.max_depth = max(0, int(scope.max_depth))
+        self.max_pages = max(1, int(scope.max_pages))
+        self.query_policy = scope.query_policy
+        # 规范化页面URL -> 本地HTML文件（相对于output_folder），包含所有已入队的页面
+        self.page_mapping = {}
+
+        # sitemap 种子：sitemaps=True 时从 robots.txt 的 Sitemap 行（没有则 /sitemap.xml）发现页面，
+        # 也可直接给出 sitemap URL 列表；sitemap 流式解析（支持 gzip 和多级索引，子 sitemap 并发抓取），
+        # 页面数受 max_pages 限制。respect_robots=True 时 robots.txt 的 Disallow 规则同时用于过滤页面链接。
+        # sitemap_since 之前（默认为上次爬取的开始时间）未修改（lastmod）的已有页面不再重新抓取
+        self.sitemaps = scope.sitemaps
+        self.respect_robots = scope.respect_robots
+        self.sitemap_since = (self._parse_lastmod(scope.sitemap_since) if isinstance(scope.sitemap_since, str)
+                              else scope.sitemap_since)
+        self.robots = None
+        # 沿用上次结果、本次不抓取的页面（仍保留在 page_mapping 中用于链接重写，不占 max_pages 名额）
+        self._unchanged_pages = set()
+
+        # 断点续爬：爬取过程中把页面队列、已完成/失败的资源和路径映射追加写入日志，
+        # resume=True 时从日志恢复状态，只继续未完成的工作
+        self.resume = config.resume
+        self.journal = CrawlJournal(os.path.join(output_folder, self.JOURNAL_NAME))
+        self._resumed_pages = 0
+        # 从日志恢复、但本次运行还没有展开子资源的 CSS/JS（中断时其子资源可能尚未下载）
+        self._unexpanded = set()
+
+        # 从 Next.js 构建清单和 webpack 运行时中发现运行时才加载的 chunk，并与 preload 资源一起预先下载
+        self.discover_chunks = scope.discover_chunks
+
+        # 分段下载：视频等大文件用 Range 请求探测大小，超过 segment_size 的按段下载到预分配的文件中，
+        # 超过 segment_threshold 时最多 max_segments 个连接并行；进度保存在 <文件>.part.json，中断后续传。
+        # segment_size=0 关闭；服务器不支持 Range 时自动退回单连接下载
+        self.segment_size = max(0, int(download.segment_size or 0))
+        self.segment_threshold = download.segment_threshold
+        self.max_segments = max(1, int(download.max_segments))
+
+        # 内容寻址去重：blob_store 为共享仓库目录，镜像中的资源文件以硬链接指向仓库中的唯一副本
+        self.blob_store = BlobStore(download.blob_store) if download.blob_store else None
+
+        # 结构化指标：metrics 为 JSONL 文件路径或回调函数；quiet=True 时省略逐文件的输出；
+        # profile 为 'cprofile' 或 'tracemalloc' 时在整个 crawl 期间采集CPU/内存分析数据
+        if config.profile not in (None, 'cprofile', 'tracemalloc'):
+            raise ValueError(f"未知的 profile: {config.profile}")
+        self.metrics = CrawlMetrics(config.metrics)
+        self.quiet = config.quiet
+        self.profile = config.profile
 
-    def download_file(self, url, local_path):
-        """下载文件到本地路径，支持去重"""
+    def create_folder_structure(self, file_path):
+        """创建文件夹结构（归档输出时无需创建）"""
+        self.output.prepare(file_path)
+
+    def _read_text(self, local_path, errors='strict'):
+        """从输出后端读取文本文件（与文本模式 open 一样统一换行符）"""
+        content = self.output.read(local_path).decode('utf-8', errors)
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
+
+    def _log(self, message):
+        """逐文件的进度输出（quiet 模式下省略）"""
+        if not self.quiet:
+            print(message)
+
+    def _host_limiter(self, url):
+        """获取URL所属host的并发控制器"""
+        netloc = urlparse(url).netloc
+        with self._state_lock:
+            limiter = self._host_limiters.get(netloc)
+            if limiter is None:
+                budget = self._host_budget(url)
+                limiter = AdaptiveLimiter(min(self.per_host_limit, budget), budget, self.adaptive)
+                self._host_limiters[netloc] = limiter
+            return limiter
+
+    def _host_budget(self, url):
+        """URL所属host最多可同时占用的下载线程数（跨域镜像host受 mirror_host_workers 限制）"""
+        return self.mirror_host_workers if self._mirror_host(url) else self.max_workers
+
+    def _session_for(self, url):
+        """获取URL对应的会话：跨域镜像host各自使用独立会话（独立的 HTTPAdapter 连接池），其余使用主会话"""
+        netloc = self._mirror_host(url)
+        if netloc is None:
+            return self.session
+        with self._state_lock:
+            session = self._host_sessions.get(netloc)
+            if session is None:
+                session = requests.Session()
+                session.headers.update(self.session.headers)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.mirror_host_workers)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._host_sessions[netloc] = session
+            return session
+
+    @staticmethod
+    def _retry_after(response):
+        """解析 Retry-After（秒数或HTTP日期），返回秒数，最长 300 秒"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(seconds, 0.0), 300.0)
+
+    @contextmanager
+    def _fetch(self, url, headers=None, stats=None, stream=True):
+        """发送GET请求，限流和临时故障按指数退避（带抖动）重试
+
+        with 块内保持该host的并发名额和全局连接名额（响应体在块内读取）；stats 字典中记录
+        最后一次请求的发送时刻 sent、收到响应头的时刻 received 和重试次数 retries
+        """
+        limiter = self._host_limiter(url)
+        connection_limit = self.connection_limit
+
+        def release(*args, **kwargs):
+            if connection_limit is not None:
+                connection_limit.release()
+            return limiter.release(*args, **kwargs)
+
+        stats = {} if stats is None else stats
+        stats['retries'] = 0
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            limiter.acquire()
+            if connection_limit is not None:
+                connection_limit.acquire()
+            stats['sent'] = time.perf_counter()
+            try:
+                response = self._session_for(url).get(url, timeout=self.timeout, stream=stream, headers=headers)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                new_limit = release(throttled=True)
+                retry_after, reason = None, type(e).__name__
+                if attempt == self.max_retries:
+                    raise
+            except Exception:
+                release()
+                raise
+            else:
+                stats['received'] = time.perf_counter()
+                latency = stats['received'] - stats['sent']
+                if response.status_code not in self.RETRY_STATUS or attempt == self.max_retries:
+                    throttled = response.status_code in self.RETRY_STATUS
+                    try:
+                        yield response
+                    except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                        # 响应体传输中断同样视为拥塞
+                        throttled = True
+                        raise
+                    finally:
+                        response.close()
+                        release(latency, throttled)
+                    return
+                retry_after, reason = self._retry_after(response), str(response.status_code)
+                response.close()
+                new_limit = release(latency, throttled=True, retry_after=retry_after)
+            # 全抖动指数退避；服务器给出 Retry-After 时至少等待该时长
+            delay = max(retry_after or 0.0, random.uniform(0, self.retry_backoff * 2 ** attempt))
+            stats['retries'] += 1
+            self._log(f"  [RETRY] {url} - {reason}，{delay:.1f}s 后第 {attempt + 1} 次重试（并发上限 {new_limit}）")
+            time.sleep(delay)
+
+    def _throttle(self, size):
+        """设置了带宽上限时，为接收到的 size 字节取得令牌（超出上限时阻塞）"""
+        if self.bandwidth_limiter is not None and size:
+            self.bandwidth_limiter.acquire(size)
+
+    def _iter_body(self, response):
+        """分块读取响应体，每块计入带宽上限"""
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            self._throttle(len(chunk))
+            yield chunk
+
+    def download_file(self, url, local_path, queued_at=None):
+        """下载文件到本地路径，支持去重（线程安全）和基于 ETag/Last-Modified 的条件请求
+
+        queued_at 为进入调度队列的时刻（time.perf_counter），用于统计排队等待时间
+        """
         # 标准化URL用于去重
         normalized_url = url.split('?')[0].split('#')[0]
-        if normalized_url in self.downloaded_urls:
-            return True
-        
+        with self._state_lock:
+            if normalized_url in self.downloaded_urls:
+                return True
+            pending = self._inflight.get(normalized_url)
+            if pending is None:
+                self._inflight[normalized_url] = threading.Event()
+        if pending is not None:
+            # 同一URL正在被其他线程下载，等待其结果
+            pending.wait()
+            with self._state_lock:
+                return normalized_url in self.downloaded_urls
+
+        rel_path = os.path.relpath(local_path, self.output_folder).replace('\\', '/')
+        previous = self._previous_entry(normalized_url, rel_path, local_path)
+        headers = {}
+        if previous:
+            if previous.get('etag'):
+                headers['If-None-Match'] = previous['etag']
+            if previous.get('last_modified'):
+                headers['If-Modified-Since'] = previous['last_modified']
+        kind = self.guess_resource_kind(url)
+        if self.segment_size and kind == 'media':
+            # 探测请求本身就是第一段；服务器忽略 Range 时返回 200，直接按单连接下载
+            headers['Range'] = self._probe_range(local_path)
+
+        start = queued_at or time.perf_counter()
+        stats = {}
+        status = None
+        segments = None
+        reserved = None
         try:
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-
-            self.create_folder_structure(local_path)
-
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
-            
-            self.downloaded_urls.add(normalized_url)
-            
-            # 记录路径映射（同时保存原始路径和解码后的路径）
+            if self._budget_exhausted(kind):
+                raise BudgetExceeded('超出总字节预算', 'over_budget')
+            with self._fetch(url, headers or None, stats) as response:
+                status = response.status_code
+                try:
+                    if status in (200, 206):
+                        reserved = self._reserve_budget(kind, self._response_total(response))
+                    if response.status_code == 304 and previous:
+                        digest, changed = previous['sha256'], False
+                    elif response.status_code == 206:
+                        self.create_folder_structure(local_path)
+                        segments = self._begin_segments(response, local_path)
+                        if segments is None:
+                            # 整个文件已包含在探测响应中
+                            digest, changed = self._save_response(
+                                response, local_path, previous['sha256'] if previous else None)
+                    else:
+                        response.raise_for_status()
+                        self.create_folder_structure(local_path)
+                        digest, changed = self._save_response(
+                            response, local_path, previous['sha256'] if previous else None,
+                            self._pipeline_kind(local_path))
+                finally:
+                    size = response.raw.tell() if response.raw else 0
+            if segments is not None:
+                digest, changed, fetched = self._finish_segments(
+                    url, segments, local_path, previous['sha256'] if previous else None)
+                size += fetched
+            if reserved is None and status in (200, 206):
+                # 响应头中没有大小的文件按实际下载的字节数计入预算
+                self._charge_budget(kind, size)
+            self.metrics.request(url, status, size, stats['sent'] - start, stats['received'] - stats['sent'],
+                                 time.perf_counter() - stats['received'], changed=changed, retries=stats['retries'])
+
+            entry = {
+                'url': url,
+                'path': rel_path,
+                'sha256': digest,
+                'etag': response.headers.get('ETag') or (previous or {}).get('etag'),
+                'last_modified': response.headers.get('Last-Modified') or (previous or {}).get('last_modified'),
+            }
+            if not changed and 'children' in previous:
+                entry['children'] = previous['children']
+
+            # 记录路径映射（同时保存原始路径和解码后的路径；跨域镜像资源以 //host/路径 为键）
             parsed = urlparse(url)
             original_path = parsed.path
+            if self._mirror_host(url):
+                original_path = f"//{parsed.netloc}{original_path}"
             decoded_path = unquote(original_path)
-            rel_path = os.path.relpath(local_path, self.output_folder).replace('\\', '/')
-            self.path_mapping[original_path] = rel_path
-            if decoded_path != original_path:
-                self.path_mapping[decoded_path] = rel_path
-            
-            print(f"  [OK] 下载成功: {url}")
+            with self._state_lock:
+                self.downloaded_urls.add(normalized_url)
+                self.path_mapping[original_path] = rel_path
+                if decoded_path != original_path:
+                    self.path_mapping[decoded_path] = rel_path
+                self.manifest_entries[normalized_url] = entry
+                if not changed:
+                    self.unchanged_files.add(os.path.normpath(local_path))
+            self.file_index.add(rel_path)
+            self.journal.write('asset', url=normalized_url, src=original_path, entry=entry, changed=changed)
+
+            if changed:
+                self._log(f"  [OK] 下载成功: {url}")
+            else:
+                self._log(f"  [SKIP] 未修改: {url}")
             return True
+        except BudgetExceeded as e:
+            self._log(f"  [SKIP] {e}: {url}")
+            if status is not None:
+                # 只读取了响应头
+                now = time.perf_counter()
+                self.metrics.request(url, status, 0, stats['sent'] - start, stats['received'] - stats['sent'],
+                                     now - stats['received'], retries=stats['retries'], skipped=e.reason)
+            with self._state_lock:
+                self.budget_stats[e.reason] += 1
+                self.budget_stats['bytes_avoided'] += e.size or 0
+            return False
         except Exception as e:
+            if reserved:
+                self._charge_budget(kind, -reserved)
             print(f"  [FAIL] 下载失败: {url} - {str(e)}")
+            now = time.perf_counter()
+            sent, received = stats.get('sent', now), stats.get('received', now)
+            self.metrics.request(url, status, 0, sent - start, received - sent, now - received,
+                                 retries=stats.get('retries', 0), error=str(e))
+            self.journal.write('fail', url=url, error=str(e))
             return False
+        finally:
+            with self._state_lock:
+                event = self._inflight.pop(normalized_url, None)
+            if event is not None:
+                event.set()
+
+    # ========== 大小上限和字节预算 ==========
+
+    def _response_total(self, response):
+        """响应对应的完整文件大小：206 取 Content-Range 的总长度，否则取 Content-Length；未知时为 None"""
+        if response.status_code == 206:
+            match = _CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+            return int(match.group(3)) if match else None
+        length = response.headers.get('Content-Length')
+        return int(length) if length and length.isdigit() else None
+
+    def _budget_exhausted(self, kind):
+        """总预算已用完时，计入预算的类型不再发出请求"""
+        return (self.byte_budget is not None and kind in self.BUDGET_KINDS
+                and self.budget_stats['used'] >= self.byte_budget)
+
+    def _reserve_budget(self, kind, total):
+        """按响应头给出的大小检查 max_sizes 和 byte_budget，通过时预占预算并返回预占的字节数
+        （大小未知或不计入预算时返回 None / 0）；超出时抛出 BudgetExceeded，响应体不会被读取"""
+        if total is None:
+            return None
+        limit = self.max_sizes.get(kind)
+        if limit is not None and total > limit:
+            raise BudgetExceeded(f"超过{kind}大小上限（{total / 1024 / 1024:.2f}MB）", 'oversize', total)
+        if self.byte_budget is None or kind not in self.BUDGET_KINDS:
+            return 0
+        with self._state_lock:
+            if self.budget_stats['used'] + total > self.byte_budget:
+                raise BudgetExceeded(f"超出总字节预算（{total / 1024 / 1024:.2f}MB）", 'over_budget', total)
+            self.budget_stats['used'] += total
+        return total
+
+    def _charge_budget(self, kind, size):
+        if self.byte_budget is not None and kind in self.BUDGET_KINDS:
+            with self._state_lock:
+                self.budget_stats['used'] += size
+
+    # ========== 分段下载 ==========
+
+    def _probe_range(self, local_path):
+        """探测请求的 Range：有未完成的分段进度时只取 1 字节，否则直接取第一段"""
+        if os.path.isfile(self.output.staging_path(local_path, '.part.json')):
+            return 'bytes=0-0'
+        return f'bytes=0-{self.segment_size - 1}'
+
+    def _segment_bounds(self, state, index):
+        start = index * state['segment_size']
+        return start, min(state['total'], start + state['segment_size']) - 1
+
+    def _save_segment_state(self, state):
+        with open(state['state_path'], 'w', encoding='utf-8') as f:
+            json.dump({key: value for key, value in state.items() if key not in ('lock', 'state_path', 'part_path')}, f)
+
+    def _begin_segments(self, response, local_path):
+        """处理探测请求的 206 响应：整个文件都在响应中时返回 None；
+        否则准备预分配的 .part 文件和分段进度（验证器一致时沿用上次的进度），写入探测到的第一段"""
+        match = _CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+        if not match:
+            raise ValueError(f"无效的 Content-Range: {response.headers.get('Content-Range')}")
+        first, last, total = (int(value) for value in match.groups())
+        if first == 0 and last + 1 >= total:
+            return None
+
+        part_path = self.output.staging_path(local_path, '.part')
+        state_path = self.output.staging_path(local_path, '.part.json')
+        state = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'total': total,
+            'segment_size': self.segment_size,
+            'done': {},
+        }
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if (all(saved.get(key) == state[key] for key in ('etag', 'last_modified', 'total', 'segment_size'))
+                    and (state['etag'] or state['last_modified'])
+                    and os.path.isfile(part_path) and os.path.getsize(part_path) == total):
+                state['done'] = saved.get('done', {})
+        except (OSError, ValueError):
+            pass
+        if not state['done']:
+            # 预分配完整大小（稀疏文件），各段按偏移写入
+            with open(part_path, 'wb') as f:
+                f.truncate(total)
+        state['part_path'] = part_path
+        state['state_path'] = state_path
+        state['lock'] = threading.Lock()
+
+        # 探测响应恰好是第一段时直接写入
+        if first == 0 and last == self._segment_bounds(state, 0)[1] and not state['done'].get('0'):
+            written = 0
+            try:
+                with open(part_path, 'r+b') as f:
+                    for chunk in self._iter_body(response):
+                        f.write(chunk)
+                        written += len(chunk)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                # 已写入的部分保留，剩余部分作为普通分段续传
+                pass
+            state['done']['0'] = written
+        self._save_segment_state(state)
+        return state
+
+    def _download_segment(self, url, state, index):
+        """下载（或续传）一个分段，连接中断时从已写入的位置继续，返回本次下载的字节数"""
+        start, end = self._segment_bounds(state, index)
+        fetched = 0
+        validator = state['etag'] or state['last_modified']
+        for attempt in range(self.max_retries + 1):
+            with state['lock']:
+                offset = start + state['done'].get(str(index), 0)
+            if offset > end:
+                break
+            headers = {'Range': f'bytes={offset}-{end}'}
+            if validator:
+                headers['If-Range'] = validator
+            written = 0
+            try:
+                with self._fetch(url, headers) as response:
+                    match = _CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+                    if response.status_code != 206 or not match or int(match.group(1)) != offset:
+                        # If-Range 不匹配时服务器返回整个文件：内容在下载过程中发生了变化
+                        raise RuntimeError(f"分段 {index} 响应无效（HTTP {response.status_code}），文件可能已变化")
+                    with open(state['part_path'], 'r+b') as f:
+                        f.seek(offset)
+                        for chunk in self._iter_body(response):
+                            f.write(chunk[:end + 1 - offset - written])
+                            written += len(chunk)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt == self.max_retries:
+                    raise
+            finally:
+                fetched += written
+                with state['lock']:
+                    state['done'][str(index)] = min(offset + written, end + 1) - start
+                    self._save_segment_state(state)
+        return fetched
+
+    def _finish_segments(self, url, state, local_path, previous_digest=None):
+        """并行下载其余分段，校验完整性后原子替换到 local_path，返回 (sha256, changed, 下载字节数)"""
+        count_segments = -(-state['total'] // state['segment_size'])
+        pending = [index for index in range(count_segments)
+                   if state['done'].get(str(index), 0) < self._segment_bounds(state, index)[1]
+                   - self._segment_bounds(state, index)[0] + 1]
+        workers = min(self.max_segments if state['total'] >= (self.segment_threshold or 0) else 1,
+                      len(pending)) or 1
+        self._log(f"  [SEG] {url}: {state['total'] / 1024 / 1024:.1f}MB，{count_segments} 段"
+                  f"（待下载 {len(pending)} 段，{workers} 个连接）")
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                fetched = sum(executor.map(lambda index: self._download_segment(url, state, index), pending))
+        except RuntimeError:
+            # 内容已变化，进度作废，下次重新下载
+            for path in (state['state_path'], state['part_path']):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        # 校验：每段都已写满，文件大小与 Content-Range 中的总长度一致
+        for index in range(count_segments):
+            first, last = self._segment_bounds(state, index)
+            if state['done'].get(str(index), 0) != last - first + 1:
+                raise RuntimeError(f"分段 {index} 不完整")
+        if os.path.getsize(state['part_path']) != state['total']:
+            raise RuntimeError("分段下载后文件大小不一致")
+
+        hasher = hashlib.sha256()
+        with open(state['part_path'], 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        os.remove(state['state_path'])
+        if digest == previous_digest and self.output.exists(local_path):
+            os.remove(state['part_path'])
+            return digest, False, fetched
+        os.chmod(state['part_path'], _file_mode())
+        if self.blob_store:
+            self.blob_store.adopt(state['part_path'], digest, local_path)
+        else:
+            self.output.commit(state['part_path'], local_path)
+        return digest, True, fetched
+
+    def _save_response(self, response, local_path, previous_digest=None, rewrite_kind=None):
+        """将响应体写入本地文件：小文件整块读入内存，大文件分块流式写入临时文件后原子重命名
+
+        返回 (sha256, changed)；内容与 previous_digest 相同时保留已有文件，changed 为 False。
+        rewrite_kind 为 'js'/'css' 时在写入前完成路径重写（pipeline 模式）
+        """
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) <= self.max_in_memory:
+            self._throttle(int(length))
+            return self._save_body(response.content, local_path, previous_digest, rewrite_kind)
+
+        # 长度未知或超过阈值：先缓冲到阈值，仍未结束则边下边写，内存占用不超过阈值+一个分块
+        buffer = []
+        buffered = 0
+        chunks = self._iter_body(response)
+        for chunk in chunks:
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered > self.max_in_memory:
+                break
+        else:
+            return self._save_body(b''.join(buffer), local_path, previous_digest, rewrite_kind)
+
+        digest, changed = self._atomic_write(local_path, chain(buffer, chunks), previous_digest, dedup=True)
+        if changed and rewrite_kind == 'js':
+            # 超大文件无法在内存中重写，落盘后读回处理
+            self._fix_js_file(local_path)
+        elif changed and rewrite_kind == 'css':
+            with self._state_lock:
+                self._pending_css[local_path] = None
+        return digest, changed
+
+    def _save_body(self, body, local_path, previous_digest=None, rewrite_kind=None):
+        """保存已完整读入内存的响应体，返回 (sha256, changed)"""
+        digest = hashlib.sha256(body).hexdigest()
+        if digest == previous_digest and self.output.exists(local_path):
+            return digest, False
+        if rewrite_kind == 'css':
+            # CSS中的url()依赖后续下载的资源（path_mapping），延迟到 flush_pending_css 时重写并写入
+            with self._state_lock:
+                self._pending_css[local_path] = body
+            return digest, True
+        if rewrite_kind == 'js':
+            body = self._rewrite_text(body, self.fix_js_paths, local_path, 'JS')
+        self._atomic_write(local_path, [body], dedup=True)
+        return digest, True
+
+    def _atomic_write(self, local_path, chunks, previous_digest=None, dedup=False, backend=None):
+        """将分块依次写入同目录临时文件再原子重命名，避免中断时留下半截文件
+
+        返回 (sha256, changed)；内容哈希等于 previous_digest 且文件已存在时不覆盖。
+        dedup=True 且启用了 blob_store 时，文件以硬链接指向仓库中的同内容文件；
+        内容已整块在内存中且仓库里已有时，连临时文件都不写。
+        backend 为写入的输出后端，默认是镜像的输出后端（归档模式下临时文件写完后追加进归档）
+        """
+        backend = backend or self.output
+        if dedup and self.blob_store and isinstance(chunks, list):
+            digest = hashlib.sha256(b''.join(chunks)).hexdigest()
+            if digest == previous_digest and backend.exists(local_path):
+                return digest, False
+            if self.blob_store.link(digest, local_path):
+                return digest, True
+
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=backend.temp_dir(local_path),
+                                        prefix='.' + os.path.basename(local_path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    f.write(chunk)
+            digest = hasher.hexdigest()
+            if digest == previous_digest and backend.exists(local_path):
+                os.remove(tmp_path)
+                return digest, False
+            # mkstemp 创建的文件权限为 0600，恢复为普通文件的默认权限
+            os.chmod(tmp_path, _file_mode())
+            if dedup and self.blob_store:
+                self.blob_store.adopt(tmp_path, digest, local_path)
+            else:
+                backend.commit(tmp_path, local_path)
+            return digest, True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    # ========== 下载时重写（pipeline 模式） ==========
+
+    def _pipeline_kind(self, local_path):
+        """pipeline 模式下需要在写入前重写的文件类型"""
+        if self.rewrite_mode != 'pipeline':
+            return None
+        if local_path.endswith('.js'):
+            return 'js'
+        if local_path.endswith('.css'):
+            return 'css'
+        return None
+
+    @staticmethod
+    def _decode_text(body):
+        """按文本模式读取文件的方式解码（UTF-8 + 统一换行符）"""
+        return body.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+    def _rewrite_text(self, body, fixer, local_path, label):
+        """在内存中重写文本资源，内容无变化或失败时返回原始字节"""
+        start = time.perf_counter()
+        try:
+            content = self._decode_text(body)
+            fixed = fixer(content, local_path)
+        except Exception as e:
+            print(f"  [FAIL] 修复{label}失败: {os.path.basename(local_path)} - {str(e)}")
+            return body
+        rel = os.path.relpath(local_path, self.output_folder)
+        self.metrics.rewrite(label.lower(), rel, time.perf_counter() - start, len(body), fixed != content)
+        if fixed == content:
+            return body
+        self._log(f"  [OK] 修复{label}: {rel}")
+        return fixed.encode('utf-8')
+
+    def flush_pending_css(self):
+        """重写并写入所有延迟的CSS文件（应在其引用的资源下载完成后调用）"""
+        with self._state_lock:
+            pending = self._pending_css
+            self._pending_css = {}
+        for local_path, body in pending.items():
+            if body is None:
+                self._fix_css_file(local_path)
+            else:
+                fixed = self._rewrite_text(body, self._fix_css_content, local_path, 'CSS')
+                self._atomic_write(local_path, [fixed], dedup=True)
+
+    def _refix_unchanged_files(self):
+        """重写上下文变化时，重新修复本次运行中内容未修改的JS/CSS文件（不遍历整个输出目录）"""
+        css_unchanged = self._rewrite_context_unchanged('css')
+        js_unchanged = self._rewrite_context_unchanged('js')
+        for filepath in sorted(self.unchanged_files):
+            if filepath.endswith('.css') and not css_unchanged:
+                self._fix_css_file(filepath)
+            elif filepath.endswith('.js') and not js_unchanged:
+                self._fix_js_file(filepath)
+
+    def _refix_stale_js(self):
+        """pipeline 模式：重新修复写入后又检测到新前缀的JS文件
+
+        JS 在下载时按当时已检测到的前缀重写，后续页面才出现的前缀不会作用到已写入的文件；
+        重写只去掉路径开头的 /，对已重写的内容再按完整的前缀集合修复一次，结果与从原始内容重写相同
+        """
+        prefixes = frozenset(self.detected_prefixes)
+        stale = sorted(path for path, used in self._js_rewrite_prefixes.items() if used != prefixes)
+        for filepath in stale:
+            if self.output.exists(filepath):
+                self._fix_js_file(filepath)
+
+    # ========== 断点续爬 ==========
+
+    def restore_journal(self):
+        """从断点续爬日志恢复状态，返回未完成页面的队列（日志不存在或没有可恢复内容时返回 None）"""
+        records = self.journal.replay()
+        if not records:
+            return None
+
+        pages = {}
+        done_pages = set()
+        restored = 0
+        for record in records:
+            kind = record.get('t')
+            if kind == 'page':
+                pages[record['url']] = (record['path'], record['depth'], record.get('fetch', record['url']))
+                if record.get('unchanged'):
+                    self._unchanged_pages.add(record['url'])
+                    done_pages.add(record['url'])
+                elif record['url'] in self._unchanged_pages:
+                    # sitemap 中出现了更新的 lastmod，改为重新抓取
+                    self._unchanged_pages.discard(record['url'])
+                    done_pages.discard(record['url'])
+            elif kind == 'page_done':
+                done_pages.add(record['url'])
+            elif kind == 'prefix':
+                self.detected_prefixes.add(record['prefix'])
+            elif kind == 'asset':
+                entry = record['entry']
+                local_path = os.path.join(self.output_folder, entry['path'])
+                # pipeline 模式下延迟写入的CSS可能还没落盘，这类资源需要重新下载
+                if not self.output.exists(local_path):
+                    continue
+                original_path = record['src']
+                decoded_path = unquote(original_path)
+                self.downloaded_urls.add(record['url'])
+                self.path_mapping[original_path] = entry['path']
+                if decoded_path != original_path:
+                    self.path_mapping[decoded_path] = entry['path']
+                self.manifest_entries[record['url']] = entry
+                if not record.get('changed', True):
+                    self.unchanged_files.add(os.path.normpath(local_path))
+                self.file_index.add(entry['path'])
+                if entry['path'].endswith(('.css', '.js')):
+                    self._unexpanded.add(record['url'])
+                if entry['path'].endswith('.js') and self.rewrite_mode == 'pipeline':
+                    # 中断前按当时的前缀重写，结束时按完整的前缀集合再修复一次
+                    self._js_rewrite_prefixes.setdefault(os.path.normpath(local_path), None)
+                restored += 1
+            elif kind == 'children':
+                # 本地CSS已重写，使用下载时解析出的子资源
+                entry = self.manifest_entries.get(record['url'])
+                if entry is not None:
+                    entry['children'] = record['children']
+        if not pages:
+            return None
+
+        self.page_mapping = {url: path for url, (path, depth, fetch) in pages.items()}
+        frontier = deque((fetch, depth) for url, (path, depth, fetch) in pages.items() if url not in done_pages)
+        self._resumed_pages = len(done_pages - self._unchanged_pages)
+        print(f"  从断点恢复: 已完成页面 {len(done_pages)} 个，待抓取页面 {len(frontier)} 个，已下载资源 {restored} 个")
+        return frontier
+
+    # ========== 增量爬取清单 ==========
+
+    def _previous_entry(self, normalized_url, rel_path, local_path):
+        """返回上次运行中该URL的清单记录（仅当本地文件仍在原位置时有效）"""
+        if not self.incremental:
+            return None
+        entry = self.previous_manifest['entries'].get(normalized_url)
+        if entry and entry.get('path') == rel_path and entry.get('sha256') and self.output.exists(local_path):
+            return entry
+        return None
+
+    def load_manifest(self):
+        """读取上次运行保存的清单"""
+        if not self.incremental or not os.path.isfile(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.previous_manifest = {
+                'entries': data.get('entries', {}),
+                'contexts': data.get('contexts', {}),
+                'compressed': data.get('compressed', {}),
+                'pages': data.get('pages', {}),
+                'crawled_at': data.get('crawled_at'),
+            }
+            # 本次未访问到的旧记录原样保留（对应文件仍在输出目录中）
+            self.manifest_entries = dict(self.previous_manifest['entries'])
+            print(f"  已加载增量清单: {len(self.manifest_entries)} 条记录")
+        except Exception as e:
+            print(f"  [FAIL] 读取增量清单失败: {str(e)}")
+
+    def save_manifest(self):
+        """保存本次运行的清单（原子写入）"""
+        if not self.incremental:
+            return
+        data = {
+            'version': 1,
+            'base_url': self.base_url,
+            'crawled_at': self.crawled_at,
+            'contexts': self.rewrite_contexts,
+            'entries': self.manifest_entries,
+            'pages': {**self.previous_manifest.get('pages', {}), **self.page_mapping},
+        }
+        if self.compressed_files:
+            data['compressed'] = self.compressed_files
+        payload = json.dumps(data, ensure_ascii=False, indent=1, sort_keys=True).encode('utf-8')
+        self._atomic_write(self.manifest_path, [payload], backend=LooseFileOutput(self.output_folder))
+
+    def _load_css_children(self, css_url, local_path):
+        """获取CSS引用的资源列表
+
+        未修改的CSS在本地已是重写后的版本，直接使用清单中记录的原始解析结果
+        """
+        normalized_url = css_url.split('?')[0].split('#')[0]
+        entry = self.manifest_entries.get(normalized_url)
+        if entry and 'children' in entry and (os.path.normpath(local_path) in self.unchanged_files
+                                              or normalized_url in self._unexpanded):
+            return list(entry['children'])
+        body = self._pending_css.get(local_path)
+        if body is not None:
+            css_content = self._decode_text(body)
+        else:
+            css_content = self._read_text(local_path)
+        children = self.parse_css_resources(css_content, css_url)
+        if entry is not None:
+            with self._state_lock:
+                entry['children'] = children
+        self.journal.write('children', url=normalized_url, children=children)
+        return children
+
+    def _rewrite_context_unchanged(self, kind):
+        """计算重写上下文指纹，返回其是否与上次运行相同
+
+        JS 重写只依赖 detected_prefixes 和 mirror_hosts；CSS 重写还依赖 path_mapping（url() 的查找结果）
+        """
+        hasher = hashlib.sha256()
+        hasher.update('\n'.join(sorted(self.detected_prefixes)).encode('utf-8'))
+        hasher.update(f"\0{' '.join(self.mirror_hosts)}".encode('utf-8'))
+        if kind == 'css':
+            for key, value in sorted(self.path_mapping.items()):
+                hasher.update(f'\0{key}\0{value}'.encode('utf-8'))
+        fingerprint = hasher.hexdigest()
+        self.rewrite_contexts[kind] = fingerprint
+        return self.previous_manifest['contexts'].get(kind) == fingerprint
+
+    def guess_resource_kind(self, url):
+        """按扩展名推断资源类型（用于依赖图调度的优先级）"""
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        if ext == '.css':
+            return 'css'
+        if ext in ('.js', '.mjs'):
+            return 'js'
+        if ext in ('.woff', '.woff2', '.ttf', '.otf', '.eot'):
+            return 'font'
+        if ext in ('.mp4', '.webm', '.ogg', '.mp3', '.wav', '.mov', '.m4v'):
+            return 'media'
+        return 'image'
+
+    def download_graph(self, seeds):
+        """按依赖图并发下载资源，返回成功下载（或之前已下载）的URL列表
+
+        seeds 为 [(url, 类型)]。资源一经发现立即按优先级入队；CSS 下载完成后解析出的
+        url() / @import 子资源直接回到队列（@import 的样式表同样会被递归解析），
+        关键路径长度等于依赖图的深度，而不是各阶段耗时之和。
+        单个host占用的线程达到其预算（_host_budget）时，该host的资源暂缓提交，线程留给其他host
+        """
+        heap = []
+        sequence = count()
+        queued = set()
+        # host -> 正在下载的数量 / 因预算已满暂缓提交的队列项
+        busy = {}
+        deferred = {}
+
+        def push(url, kind):
+            normalized_url = url.split('?')[0].split('#')[0]
+            if normalized_url in queued or (normalized_url in self.downloaded_urls
+                                            and normalized_url not in self._unexpanded):
+                return
+            queued.add(normalized_url)
+            heapq.heappush(heap, (self.RESOURCE_PRIORITY.get(kind, 4), next(sequence), url, kind, time.perf_counter()))
+
+        for url, kind in seeds:
+            if kind == 'image' and self.guess_resource_kind(url) == 'media':
+                kind = 'media'
+            push(url, kind)
+
+        succeeded = []
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while heap or running:
+                while heap and len(running) < self.max_workers:
+                    item = heapq.heappop(heap)
+                    _, _, url, kind, queued_at = item
+                    host = urlparse(url).netloc
+                    if busy.get(host, 0) >= self._host_budget(url):
+                        deferred.setdefault(host, []).append(item)
+                        continue
+                    busy[host] = busy.get(host, 0) + 1
+                    running[executor.submit(self._download_node, url, kind, queued_at)] = url
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = running.pop(future)
+                    host = urlparse(url).netloc
+                    busy[host] -= 1
+                    for item in deferred.pop(host, ()):
+                        heapq.heappush(heap, item)
+                    ok, children = future.result()
+                    if ok:
+                        succeeded.append(url)
+                    for child in children:
+                        push(child, self.guess_resource_kind(child))
+        return succeeded
+
+    def _download_node(self, url, kind, queued_at=None):
+        """下载依赖图中的一个资源，返回 (是否成功, 子资源URL列表)"""
+        local_path = self.get_local_path(url)
+        if not self.download_file(url, local_path, queued_at):
+            return False, []
+        children = []
+        try:
+            if kind == 'css':
+                children = self._load_css_children(url, local_path)
+            elif kind == 'js' and self.discover_chunks:
+                children = self._load_js_chunks(url, local_path)
+        except Exception as e:
+            print(f"    解析{kind.upper()}失败: {str(e)}")
+        with self._state_lock:
+            self._unexpanded.discard(url.split('?')[0].split('#')[0])
+        return True, children
 
     def get_local_path(self, url):
         """将URL转换为本地文件路径（不包含查询参数）"""
         parsed = urlparse(url)
         path = parsed.path
 
+        # 跨域镜像资源保存在该host的子目录下
+        root = self.output_folder
+        host = self._mirror_host(url)
+        if host:
+            root = os.path.join(root, self.MIRROR_HOSTS_DIR, host.replace(':', '_'))
+
         if not path or path == '/':
-            return os.path.join(self.output_folder, 'index.html')
+            return os.path.join(root, 'index.html')
 
         # URL解码路径（如 %5Blocale%5D -> [locale]）
         path = unquote(path)
@@ -82,7 +1737,7 @@ class WebsiteCrawler:
         if not os.path.splitext(path)[1]:
             path = os.path.join(path, 'index.html')
 
-        return os.path.join(self.output_folder, path)
+        return os.path.join(root, path)
 
     def remove_query_params(self, url):
         """移除URL中的查询参数"""
@@ -98,6 +1753,301 @@ class WebsiteCrawler:
             return parsed.netloc == self.parsed_base.netloc
         return True  # 相对路径属于同一源
 
+    def _mirror_host(self, url):
+        """URL（绝对或协议相对）属于 mirror_hosts 允许镜像的其他host时返回其 netloc，否则返回 None"""
+        if not self.mirror_hosts or not url.startswith(('http', '//')):
+            return None
+        netloc = urlparse(url).netloc.lower()
+        if not netloc or netloc == self.parsed_base.netloc.lower():
+            return None
+        allowed = self._mirror_host_cache.get(netloc)
+        if allowed is None:
+            hostname = netloc.rsplit(':', 1)[0] if netloc.rsplit(':', 1)[-1].isdigit() else netloc
+            allowed = any(fnmatchcase(netloc, pattern) or fnmatchcase(hostname, pattern)
+                          for pattern in self.mirror_hosts)
+            self._mirror_host_cache[netloc] = allowed
+        return netloc if allowed else None
+
+    def _mirror_rel_path(self, url):
+        """跨域镜像资源的本地路径（相对于output_folder）；不属于镜像host时返回 None"""
+        if self._mirror_host(url) is None:
+            return None
+        return os.path.relpath(self.get_local_path(url), self.output_folder).replace('\\', '/')
+
+    def _fix_host_urls(self, content, root_prefix=''):
+        """把文本中指向镜像host的绝对URL前缀（包括JSON转义形式）替换为相对站点根的 _hosts/<host>/
+
+        root_prefix 为子目录页面中内联脚本回到站点根的 ../ 前缀
+        """
+        if not self.mirror_hosts:
+            return content
+
+        def replace(match):
+            escape, netloc = match.group(1), match.group(2)
+            if self._mirror_host(f"//{netloc}/") is None:
+                return match.group(0)
+            return (f"{root_prefix.replace('/', escape + '/')}{self.MIRROR_HOSTS_DIR}{escape}/"
+                    f"{netloc.lower().replace(':', '_')}{escape}/")
+
+        return _HOST_URL_RE.sub(replace, content)
+
+    def canonicalize_url(self, url):
+        """规范化页面URL用于去重：小写协议和主机、去掉默认端口和片段、统一百分号编码、
+        去掉非根路径末尾的斜杠，查询参数按 query_policy 丢弃或排序保留"""
+        parsed = urlparse(url)
+        scheme = parsed.scheme.lower()
+        netloc = parsed.netloc.lower()
+        if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+            netloc = netloc.rsplit(':', 1)[0]
+        path = quote(unquote(parsed.path), safe="/:@!$&'()*+,;=-._~") or '/'
+        if len(path) > 1 and path.endswith('/'):
+            path = path.rstrip('/') or '/'
+        query = ''
+        if self.query_policy == 'keep' and parsed.query:
+            query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+        return urlunparse((scheme, netloc, path, '', query, ''))
+
+    def _page_local_path(self, canonical_url):
+        """页面的本地HTML路径（相对于output_folder）；保留的查询参数以哈希区分文件名"""
+        rel_path = os.path.relpath(self.get_local_path(canonical_url), self.output_folder).replace('\\', '/')
+        query = urlparse(canonical_url).query
+        if query:
+            stem, ext = os.path.splitext(rel_path)
+            rel_path = f"{stem}.{hashlib.sha1(query.encode('utf-8')).hexdigest()[:8]}{ext}"
+        return rel_path
+
+    def _is_page_link(self, url):
+        """判断链接是否指向可抓取的同源HTML页面（已读取 robots.txt 时排除 Disallow 的路径）"""
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not self.is_same_origin(url):
+            return False
+        ext = os.path.splitext(parsed.path)[1].lower()
+        if ext and ext not in ('.html', '.htm', '.php', '.asp', '.aspx', '.jsp'):
+            return False
+        return self.robots is None or self.robots.can_fetch('*', url)
+
+    def _page_quota_reached(self):
+        """已入队的页面数是否达到 max_pages（沿用上次结果的页面不计入）"""
+        return len(self.page_mapping) - len(self._unchanged_pages) >= self.max_pages
+
+    def _enqueue_links(self, doc, page_url, depth, frontier):
+        """把页面中的同源链接加入抓取队列（受 max_depth / max_pages 限制）"""
+        if depth >= self.max_depth:
+            return
+        used_paths = set(self.page_mapping.values())
+        for a_tag in doc.find_all('a', 'area', attr='href'):
+            if self._page_quota_reached():
+                return
+            href = (a_tag.get('href') or '').strip()
+            if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:', 'data:')):
+                continue
+            full_url = urljoin(page_url, href)
+            if not self._is_page_link(full_url):
+                continue
+            canonical = self.canonicalize_url(full_url)
+            if canonical in self.page_mapping:
+                continue
+            rel_path = self._page_local_path(canonical)
+            if rel_path in used_paths:
+                # 不同URL映射到同一个本地文件（如起始页固定保存为 index.html）
+                continue
+            used_paths.add(rel_path)
+            self._add_page(canonical, rel_path, depth + 1, frontier, full_url)
+
+    def _add_page(self, canonical_url, rel_path, depth, frontier, url=None):
+        """登记页面并加入抓取队列
+
+        page_mapping 以规范化URL为键去重；队列中保存发现时的URL（去掉片段，query_policy='drop' 时去掉查询参数），
+        抓取和解析相对路径都使用它（规范化URL去掉了目录页面末尾的斜杠，不能作为相对路径的基准）
+        """
+        url = self._page_fetch_url(url or canonical_url)
+        self.page_mapping[canonical_url] = rel_path
+        frontier.append((url, depth))
+        self.journal.write('page', url=canonical_url, path=rel_path, depth=depth, fetch=url)
+
+    def _page_fetch_url(self, url):
+        """页面的抓取地址：发现时的URL去掉片段（query_policy='drop' 时同时去掉查询参数）"""
+        parsed = urlparse(url)
+        query = parsed.query if self.query_policy == 'keep' else ''
+        return urlunparse((parsed.scheme, parsed.netloc, parsed.path or '/', parsed.params, query, ''))
+
+    # ========== robots.txt / sitemap 种子 ==========
+
+    def load_robots(self):
+        """读取站点的 robots.txt，返回其中的 Sitemap URL 列表（robots.txt 不存在时返回 None）
+
+        respect_robots=True 时保存解析结果，之后的页面链接按 Disallow 规则过滤
+        """
+        robots_url = f"{self.base_origin}/robots.txt"
+        try:
+            with self._fetch(robots_url, stream=False) as response:
+                if response.status_code != 200:
+                    print(f"  [SKIP] robots.txt 不可用: HTTP {response.status_code}")
+                    return None
+                lines = response.text.splitlines()
+        except Exception as e:
+            print(f"  [FAIL] 读取 robots.txt 失败: {str(e)}")
+            return None
+        parser = RobotFileParser(robots_url)
+        parser.parse(lines)
+        if self.respect_robots:
+            self.robots = parser
+        return parser.site_maps() or []
+
+    @staticmethod
+    def _parse_lastmod(value):
+        """解析 W3C 日期时间（2024-01-02 / 2024-01-02T03:04:05Z 等），返回带时区的 datetime；无法解析时返回 None"""
+        if not value:
+            return None
+        value = value.strip()
+        if value.endswith(('Z', 'z')):
+            value = value[:-1] + '+00:00'
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+    def _iter_sitemap(self, url):
+        """流式解析一个 sitemap 或 sitemap 索引（gzip 按内容自动识别），逐条产出 (标签, loc, lastmod)
+
+        标签为 'url' 或 'sitemap'；每条处理完即清空已解析的元素，内存占用与文件大小无关
+        """
+        with self._fetch(url) as response:
+            response.raise_for_status()
+            # 读完后不自动关闭，BufferedReader 才能正常读到 EOF
+            response.raw.decode_content = True
+            response.raw.auto_close = False
+            stream = io.BufferedReader(response.raw, self.chunk_size)
+            if stream.peek(2)[:2] == b'\x1f\x8b':
+                stream = gzip.GzipFile(fileobj=stream)
+            root = None
+            loc = lastmod = None
+            for event, elem in etree.iterparse(stream, events=('start', 'end'), resolve_entities=False,
+                                               no_network=True):
+                if root is None:
+                    root = elem
+                if event != 'end':
+                    continue
+                tag = elem.tag
+                if tag in (_SITEMAP_NS + 'loc', 'loc'):
+                    loc = (elem.text or '').strip()
+                elif tag in (_SITEMAP_NS + 'lastmod', 'lastmod'):
+                    lastmod = self._parse_lastmod(elem.text)
+                elif tag in (_SITEMAP_NS + 'url', 'url', _SITEMAP_NS + 'sitemap', 'sitemap'):
+                    if loc:
+                        yield tag.rsplit('}', 1)[-1], loc, lastmod
+                    loc = lastmod = None
+                    root.clear()
+
+    def seed_from_sitemaps(self, frontier):
+        """从 robots.txt 和 sitemap 发现页面并加入抓取队列，返回新入队的页面数
+
+        子 sitemap 并发抓取、边解析边入队，达到 max_pages 后停止解析。有上次的页面记录时，
+        lastmod 不晚于 sitemap_since 的已有页面沿用上次保存的HTML，不再抓取
+        """
+        print("\n[0/4] 从 robots.txt / sitemap 发现页面...")
+        robots_sitemaps = self.load_robots()
+        if self.sitemaps is True:
+            sitemap_urls = []
+        else:
+            # 单个 sitemap URL 可直接以字符串给出
+            sitemap_urls = [self.sitemaps] if isinstance(self.sitemaps, str) else list(self.sitemaps)
+        sitemap_urls += robots_sitemaps or []
+        if not sitemap_urls:
+            sitemap_urls = [f"{self.base_origin}/sitemap.xml"]
+
+        since = self.sitemap_since
+        if since is None and self.incremental:
+            since = self._parse_lastmod(self.previous_manifest.get('crawled_at'))
+        previous_pages = self.previous_manifest.get('pages', {}) if since else {}
+
+        lock = threading.Lock()
+        stop = threading.Event()
+        used_paths = set(self.page_mapping.values())
+        counts = {'sitemaps': 0, 'urls': 0, 'added': 0, 'excluded': 0}
+        # 本次由 sitemap 登记为未修改、沿用上次结果的页面
+        unchanged = set()
+
+        def accept(loc, lastmod):
+            """处理 sitemap 中的一个页面URL；达到 max_pages 时返回 False"""
+            full_url = urljoin(self.base_url, loc)
+            with lock:
+                counts['urls'] += 1
+                if not self._is_page_link(full_url):
+                    counts['excluded'] += 1
+                    return True
+                canonical = self.canonicalize_url(full_url)
+                known = canonical in self.page_mapping
+                if known and canonical not in self._unchanged_pages:
+                    return True
+                rel_path = previous_pages.get(canonical)
+                if (rel_path and lastmod is not None and lastmod <= since
+                        and self.output.exists(os.path.join(self.output_folder, rel_path))):
+                    if not known:
+                        # 上次抓取后未修改：保留页面映射供链接重写，不重新抓取
+                        self.page_mapping[canonical] = rel_path
+                        used_paths.add(rel_path)
+                        self._unchanged_pages.add(canonical)
+                        self.journal.write('page', url=canonical, path=rel_path, depth=1, unchanged=True)
+                        unchanged.add(canonical)
+                    return True
+                if self._page_quota_reached():
+                    return False
+                if known:
+                    # 同一页面在另一个 sitemap 中的 lastmod 更新
+                    self._unchanged_pages.discard(canonical)
+                    rel_path = self.page_mapping[canonical]
+                    unchanged.discard(canonical)
+                else:
+                    rel_path = self._page_local_path(canonical)
+                    if rel_path in used_paths:
+                        return True
+                    used_paths.add(rel_path)
+                self._add_page(canonical, rel_path, 1, frontier, full_url)
+                counts['added'] += 1
+                return True
+
+        def parse(sitemap_url):
+            """解析一个 sitemap，返回其中列出的子 sitemap"""
+            children = []
+            try:
+                for tag, loc, lastmod in self._iter_sitemap(sitemap_url):
+                    if stop.is_set():
+                        break
+                    if tag == 'sitemap':
+                        # 整个子 sitemap 未修改时其中的页面也都未修改，但仍需登记页面映射，因此照常解析
+                        children.append(urljoin(sitemap_url, loc))
+                    elif not accept(loc, lastmod):
+                        stop.set()
+                        break
+            except Exception as e:
+                print(f"  [FAIL] sitemap 解析失败: {sitemap_url} - {str(e)}")
+                return []
+            self._log(f"  [OK] sitemap: {sitemap_url}")
+            return children
+
+        seen = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = set()
+            for sitemap_url in sitemap_urls:
+                if sitemap_url not in seen:
+                    seen.add(sitemap_url)
+                    running.add(executor.submit(parse, sitemap_url))
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counts['sitemaps'] += 1
+                    for child in future.result():
+                        if child not in seen and not stop.is_set():
+                            seen.add(child)
+                            running.add(executor.submit(parse, child))
+
+        print(f"  sitemap: 解析 {counts['sitemaps']} 个，URL {counts['urls']} 个，新入队页面 {counts['added']} 个，"
+              f"未修改沿用 {len(unchanged)} 个，排除 {counts['excluded']} 个"
+              + ("（已达 max_pages）" if stop.is_set() else ""))
+        return counts['added']
+
     def absolute_to_relative(self, url_path):
         """将绝对路径转换为相对路径（移除开头的斜杠和查询参数，并URL解码）"""
         if not url_path:
@@ -136,72 +2086,128 @@ class WebsiteCrawler:
 
     # ========== HTML 路径修复 ==========
     
-    def fix_html_paths(self, html_content):
-        """修复HTML中的所有资源路径"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+    def fix_html_paths(self, html_content, doc=None, page_url=None, page_rel=None):
+        """修复HTML中的所有资源路径
+
+        doc 为同一份 html_content 已解析好的 HtmlDocument（资源发现时解析的结果），
+        改动的属性值/内容按原文偏移拼回，不重新序列化整个文档。
+        page_url 为页面地址（多页面爬取，相对路径按它解析）：指向已抓取页面的 <a href> 改写为本地HTML文件；
+        保存在子目录中的页面，改写后的本地路径都换算为相对于页面自身位置的路径（不插入 <base>，
+        页内锚点、空的 form action 和脚本中按页面地址解析的相对请求保持浏览器的默认行为）。
+        page_rel 为页面的本地HTML路径（默认按 page_url 在 page_mapping 中查找；重定向后的地址需显式给出）
+        """
+        if doc is None:
+            doc = HtmlDocument(html_content)
+        edits = []
+
+        if page_rel is None and page_url:
+            page_rel = self.page_mapping.get(self.canonicalize_url(page_url))
+        page_dir = posixpath.dirname(page_rel) if page_rel else ''
+        root_prefix = '../' * (page_dir.count('/') + 1) if page_dir else ''
+        # 子目录页面（或地址在子目录中的起始页）：页面相对路径先按页面地址解析为绝对地址，再统一转为相对站点根的路径
+        relative_base = page_url if page_dir or (page_url and urlparse(page_url).path.rsplit('/', 1)[0]) else None
+
+        def fix_attr_path(url):
+            if relative_base and url and not url.startswith(('/', '#', 'data:', 'javascript:', 'http')) \
+                    and '//' not in url[:8]:
+                url = urljoin(page_url, url)
+            return _relative_to_page(self._fix_attr_path(url), page_dir)
+
+        def set_attr(tag, name, value):
+            # 无值属性（值为 None）修复后仍为空时不产生编辑
+            if value != (tag.attrs[name] or ''):
+                edits.append(doc.attr_edit(tag, name, value))
+
+        # 改写后的路径都相对于页面自身（页面相对路径已按页面地址解析），原有的 <base> 不能再改变解析位置
+        for base_tag in doc.find_all('base', attr='href'):
+            set_attr(base_tag, 'href', './')
+
+        def set_content(tag, text):
+            if text != doc.content(tag):
+                edits.append((tag.content_start, tag.content_end, text))
 
         # 1. 修复 <link> 标签 (href)
-        for link in soup.find_all('link', href=True):
-            link['href'] = self._fix_attr_path(link['href'])
+        for link in doc.find_all('link', attr='href'):
+            set_attr(link, 'href', fix_attr_path(link.get('href', '')))
 
         # 2. 修复 <script> 标签 (src)
-        for script in soup.find_all('script', src=True):
-            script['src'] = self._fix_attr_path(script['src'])
+        for script in doc.find_all('script', attr='src'):
+            set_attr(script, 'src', fix_attr_path(script.get('src', '')))
 
         # 3. 修复 <img> 标签 (src, srcset, data-src)
-        for img in soup.find_all('img'):
+        for img in doc.find_all('img'):
             if img.get('src'):
-                img['src'] = self._fix_attr_path(img['src'])
+                set_attr(img, 'src', fix_attr_path(self._kept_variant(img.get('src'), page_url)))
             if img.get('data-src'):
-                img['data-src'] = self._fix_attr_path(img['data-src'])
+                set_attr(img, 'data-src', fix_attr_path(img.get('data-src')))
             if img.get('srcset'):
-                img['srcset'] = self._fix_srcset(img['srcset'])
+                set_attr(img, 'srcset', self._fix_srcset(img.get('srcset'), fix_attr_path, page_url))
 
         # 4. 修复 <source> 标签 (src, srcset)
-        for source in soup.find_all('source'):
+        for source in doc.find_all('source'):
             if source.get('src'):
-                source['src'] = self._fix_attr_path(source['src'])
+                set_attr(source, 'src', fix_attr_path(self._kept_variant(source.get('src'), page_url)))
             if source.get('srcset'):
-                source['srcset'] = self._fix_srcset(source['srcset'])
+                set_attr(source, 'srcset', self._fix_srcset(source.get('srcset'), fix_attr_path, page_url))
+            if source.get('type') and self.variant_mapping:
+                # 指向其他格式的保留文件时，type 改为该文件的类型
+                first = (source.get('srcset') or '').split(',')[0].split() or [source.get('src', '')]
+                kept = self._kept_variant(first[0], page_url)
+                mime = mimetypes.guess_type(urlparse(kept).path)[0] if kept != first[0] else None
+                if mime:
+                    set_attr(source, 'type', mime)
 
         # 5. 修复 <video> 和 <audio> 标签
-        for media in soup.find_all(['video', 'audio']):
+        for media in doc.find_all('video', 'audio'):
             if media.get('src'):
-                media['src'] = self._fix_attr_path(media['src'])
+                set_attr(media, 'src', fix_attr_path(media.get('src')))
             if media.get('poster'):
-                media['poster'] = self._fix_attr_path(media['poster'])
+                set_attr(media, 'poster', fix_attr_path(media.get('poster')))
 
         # 6. 修复 <a> 标签中指向本站资源的链接
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
+        for a_tag in doc.find_all('a', attr='href'):
+            href = a_tag.get('href', '')
+            if page_url and self.page_mapping:
+                local_page = self._local_page_link(href, page_url)
+                if local_page is not None:
+                    set_attr(a_tag, 'href', _relative_to_page(local_page, page_dir))
+                    continue
             # 只修复指向下载资源的链接
             if href.startswith('/') and not href.startswith('//'):
                 if any(ext in href.lower() for ext in ['.js', '.css', '.png', '.jpg', '.svg', '.woff', '.json']):
-                    a_tag['href'] = self._fix_attr_path(href)
+                    set_attr(a_tag, 'href', fix_attr_path(href))
 
-        # 7. 修复内联 <style> 标签中的路径
-        for style_tag in soup.find_all('style'):
-            if style_tag.string:
-                style_tag.string = self._fix_css_content(style_tag.string)
+        # 7. 修复内联 <style> 标签中的路径（url() 与元素属性一样相对于页面）
+        page_css_path = os.path.join(self.output_folder, page_rel) if page_dir else None
+        for style_tag in doc.find_all('style'):
+            content = doc.content(style_tag)
+            if content:
+                set_content(style_tag, self._fix_css_content(content, page_css_path, page_url=relative_base))
 
         # 8. 修复内联 <script> 标签中的绝对路径引用（如 self.__next_f.push 数据）
-        for script in soup.find_all('script'):
-            if not script.get('src') and script.string:
-                script.string = self._fix_inline_script_paths(script.string)
+        for script in doc.find_all('script'):
+            content = doc.content(script)
+            if not script.get('src') and content:
+                set_content(script, self._fix_inline_script_paths(content, root_prefix))
 
         # 9. 修复行内 style 属性中的 url()
-        for tag in soup.find_all(style=True):
+        for tag in doc.find_all(attr='style'):
             style_content = tag.get('style', '')
             if 'url(' in style_content:
-                tag['style'] = self._fix_css_content(style_content)
+                set_attr(tag, 'style', self._fix_css_content(style_content, page_css_path, page_url=relative_base))
 
-        return str(soup)
+        return doc.splice(edits)
 
     def _fix_attr_path(self, url):
         """修复单个HTML属性中的URL路径"""
         if not url or url.startswith('data:') or url.startswith('#') or url.startswith('javascript:'):
             return url
         
+        # 允许镜像的其他host，指向 _hosts/<host>/ 下的本地副本
+        mirrored = self._mirror_rel_path(url)
+        if mirrored is not None:
+            return mirrored
+
         # 外部链接（不属于本站）保持不变
         if url.startswith('http') and not self.is_same_origin(url):
             return url
@@ -223,8 +2229,24 @@ class WebsiteCrawler:
         clean = url.split('?')[0].split('#')[0]
         return unquote(clean)
 
-    def _fix_srcset(self, srcset):
-        """修复srcset属性中的多个URL"""
+    def _local_page_link(self, href, page_url):
+        """指向已抓取页面的链接 -> 本地HTML路径（相对于站点根）；页内锚点和其他链接返回 None"""
+        href = href.strip()
+        if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:', 'data:')):
+            return None
+        full_url = urljoin(page_url, href)
+        local_page = self.page_mapping.get(self.canonicalize_url(full_url))
+        if local_page is None:
+            return None
+        fragment = urlparse(full_url).fragment
+        return f"{local_page}#{fragment}" if fragment else local_page
+
+    def _fix_srcset(self, srcset, fix_attr_path=None, page_url=None):
+        """修复srcset属性中的多个URL
+
+        被跳过的变体改为保留的文件（使用保留文件自己的描述符），合并后重复的候选只保留一个
+        """
+        fix_attr_path = fix_attr_path or self._fix_attr_path
         parts = []
         for item in srcset.split(','):
             item = item.strip()
@@ -232,36 +2254,64 @@ class WebsiteCrawler:
                 continue
             tokens = item.split()
             if tokens:
-                tokens[0] = self._fix_attr_path(tokens[0])
-            parts.append(' '.join(tokens))
+                kept = self._kept_variant(tokens[0], page_url)
+                if kept != tokens[0]:
+                    descriptor = self.variant_descriptors.get(kept)
+                    tokens = [kept] + ([descriptor] if descriptor else [])
+                tokens[0] = fix_attr_path(tokens[0])
+            part = ' '.join(tokens)
+            if part not in parts:
+                parts.append(part)
         return ', '.join(parts)
 
-    def _fix_inline_script_paths(self, script_content):
-        """修复内联脚本中的绝对路径引用"""
+    def _rewrite_matchers(self):
+        """按当前 detected_prefixes 构建单次扫描用的组合正则（每组前缀只构建一次）
+
+        返回 (js_re, escaped_pairs)：
+          js_re         - publicPath/assetPrefix 赋值 | 引号内以前缀开头的路径，每个分支恰有一个路径分组
+          escaped_pairs - 内联脚本中 JSON 转义的前缀（\\\\/ 与 \\/ 两种形式）-> 替换文本
+        每个分支都以固定字符开头，re 可以按首字符快速跳过不相关的位置；
+        前缀按长度降序排列，嵌套前缀（如 /b/ 与 /b/a/）总是优先匹配最长的那个
+        """
+        key = frozenset(self.detected_prefixes)
+        cached = self._matchers
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        prefixes = sorted(key, key=lambda p: (-len(p), p))
+        js_branches = list(_JS_PUBLIC_PATH_PATTERNS)
+        escaped_pairs = []
+        if prefixes:
+            prefix_alt = '(?:' + '|'.join(re.escape(p) for p in prefixes) + ')'
+            js_branches += [f'"({prefix_alt}[^"\']*)["\']', f"'({prefix_alt}[^\"']*)[\"']"]
+            for prefix in prefixes:
+                escaped_prefix = prefix.replace('/', '\\/')
+                double_escaped = prefix.replace('/', '\\\\/')
+                # 去掉开头的 \/（先替换双转义，否则其中的 \/ 会被单转义形式匹配）
+                escaped_pairs.append((double_escaped, escaped_prefix[2:]))
+                escaped_pairs.append((escaped_prefix, escaped_prefix[2:]))
+
+        matchers = (re.compile('|'.join(js_branches)), escaped_pairs)
+        self._matchers = (key, matchers)
+        return matchers
+
+    def _fix_inline_script_paths(self, script_content, root_prefix=''):
+        """修复内联脚本中的绝对路径引用
+
+        JSON 转义的资源前缀（\\\\/ 与 \\/）用 str.replace 替换（内联脚本中这类匹配很密集，
+        逐个匹配回调 Python 比 C 层面的子串替换慢），引号内的绝对资源路径再用一次正则扫描。
+        root_prefix 为子目录页面回到站点根的 ../ 前缀，改写后的路径相对于页面自身
+        """
         if not script_content:
             return script_content
-        
-        # 修复转义的绝对路径（如 JSON 中的 \"/assets/fonts/...\"）
-        # 和普通绝对路径
-        
-        # 对于检测到的资源前缀，替换为相对路径
-        for prefix in self.detected_prefixes:
-            # 处理JSON转义格式 (\\/ 或 \/)
-            escaped_prefix = prefix.replace('/', '\\/')
-            double_escaped = prefix.replace('/', '\\\\/')
-            
-            # 替换双转义 (\\/)
-            if double_escaped in script_content:
-                relative_escaped = escaped_prefix[2:]  # 去掉开头的 \/
-                script_content = script_content.replace(double_escaped, relative_escaped)
-            
-            # 替换单转义 (\/)
-            if escaped_prefix in script_content:
-                relative_escaped = escaped_prefix[2:]  # 去掉开头的 \/
-                script_content = script_content.replace(escaped_prefix, relative_escaped)
-        
+
+        escaped_root = root_prefix.replace('/', '\\/')
+        script_content = self._fix_host_urls(script_content, root_prefix)
+        for escaped, relative in self._rewrite_matchers()[1]:
+            if escaped in script_content:
+                script_content = script_content.replace(escaped, escaped_root + relative)
+
         # 修复常见的绝对路径模式（如 '/assets/fonts/...'）
-        # 通用替换：对于以/开头的路径，在引号内的
         def replace_quoted_abs_path(match):
             quote_char = match.group(1)
             path = match.group(2)
@@ -269,34 +2319,53 @@ class WebsiteCrawler:
             clean_path = path.split('?')[0]
             decoded_path = unquote(clean_path)
             if clean_path in self.path_mapping:
-                return f"{quote_char}{self.path_mapping[clean_path]}{quote_char}"
+                return f"{quote_char}{root_prefix}{self.path_mapping[clean_path]}{quote_char}"
             if decoded_path in self.path_mapping:
-                return f"{quote_char}{self.path_mapping[decoded_path]}{quote_char}"
+                return f"{quote_char}{root_prefix}{self.path_mapping[decoded_path]}{quote_char}"
             # 如果是资源路径（有文件扩展名），转为相对路径
-            if re.search(r'\.(js|css|png|jpg|jpeg|gif|svg|woff2?|ttf|eot|otf|json|webp|ico|mp4|webm)(\?|$)', path):
+            if _RESOURCE_EXT_RE.search(path):
                 relative = self.absolute_to_relative(path)
-                return f"{quote_char}{relative}{quote_char}"
+                return f"{quote_char}{root_prefix}{relative}{quote_char}"
             return match.group(0)
-        
-        # 匹配引号内以/开头的路径（但排除 // 开头的协议相对路径和API路径）
-        script_content = re.sub(
-            r"""(['\"])(\/(?!\/|api\/|graphql)[a-zA-Z0-9_\-\.\/\%\[\]@]+\.[a-zA-Z0-9]+(?:\?[^'\"]*)?)\1""",
-            replace_quoted_abs_path,
-            script_content
-        )
-        
-        return script_content
+
+        return _QUOTED_ABS_PATH_RE.sub(replace_quoted_abs_path, script_content)
 
     # ========== CSS 路径修复 ==========
 
-    def _fix_css_content(self, css_content, css_file_path=None):
-        """修复CSS内容中的所有url()路径"""
+    def _fix_css_content(self, css_content, css_file_path=None, page_url=None):
+        """修复CSS内容中的所有url()路径
+
+        page_url 用于HTML内联样式：相对路径先按页面地址解析（与元素属性相同），再转为相对站点根的路径
+        """
+        # 镜像host的CSS中以/开头的路径指向该host的站点根
+        css_host = None
+        if css_file_path and self.mirror_hosts:
+            parts = os.path.relpath(css_file_path, self.output_folder).replace('\\', '/').split('/')
+            if len(parts) > 2 and parts[0] == self.MIRROR_HOSTS_DIR:
+                css_host = re.sub(r'_(\d+)$', r':\1', parts[1])
+
+        def relative_to_css(rel_path):
+            if not css_file_path:
+                return rel_path
+            # CSS文件中需要计算相对于CSS文件位置的路径
+            return os.path.relpath(os.path.join(self.output_folder, rel_path),
+                                   os.path.dirname(css_file_path)).replace('\\', '/')
+
         def replace_url(match):
             quote = match.group(1)
             url = match.group(2)
 
-            if url.startswith('data:') or url.startswith('http') or url.startswith('//'):
+            if url.startswith('data:'):
                 return match.group(0)
+            if css_host and url.startswith('/') and not url.startswith('//'):
+                url = f"//{css_host}{url}"
+            if page_url and not url.startswith(('/', '#', 'http')):
+                url = urlparse(urljoin(page_url, url)).path
+            if url.startswith('http') or url.startswith('//'):
+                mirrored = self._mirror_rel_path(url)
+                if mirrored is None:
+                    return match.group(0)
+                return f'url({quote}{relative_to_css(mirrored)}{quote})'
 
             # 绝对路径，转为相对路径
             if url.startswith('/'):
@@ -304,27 +2373,17 @@ class WebsiteCrawler:
                 
                 # 先查路径映射
                 if clean_path in self.path_mapping:
-                    mapped = self.path_mapping[clean_path]
-                    if css_file_path:
-                        # CSS文件中需要计算相对于CSS文件位置的路径
-                        css_dir = os.path.dirname(css_file_path)
-                        mapped_full = os.path.join(self.output_folder, mapped)
-                        mapped = os.path.relpath(mapped_full, css_dir).replace('\\', '/')
-                    return f'url({quote}{mapped}{quote})'
+                    return f'url({quote}{relative_to_css(self.path_mapping[clean_path])}{quote})'
                 
                 # 尝试按文件名查找（处理字体等资源可能在不同路径下）
                 filename = os.path.basename(clean_path)
                 found = self._find_file_by_name(filename)
                 if found:
-                    if css_file_path:
-                        css_dir = os.path.dirname(css_file_path)
-                        found_full = os.path.join(self.output_folder, found)
-                        found = os.path.relpath(found_full, css_dir).replace('\\', '/')
-                    return f'url({quote}{found}{quote})'
+                    return f'url({quote}{relative_to_css(found)}{quote})'
                 
                 # 兜底：直接去掉开头的/
                 relative = self.absolute_to_relative(url)
-                return f'url({quote}{relative}{quote})'
+                return f'url({quote}{relative_to_css(relative)}{quote})'
 
             # 相对路径，只移除查询参数
             clean_url = url.split('?')[0]
@@ -338,67 +2397,34 @@ class WebsiteCrawler:
         """根据文件名在输出目录中查找文件（支持哈希文件名模糊匹配）"""
         if not filename:
             return None
-        
-        file_base = os.path.splitext(filename)[0]
-        file_ext = os.path.splitext(filename)[1].lower()
-        
-        for root, dirs, files in os.walk(self.output_folder):
-            for f in files:
-                f_base = os.path.splitext(f)[0]
-                f_ext = os.path.splitext(f)[1].lower()
-                # 精确匹配
-                if f == filename:
-                    return os.path.relpath(os.path.join(root, f), self.output_folder).replace('\\', '/')
-                # 模糊匹配：文件名包含原始名且扩展名相同
-                if file_base in f_base and f_ext == file_ext:
-                    return os.path.relpath(os.path.join(root, f), self.output_folder).replace('\\', '/')
-        return None
+        if not self.file_index.seeded:
+            self.file_index.scan(self.output_folder, self.output.iter_files())
+        return self.file_index.find(filename)
 
     # ========== JS 路径修复 ==========
 
     def fix_js_paths(self, js_content, js_file_path=None):
-        """修复JS文件中的绝对路径"""
-        
-        # 1. 修复 webpack publicPath: t.p="/.../" 或 __webpack_public_path__=".../"
-        # 这是最关键的修复：将绝对公共路径改为相对路径
-        # 更精确的匹配：确保是赋值语句，且路径以/开头
-        js_content = re.sub(
-            r'(\.p\s*=\s*["\'])(/[^"\']*)(["\'])',
-            lambda m: f'{m.group(1)}{m.group(2).lstrip("/")}{m.group(3)}',
-            js_content
-        )
-        js_content = re.sub(
-            r'(__webpack_public_path__\s*=\s*["\'])(/[^"\']*)(["\'])',
-            lambda m: f'{m.group(1)}{m.group(2).lstrip("/")}{m.group(3)}',
-            js_content
-        )
-        
-        # 2. 修复 Next.js assetPrefix（更精确的匹配）
-        js_content = re.sub(
-            r'(assetPrefix\s*[=:]\s*["\'])(/[^"\']*)(["\'])',
-            lambda m: f'{m.group(1)}{m.group(2).lstrip("/")}{m.group(3)}',
-            js_content
-        )
-        
-        # 3. 修复 Next.js deploymentId/buildId 相关的路径拼接
-        # 检测到的前缀路径（只在引号内的路径字符串中替换）
-        for prefix in self.detected_prefixes:
-            relative_prefix = prefix.lstrip('/')
-            # 只在引号内的路径中替换，且确保是完整的路径字符串
-            # 匹配模式：引号 + 前缀 + 路径内容 + 引号
-            def replace_prefix(match, p=prefix, rp=relative_prefix):
-                full_path = match.group(2)
-                if full_path.startswith(p):
-                    return f'{match.group(1)}{rp}{full_path[len(p):]}{match.group(3)}'
-                return match.group(0)
-            
-            js_content = re.sub(
-                r'(["\'])(' + re.escape(prefix) + r'[^"\']*)(["\'])',
-                replace_prefix,
-                js_content
-            )
-        
-        return js_content
+        """修复JS文件中的绝对路径
+
+        一次线性扫描同时处理：
+        1. webpack publicPath: t.p="/.../" 或 __webpack_public_path__="/.../"（最关键：公共路径改为相对路径）
+        2. Next.js assetPrefix
+        3. 引号内以检测到的资源前缀开头的路径字符串（Next.js deploymentId/buildId 相关的路径拼接）
+        三类都只需去掉路径分组开头的 /；指向镜像host的绝对URL另由 _fix_host_urls 改为 _hosts/<host>/
+        """
+        if js_file_path is not None:
+            self._js_rewrite_prefixes[os.path.normpath(js_file_path)] = frozenset(self.detected_prefixes)
+        js_re = self._rewrite_matchers()[0]
+        js_content = self._fix_host_urls(js_content)
+
+        def replace(match):
+            group = match.lastindex
+            start, end = match.span(group)
+            offset = match.start()
+            text = match.group(0)
+            return f"{text[:start - offset]}{match.group(group).lstrip('/')}{text[end - offset:]}"
+
+        return js_re.sub(replace, js_content)
 
     # ========== 资源提取 ==========
 
@@ -426,6 +2452,171 @@ class WebsiteCrawler:
 
         return resources
 
+    def _load_js_chunks(self, js_url, local_path):
+        """读取已下载的JS，发现其中引用的运行时 chunk（只处理 Next.js 静态资源和 webpack 运行时）"""
+        name = os.path.basename(urlparse(js_url).path)
+        if '/_next/' not in js_url and not name.startswith(('webpack', 'runtime')):
+            return []
+        js_content = self._read_text(local_path, errors='replace')
+        chunks = self.discover_js_chunks(js_content, js_url)
+        if chunks:
+            self._log(f"    发现运行时chunk: {name} -> {len(chunks)} 个")
+        return chunks
+
+    def discover_js_chunks(self, js_content, js_url):
+        """从 Next.js 构建清单（_buildManifest.js / _ssgManifest.js）和 webpack 运行时的
+        chunk 文件名函数中枚举运行时按需加载的资源，返回绝对URL列表"""
+        parsed = urlparse(js_url)
+        next_idx = parsed.path.find('/_next/')
+        next_base = None
+        if next_idx >= 0:
+            next_base = f"{parsed.scheme}://{parsed.netloc}{parsed.path[:next_idx + len('/_next/')]}"
+        found = []
+
+        # 1. 构建清单中列出的所有页面 chunk / CSS（路径相对于 <assetPrefix>/_next/）
+        if next_base:
+            found.extend(urljoin(next_base, path) for path in _NEXT_STATIC_PATH_RE.findall(js_content))
+
+        # 2. _ssgManifest.js：静态生成页面的数据文件 /_next/data/<buildId>/<route>.json
+        ssg = _SSG_MANIFEST_RE.search(js_content)
+        if ssg and next_base:
+            build_id = os.path.basename(os.path.dirname(parsed.path))
+            for route in re.findall(r'"([^"]+)"|\'([^\']+)\'', ssg.group(1)):
+                route = route[0] or route[1]
+                if route.startswith('/') and '[' not in route:
+                    route = '/index' if route == '/' else route.rstrip('/')
+                    found.append(urljoin(next_base, f"data/{build_id}{route}.json"))
+
+        # 3. webpack 运行时：__webpack_require__.u / .miniCssF 拼出的 chunk 文件名
+        public_path = next_base
+        if public_path is None:
+            match = re.search(r'\.p\s*=\s*["\']([^"\']*)["\']', js_content)
+            if match:
+                # 路径重写后 publicPath 可能已变为相对站点根的路径（镜像host的为 _hosts/<host>/...）
+                public_path = match.group(1)
+                hosts_dir = self.MIRROR_HOSTS_DIR + '/'
+                if public_path.startswith(hosts_dir):
+                    public_path = '//' + re.sub(r'_(\d+)(?=/)', r':\1', public_path[len(hosts_dir):], count=1)
+                public_path = urljoin(self.base_origin + '/', public_path)
+        if public_path:
+            for match in _WEBPACK_CHUNK_FN_RE.finditer(js_content):
+                param = match.group(1) or match.group(2)
+                expression = self._read_js_expression(js_content, match.end())
+                for path in self._expand_chunk_expression(expression, param):
+                    found.append(urljoin(public_path, path))
+
+        return list(dict.fromkeys(found))
+
+    @staticmethod
+    def _read_js_expression(js_content, start):
+        """从 start 开始读取一个JS表达式，直到同一层级的 ; , 或闭合的 } / )"""
+        depth = 0
+        i = start
+        quote_char = None
+        while i < len(js_content):
+            ch = js_content[i]
+            if quote_char:
+                if ch == '\\':
+                    i += 1
+                elif ch == quote_char:
+                    quote_char = None
+            elif ch in '"\'`':
+                quote_char = ch
+            elif ch in '({[':
+                depth += 1
+            elif ch in ')}]':
+                if depth == 0:
+                    break
+                depth -= 1
+            elif ch in ';,' and depth == 0:
+                break
+            i += 1
+        return js_content[start:i]
+
+    @staticmethod
+    def _split_top_level(expression, separator):
+        """按最外层的分隔符切分表达式（忽略括号和字符串内部）"""
+        parts = []
+        depth = 0
+        quote_char = None
+        current = 0
+        i = 0
+        while i < len(expression):
+            ch = expression[i]
+            if quote_char:
+                if ch == '\\':
+                    i += 1
+                elif ch == quote_char:
+                    quote_char = None
+            elif ch in '"\'':
+                quote_char = ch
+            elif ch in '({[':
+                depth += 1
+            elif ch in ')}]':
+                depth -= 1
+            elif depth == 0 and expression.startswith(separator, i):
+                parts.append(expression[current:i])
+                current = i + len(separator)
+                i = current
+                continue
+            i += 1
+        parts.append(expression[current:])
+        return [part.strip() for part in parts]
+
+    @classmethod
+    def _strip_parens(cls, term):
+        """去掉包住整个表达式的括号"""
+        term = term.strip()
+        while term.startswith('(') and cls._read_js_expression(term, 1) == term[1:-1]:
+            term = term[1:-1].strip()
+        return term
+
+    def _expand_chunk_expression(self, expression, param):
+        """展开 webpack chunk 文件名表达式，如
+        "static/chunks/"+({12:"name"}[e]||e)+"."+{12:"3f2a",34:"9c1b"}[e]+".js"
+        返回每个 chunk id 对应的相对路径；无法识别的写法返回空列表"""
+        terms = []
+        chunk_ids = []
+        for term in self._split_top_level(expression, '+'):
+            term = self._strip_parens(term)
+            fallback = False
+            alternatives = self._split_top_level(term, '||')
+            if len(alternatives) == 2 and alternatives[1] == param:
+                term, fallback = self._strip_parens(alternatives[0]), True
+            lookup = self._strip_parens(term[:-len(param) - 2]) if term.endswith(f'[{param}]') else ''
+            if len(term) >= 2 and term[0] in '"\'' and term[-1] == term[0]:
+                terms.append(('str', term[1:-1]))
+            elif term == param:
+                terms.append(('id', None))
+            elif lookup.startswith('{') and lookup.endswith('}'):
+                mapping = {}
+                for entry in _OBJECT_ENTRY_RE.finditer(lookup):
+                    key = entry.group(1) or entry.group(2) or entry.group(3)
+                    mapping[key] = entry.group(4) if entry.group(4) is not None else entry.group(5)
+                terms.append(('map_or_id' if fallback else 'map', mapping))
+                chunk_ids.extend(mapping)
+            else:
+                return []
+
+        paths = []
+        for chunk_id in dict.fromkeys(chunk_ids):
+            parts = []
+            for kind, value in terms:
+                if kind == 'str':
+                    parts.append(value)
+                elif kind == 'id':
+                    parts.append(chunk_id)
+                elif chunk_id in value:
+                    parts.append(value[chunk_id])
+                elif kind == 'map_or_id':
+                    parts.append(chunk_id)
+                else:
+                    # 该 chunk 没有对应的哈希（不是此函数负责的 chunk）
+                    break
+            else:
+                paths.append(''.join(parts))
+        return paths
+
     def extract_inline_style_resources(self, style_content, base_url):
         """从内联样式中提取资源URL"""
         resources = {'fonts': [], 'images': []}
@@ -444,38 +2635,153 @@ class WebsiteCrawler:
         
         return resources
 
-    # ========== 主流程 ==========
+    # ========== 变体选择（带宽预算模式） ==========
 
-    def crawl(self):
-        """开始爬取网站"""
-        print(f"=" * 60)
-        print(f"开始爬取网站: {self.base_url}")
-        print(f"保存目录: {self.output_folder}")
-        print(f"=" * 60)
-
-        # 创建输出文件夹
-        if not os.path.exists(self.output_folder):
-            os.makedirs(self.output_folder)
-
-        # 下载主页面
-        try:
-            response = self.session.get(self.base_url, timeout=30)
-            response.raise_for_status()
-            html_content = response.text
-        except Exception as e:
-            print(f"无法访问主页面: {e}")
-            return
-
-        original_html = html_content
-
-        # 检测资源前缀
-        print("\n[1/8] 分析页面资源结构...")
-        self.detect_resource_prefixes(html_content)
-
-        # 解析HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
+    def _srcset_candidates(self, srcset, page_url):
+        """解析 srcset，返回 [(绝对URL, 宽度, 像素密度)]；w 描述符的密度为 None，没有描述符视为 1x"""
+        candidates = []
+        for item in srcset.split(','):
+            tokens = item.split()
+            if not tokens:
+                continue
+            width, density = None, 1.0
+            descriptor = tokens[1].lower() if len(tokens) > 1 else ''
+            try:
+                if descriptor.endswith('w'):
+                    width, density = int(descriptor[:-1]), None
+                elif descriptor.endswith('x'):
+                    density = float(descriptor[:-1])
+            except ValueError:
+                pass
+            candidates.append((urljoin(page_url, tokens[0]), width, density))
+        return candidates
+
+    def _pick_candidate(self, candidates):
+        """按 target_width（w 描述符）或 target_density（x 描述符）选出一个候选URL：
+        不小于目标值的最小候选，都小于目标值时取最大的"""
+        if any(width for _, width, _ in candidates):
+            ranked = sorted((width, url) for url, width, _ in candidates if width)
+            target = self.target_width
+        else:
+            ranked = sorted((density or 1.0, url) for url, _, density in candidates)
+            target = self.target_density
+        for value, url in ranked:
+            if value >= target:
+                return url
+        return ranked[-1][1]
+
+    def _format_rank(self, tag, url):
+        """<source> 的格式在 preferred_formats 中的位置（type 属性优先，否则按扩展名推断；不在列表中的排在最后）"""
+        mime = tag.get('type', '').split(';')[0].strip().lower() or mimetypes.guess_type(urlparse(url).path)[0]
+        if mime in self.preferred_formats:
+            return self.preferred_formats.index(mime)
+        return len(self.preferred_formats)
+
+    def choose_variants(self, doc, page_url):
+        """带宽预算模式：每个 srcset 只保留一个候选，每个 <picture> 只保留一种格式，
+        每个 <video>/<audio> 只保留一个 <source>。被跳过的URL登记到 variant_mapping（-> 保留的URL），
+        返回本页被跳过的URL集合。只在保留的文件属于本站或镜像host时才做选择"""
+        skipped = {}
+        kept = set()
+
+        def local(url):
+            return self.is_same_origin(url) or self._mirror_host(url) is not None
+
+        def keep_srcset(tag):
+            """保留 srcset 中的一个候选，其余映射到它；返回保留的URL（无法选择时为 None）"""
+            candidates = self._srcset_candidates(tag.get('srcset', ''), page_url)
+            if not candidates:
+                return None
+            choice = self._pick_candidate(candidates)
+            if not local(choice):
+                return None
+            kept.add(choice)
+            for url, width, density in candidates:
+                skipped.setdefault(url, choice)
+                if url == choice:
+                    self.variant_descriptors[url] = f"{width}w" if width else f"{density:g}x"
+            return choice
+
+        def map_all(tag, choice):
+            """tag 的 src 和 srcset 中的所有URL都映射到 choice"""
+            urls = [url for url, _, _ in self._srcset_candidates(tag.get('srcset', ''), page_url)]
+            if tag.get('src'):
+                urls.append(urljoin(page_url, tag.get('src')))
+            for url in urls:
+                skipped.setdefault(url, choice)
+
+        def keep_img(img):
+            choice = keep_srcset(img)
+            if choice and img.get('src'):
+                skipped.setdefault(urljoin(page_url, img.get('src')), choice)
+
+        # HtmlDocument 不保留父子关系，<source>/<img> 按所在的 <picture>/<video>/<audio> 分组
+        groups = {}
+        for tag in doc.find_all('img', 'source'):
+            container = tag.container
+            if container is not None and (container.name == 'picture' or tag.name == 'source'):
+                groups.setdefault(id(container), (container, []))[1].append(tag)
+            elif tag.name == 'img':
+                keep_img(tag)
+
+        for container, children in groups.values():
+            if container.name == 'picture':
+                # <source> -> 格式排名（按 srcset 中第一个候选推断格式）
+                ranks = []
+                for tag in children:
+                    candidates = self._srcset_candidates(tag.get('srcset', ''), page_url) if tag.name == 'source' else None
+                    if candidates:
+                        ranks.append((tag, self._format_rank(tag, candidates[0][0])))
+                best = min((rank for _, rank in ranks), default=None)
+                # 保留格式的 <source>：media 条件 -> 保留的URL
+                by_media = {}
+                for tag, rank in ranks:
+                    if rank == best:
+                        choice = keep_srcset(tag)
+                        if choice:
+                            by_media.setdefault(tag.get('media'), choice)
+                default = by_media.get(None) or next(iter(by_media.values()), None)
+                for tag, rank in ranks:
+                    if rank != best and default:
+                        map_all(tag, by_media.get(tag.get('media'), default))
+                for img in children:
+                    if img.name == 'img':
+                        if default:
+                            map_all(img, default)
+                        else:
+                            keep_img(img)
+            else:
+                sources = [(tag, urljoin(page_url, tag.get('src'))) for tag in children if tag.get('src')]
+                if container.get('src'):
+                    # 元素自身有 src 时浏览器不使用 <source>
+                    choice = urljoin(page_url, container.get('src'))
+                elif sources:
+                    choice = min(sources, key=lambda source: self._format_rank(*source))[1]
+                else:
+                    continue
+                if not local(choice):
+                    continue
+                kept.add(choice)
+                for _, url in sources:
+                    skipped.setdefault(url, choice)
+
+        # 同一URL在本页或之前的页面中被保留过时不再跳过
+        self._kept_variants |= kept
+        dropped = set()
+        for url, choice in skipped.items():
+            if url != choice and url not in self._kept_variants:
+                self.variant_mapping[url] = choice
+                dropped.add(url)
+        return dropped
+
+    def _kept_variant(self, url, page_url):
+        """被跳过的变体URL -> 保留的URL（绝对地址）；其他URL原样返回"""
+        if not self.variant_mapping or not url:
+            return url
+        return self.variant_mapping.get(urljoin(page_url or self.base_url, url.strip()), url)
 
-        # 收集所有资源链接
+    def collect_html_resources(self, doc, page_url):
+        """从已解析的HTML中收集所有资源链接（select_variants=True 时省略被跳过的变体）"""
         resources = {
             'css': [],
             'js': [],
@@ -486,54 +2792,50 @@ class WebsiteCrawler:
         }
 
         # 查找 CSS 文件（包括 data-precedence 的）
-        for link in soup.find_all('link'):
+        for link in doc.find_all('link'):
             href = link.get('href')
             if not href:
                 continue
-            rel = link.get('rel', [])
-            if isinstance(rel, list):
-                rel_str = ' '.join(rel)
-            else:
-                rel_str = rel
-            
+            rel_str = ' '.join(link.get('rel', '').split())
+
             if 'stylesheet' in rel_str or link.get('data-precedence'):
-                full_url = urljoin(self.base_url, href)
+                full_url = urljoin(page_url, href)
                 resources['css'].append(full_url)
             elif 'preload' in rel_str:
-                full_url = urljoin(self.base_url, href)
+                full_url = urljoin(page_url, href)
                 resources['preloads'].append(full_url)
             elif any(k in rel_str for k in ['icon', 'shortcut', 'apple-touch-icon', 'manifest']):
                 # 下载 favicon、icon、manifest 等资源
-                full_url = urljoin(self.base_url, href)
-                if self.is_same_origin(full_url) or not href.startswith('http'):
+                full_url = urljoin(page_url, href)
+                if self.is_same_origin(full_url) or not href.startswith('http') or self._mirror_host(full_url):
                     resources['other'].append(full_url)
 
         # 查找内联样式中的资源
-        for style in soup.find_all('style'):
-            style_content = style.string
+        for style in doc.find_all('style'):
+            style_content = doc.content(style)
             if style_content:
-                inline_res = self.extract_inline_style_resources(style_content, self.base_url)
+                inline_res = self.extract_inline_style_resources(style_content, page_url)
                 resources['fonts'].extend(inline_res['fonts'])
                 resources['images'].extend(inline_res['images'])
 
         # 查找 JS 文件
-        for script in soup.find_all('script', src=True):
+        for script in doc.find_all('script', attr='src'):
             src = script.get('src')
             if src:
-                full_url = urljoin(self.base_url, src)
+                full_url = urljoin(page_url, src)
                 resources['js'].append(full_url)
 
         # 查找图片
-        for img in soup.find_all('img'):
+        for img in doc.find_all('img'):
             # src 属性
             src = img.get('src')
             if src:
-                full_url = urljoin(self.base_url, src)
+                full_url = urljoin(page_url, src)
                 resources['images'].append(full_url)
             # data-src 属性（懒加载）
             data_src = img.get('data-src')
             if data_src:
-                full_url = urljoin(self.base_url, data_src)
+                full_url = urljoin(page_url, data_src)
                 resources['images'].append(full_url)
             # srcset 属性
             srcset = img.get('srcset')
@@ -542,14 +2844,14 @@ class WebsiteCrawler:
                     item = item.strip()
                     if item:
                         url_part = item.split()[0]
-                        full_url = urljoin(self.base_url, url_part)
+                        full_url = urljoin(page_url, url_part)
                         resources['images'].append(full_url)
 
         # 查找 <source> 标签
-        for source in soup.find_all('source'):
+        for source in doc.find_all('source'):
             src = source.get('src')
             if src:
-                full_url = urljoin(self.base_url, src)
+                full_url = urljoin(page_url, src)
                 resources['images'].append(full_url)
             srcset = source.get('srcset')
             if srcset:
@@ -557,154 +2859,496 @@ class WebsiteCrawler:
                     item = item.strip()
                     if item:
                         url_part = item.split()[0]
-                        full_url = urljoin(self.base_url, url_part)
+                        full_url = urljoin(page_url, url_part)
                         resources['images'].append(full_url)
 
         # 查找 <video> poster
-        for video in soup.find_all('video'):
+        for video in doc.find_all('video'):
             poster = video.get('poster')
             if poster:
-                full_url = urljoin(self.base_url, poster)
+                full_url = urljoin(page_url, poster)
                 resources['images'].append(full_url)
 
         # 查找行内 style 属性中的背景图片等
-        for tag in soup.find_all(style=True):
+        for tag in doc.find_all(attr='style'):
             style_content = tag.get('style', '')
             urls = re.findall(r'url\(["\']?([^"\')]+)["\']?\)', style_content)
             for url in urls:
                 if not url.startswith('data:'):
-                    full_url = urljoin(self.base_url, url)
+                    full_url = urljoin(page_url, url)
                     resources['images'].append(full_url)
 
-        # 打印资源统计
-        print(f"\n  发现资源:")
-        print(f"    CSS: {len(resources['css'])}")
-        print(f"    JS:  {len(resources['js'])}")
-        print(f"    图片: {len(set(resources['images']))}")
-        print(f"    字体: {len(set(resources['fonts']))}")
-        print(f"    预加载: {len(resources['preloads'])}")
+        if self.select_variants:
+            dropped = self.choose_variants(doc, page_url)
+            if dropped:
+                for key in ('images', 'preloads'):
+                    resources[key] = [url for url in resources[key] if url not in dropped]
+        return resources
 
-        # ===== 下载所有资源 =====
+    # ========== 主流程 ==========
 
-        # 下载CSS文件
-        print(f"\n[2/8] 下载CSS文件 ({len(resources['css'])}个)...")
-        css_resources = []
-        for url in resources['css']:
-            local_path = self.get_local_path(url)
-            if self.download_file(url, local_path):
+    def crawl(self):
+        """开始爬取网站（profile 指定时同时采集 cProfile / tracemalloc 数据），返回起始页是否抓取成功"""
+        self.metrics.open()
+        try:
+            if self.profile == 'cprofile':
+                profiler = cProfile.Profile()
                 try:
-                    with open(local_path, 'r', encoding='utf-8') as f:
-                        css_content = f.read()
-                    css_res = self.parse_css_resources(css_content, url)
-                    css_resources.extend(css_res)
-                except Exception as e:
-                    print(f"    解析CSS失败: {str(e)}")
-            time.sleep(0.3)
-
-        # 下载JS文件
-        print(f"\n[3/8] 下载JS文件 ({len(resources['js'])}个)...")
-        for url in resources['js']:
-            local_path = self.get_local_path(url)
-            self.download_file(url, local_path)
-            time.sleep(0.3)
-
-        # 下载图片
-        unique_images = set(resources['images'])
-        print(f"\n[4/8] 下载图片文件 ({len(unique_images)}个)...")
-        for url in unique_images:
-            local_path = self.get_local_path(url)
-            self.download_file(url, local_path)
-            time.sleep(0.3)
-
-        # 下载字体
-        unique_fonts = set(resources['fonts'])
-        if unique_fonts:
-            print(f"\n[5/8] 下载字体文件 ({len(unique_fonts)}个)...")
-            for url in unique_fonts:
-                local_path = self.get_local_path(url)
-                self.download_file(url, local_path)
-                time.sleep(0.3)
-
-        # 下载其他资源（manifest、favicon、icon等）
-        if resources['other']:
-            print(f"\n[5.5/8] 下载其他资源 ({len(resources['other'])}个)...")
-            for url in resources['other']:
-                local_path = self.get_local_path(url)
-                self.download_file(url, local_path)
-                time.sleep(0.3)
-
-        # 下载CSS中引用的资源
-        unique_css_resources = set(css_resources) - self.downloaded_urls
-        if unique_css_resources:
-            print(f"\n[6/8] 下载CSS引用的资源 ({len(unique_css_resources)}个)...")
-            for url in unique_css_resources:
-                local_path = self.get_local_path(url)
-                self.download_file(url, local_path)
-                time.sleep(0.3)
+                    return profiler.runcall(self._crawl)
+                finally:
+                    self._report_cprofile(profiler)
+            elif self.profile == 'tracemalloc':
+                tracemalloc.start(25)
+                try:
+                    return self._crawl()
+                finally:
+                    self._report_tracemalloc()
+            else:
+                return self._crawl()
+        finally:
+            # 归档输出在此写入包尾和索引（中断时同样保存已写入的部分）
+            self.output.close()
+            self.metrics.close()
+
+    def close(self):
+        """释放URL状态（url_state='compact' / 'sqlite' 时关闭并删除状态文件）
+
+        爬取结束后 downloaded_urls / path_mapping 在调用 close 之前仍可查询，与 'memory' 后端一致；
+        也可以用 with WebsiteCrawler(...) as crawler: 的形式自动调用
+        """
+        if self.state_db is not None:
+            self.state_db.close()
+            self.state_db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _report_cprofile(self, profiler):
+        """保存 cProfile 结果，并把累计耗时最多的函数写入指标"""
+        os.makedirs(self.output_folder, exist_ok=True)
+        path = os.path.join(self.output_folder, self.PROFILE_NAME)
+        profiler.dump_stats(path)
+        stats = pstats.Stats(profiler)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:20]
+        self.metrics.emit('profile', path=path, top=[
+            {'function': f"{filename}:{line}({name})", 'calls': calls, 'tottime': round(tottime, 6),
+             'cumtime': round(cumtime, 6)}
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in top
+        ])
+        print(f"性能分析结果已保存: {path}")
+
+    def _report_tracemalloc(self):
+        """停止 tracemalloc，把峰值内存和分配最多的代码位置写入指标"""
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        top = snapshot.statistics('lineno')[:20]
+        self.metrics.emit('memory', current=current, peak=peak, top=[
+            {'location': str(stat.traceback), 'bytes': stat.size, 'count': stat.count} for stat in top
+        ])
+        print(f"内存峰值: {peak / 1024 / 1024:.1f}MB（tracemalloc）")
+
+    def _crawl(self):
+        print(f"=" * 60)
+        print(f"开始爬取网站: {self.base_url}")
+        print(f"保存目录: {self.output_folder}")
+        if self.max_pages > 1:
+            print(f"多页面模式: 最大深度 {self.max_depth}, 最多 {self.max_pages} 个页面")
+        print(f"=" * 60)
+        self.crawled_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+        with self.metrics.span('setup'):
+            # 创建输出文件夹（归档输出时打开归档并载入索引）
+            self.output.open()
+
+            # 读取增量清单，已下载过的资源将发送条件请求
+            self.load_manifest()
+            # 登记输出目录中已有的文件
+            self.file_index.scan(self.output_folder, self.output.iter_files())
+
+            # 断点续爬：恢复上次中断时的页面队列、已下载资源和路径映射
+            frontier = self.restore_journal() if self.resume else None
+            saved_pages = self._resumed_pages if frontier is not None else 0
+            self.journal.open(truncate=frontier is None)
+        if frontier is None:
+            # 广度优先抓取同源页面；起始页固定保存为 index.html，资源在所有页面间共享、只下载一次
+            frontier = deque()
+            self._add_page(self.canonicalize_url(self.base_url), 'index.html', 0, frontier, self.base_url)
+            if self.sitemaps:
+                with self.metrics.span('seed'):
+                    self.seed_from_sitemaps(frontier)
+
+        try:
+            while frontier:
+                page_url, depth = frontier.popleft()
+                if depth == 0:
+                    page_url = self.base_url
+                if self.max_pages > 1:
+                    total = len(self.page_mapping) - len(self._unchanged_pages)
+                    print(f"\n{'-' * 60}\n[页面 {saved_pages + 1}/{total}] {page_url} (深度 {depth})")
+                if self._crawl_page(page_url, depth, frontier):
+                    saved_pages += 1
+                    self.journal.write('page_done', url=self.canonicalize_url(page_url))
+                    self.journal.sync()
+                elif depth == 0:
+                    return False
+        finally:
+            # 中断时保留日志，下次以 resume=True 继续
+            self.journal.close()
 
         # ===== 修复所有文件中的路径 =====
+        with self.metrics.span('final_rewrite', mode=self.rewrite_mode):
+            if self.rewrite_mode == 'pipeline':
+                # 内容未修改的文件只在重写上下文变化时重新修复；之后检测到新前缀的JS再修复一次
+                self._refix_unchanged_files()
+                self._refix_stale_js()
+            elif self.rewrite_mode == 'process':
+                print(f"\n[3/4] 修复资源文件中的路径（{self.rewrite_processes} 个进程）...")
+                self.rewrite_files_in_processes(self._collect_rewrite_targets('css') + self._collect_rewrite_targets('js'))
+            else:
+                print(f"\n[3/4] 修复资源文件中的路径...")
+                self._fix_all_css_files()
+                self._fix_all_js_files()
 
-        # 修复CSS文件中的路径
-        print(f"\n[7/8] 修复资源文件中的路径...")
-        self._fix_all_css_files()
-        self._fix_all_js_files()
+        if self.precompress:
+            with self.metrics.span('compress'):
+                print(f"\n生成预压缩文件（{', '.join(self.precompress)}）...")
+                self.precompress_files()
 
-        # 修复HTML并保存
-        print(f"\n[8/8] 修复HTML路径并保存...")
-        fixed_html = self.fix_html_paths(original_html)
-        main_html_path = os.path.join(self.output_folder, 'index.html')
-        with open(main_html_path, 'w', encoding='utf-8') as f:
-            f.write(fixed_html)
-        print(f"  [OK] 已保存: {main_html_path}")
+        with self.metrics.span('manifest'):
+            self.output.close()
+            self.save_manifest()
+            # 正常结束后状态已保存到清单中，不再需要断点日志
+            self.journal.close(remove=True)
 
         # 打印总结
         print(f"\n{'=' * 60}")
-        print(f"爬取完成！文件保存在: {os.path.abspath(self.output_folder)}")
-        print(f"总计下载: {len(self.downloaded_urls)} 个文件")
+        print(f"爬取完成！文件保存在: {os.path.abspath(self.output.archive_path or self.output_folder)}")
+        if self.max_pages > 1:
+            print(f"总计页面: {saved_pages} 个")
+        if self._host_sessions:
+            print(f"跨域镜像: {', '.join(sorted(self._host_sessions))}")
+        print(f"总计下载: {len(self.downloaded_urls)} 个文件（其中未修改 {len(self.unchanged_files)} 个）")
+        if self.variant_mapping or self.max_sizes or self.byte_budget is not None:
+            stats = self.budget_stats
+            print(f"预算模式: 跳过变体 {len(self.variant_mapping)} 个，超过大小上限 {stats['oversize']} 个，"
+                  f"超出总预算 {stats['over_budget']} 个（已知大小共 {stats['bytes_avoided'] / 1024 / 1024:.2f}MB），"
+                  f"计入预算 {stats['used'] / 1024 / 1024:.2f}MB")
+        if self.blob_store:
+            stats = self.blob_store.stats
+            print(f"内容去重: {stats['files']} 个文件，复用 {stats['hits']} 个，新增 {stats['new_blobs']} 个，"
+                  f"节省 {stats['bytes_saved'] / 1024 / 1024:.2f}MB，无法硬链接 {stats['fallbacks']} 个")
+        summary = self.metrics.summary()
+        print("阶段耗时: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in summary['stages'].items()))
+        requests_total = summary['requests']
+        if requests_total['count']:
+            print(f"请求: {requests_total['count']} 个（失败 {requests_total['failed']} 个），"
+                  f"{requests_total['bytes'] / 1024 / 1024:.2f}MB，平均首字节 "
+                  f"{requests_total['ttfb'] / requests_total['count'] * 1000:.0f}ms，平均排队 "
+                  f"{requests_total['queue_wait'] / requests_total['count'] * 1000:.0f}ms")
+        for kind, totals in summary['rewrites'].items():
+            print(f"重写{kind.upper()}: {totals['files']} 个文件，修改 {totals['changed']} 个，耗时 {totals['seconds']:.2f}s")
         print(f"{'=' * 60}")
+        return True
+
+    def _crawl_page(self, page_url, depth, frontier):
+        """抓取单个页面：发现并下载资源、把同源链接加入队列、修复路径后保存HTML"""
+        # 下载页面
+        try:
+            with self.metrics.span('fetch_page', url=page_url), self._fetch(page_url, stream=False) as response:
+                response.raise_for_status()
+                html_content = response.text
+                # 相对路径按重定向后的最终地址解析；页面仍以请求时的规范化URL登记
+                base_url = response.url or page_url
+        except Exception as e:
+            if depth == 0:
+                print(f"无法访问主页面: {e}")
+            else:
+                print(f"  [FAIL] 页面下载失败: {page_url} - {str(e)}")
+            return False
+
+        original_html = html_content
+
+        # 检测资源前缀
+        print("\n[1/4] 分析页面资源结构...")
+        with self.metrics.span('discover', url=page_url):
+            known_prefixes = set(self.detected_prefixes)
+            self.detect_resource_prefixes(html_content)
+            for prefix in self.detected_prefixes - known_prefixes:
+                self.journal.write('prefix', prefix=prefix)
+
+            # 解析HTML（只解析一次，资源发现、链接发现和路径重写共用）
+            doc = HtmlDocument(html_content)
+            resources = self.collect_html_resources(doc, base_url)
+            self._enqueue_links(doc, base_url, depth, frontier)
+
+        # 打印资源统计
+        print(f"\n  发现资源:")
+        print(f"    CSS: {len(resources['css'])}")
+        print(f"    JS:  {len(resources['js'])}")
+        print(f"    图片: {len(set(resources['images']))}")
+        print(f"    字体: {len(set(resources['fonts']))}")
+        print(f"    预加载: {len(resources['preloads'])}")
+
+        # ===== 按依赖图下载所有资源（已下载过的资源直接跳过） =====
+        seeds = ([(url, 'css') for url in resources['css']]
+                 + [(url, 'js') for url in resources['js']]
+                 + [(url, self.guess_resource_kind(url)) for url in resources['preloads']]
+                 + [(url, 'font') for url in resources['fonts']]
+                 + [(url, 'image') for url in resources['images']]
+                 + [(url, 'other') for url in resources['other']])
+        print(f"\n[2/4] 下载资源（发现 {len(seeds)} 个，CSS引用的资源和JS运行时chunk随解析加入队列）...")
+        downloaded_before = len(self.downloaded_urls)
+        with self.metrics.span('download', url=page_url, seeds=len(seeds)):
+            self.download_graph(seeds)
+        print(f"  本页新下载 {len(self.downloaded_urls) - downloaded_before} 个文件")
+
+        # ===== 修复路径 =====
+
+        if self.rewrite_mode == 'pipeline':
+            # JS 已在下载时重写；CSS 在此时其引用的资源均已下载，重写后只写一次
+            print(f"\n[3/4] 修复资源文件中的路径...")
+            with self.metrics.span('rewrite', url=page_url):
+                self.flush_pending_css()
+
+        # 修复HTML并保存
+        print(f"\n[4/4] 修复HTML路径并保存...")
+        with self.metrics.span('html', url=page_url):
+            page_rel = self.page_mapping.get(self.canonicalize_url(page_url), 'index.html')
+            fixed_html = self.fix_html_paths(original_html, doc, base_url, page_rel)
+            page_path = os.path.join(self.output_folder, page_rel)
+            self.create_folder_structure(page_path)
+            encoded = fixed_html.encode('utf-8')
+            # 内容未变时不重写（归档输出时避免追加重复记录）
+            if not (self.output.exists(page_path) and self.output.read(page_path) == encoded):
+                self._atomic_write(page_path, [encoded])
+        print(f"  [OK] 已保存: {page_path}")
+        return True
+
+    def _collect_rewrite_targets(self, kind):
+        """遍历输出目录，收集需要修复的 CSS/JS 文件，返回 [(路径, 类型)]"""
+        # 上下文未变时，内容未修改的文件在上次运行中已修复过，直接跳过
+        skip_unchanged = self._rewrite_context_unchanged(kind)
+        suffix = '.' + kind
+        targets = []
+        for filepath in self.output.iter_files():
+            if filepath.endswith(suffix):
+                if skip_unchanged and os.path.normpath(filepath) in self.unchanged_files:
+                    continue
+                targets.append((filepath, kind))
+        return targets
 
     def _fix_all_css_files(self):
         """修复所有已下载CSS文件中的路径"""
-        for root, dirs, files in os.walk(self.output_folder):
-            for filename in files:
-                if filename.endswith('.css'):
-                    filepath = os.path.join(root, filename)
-                    try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        fixed = self._fix_css_content(content, filepath)
-                        if fixed != content:
-                            with open(filepath, 'w', encoding='utf-8') as f:
-                                f.write(fixed)
-                            print(f"  [OK] 修复CSS: {os.path.relpath(filepath, self.output_folder)}")
-                    except Exception as e:
-                        print(f"  [FAIL] 修复CSS失败: {filename} - {str(e)}")
+        for filepath, kind in self._collect_rewrite_targets('css'):
+            self._fix_css_file(filepath)
 
     def _fix_all_js_files(self):
         """修复所有已下载JS文件中的路径"""
+        for filepath, kind in self._collect_rewrite_targets('js'):
+            self._fix_js_file(filepath)
+
+    def _rewrite_file(self, filepath, kind):
+        """读回单个 CSS/JS 文件并修复其中的路径，返回内容是否改变"""
+        fixer = self._fix_css_content if kind == 'css' else self.fix_js_paths
+        content = self._read_text(filepath)
+        start = time.perf_counter()
+        fixed = fixer(content, filepath)
+        self.metrics.rewrite(kind, os.path.relpath(filepath, self.output_folder), time.perf_counter() - start,
+                             len(content), fixed != content)
+        if fixed == content:
+            return False
+        # 整体替换而不是原地写：文件可能是内容仓库的硬链接
+        self._atomic_write(filepath, [fixed.encode('utf-8')], dedup=True)
+        return True
+
+    def _fix_css_file(self, filepath):
+        """读回单个CSS文件并修复其中的路径"""
+        try:
+            if self._rewrite_file(filepath, 'css'):
+                self._log(f"  [OK] 修复CSS: {os.path.relpath(filepath, self.output_folder)}")
+        except Exception as e:
+            print(f"  [FAIL] 修复CSS失败: {os.path.basename(filepath)} - {str(e)}")
+
+    def _fix_js_file(self, filepath):
+        """读回单个JS文件并修复其中的路径"""
+        try:
+            if self._rewrite_file(filepath, 'js'):
+                self._log(f"  [OK] 修复JS: {os.path.relpath(filepath, self.output_folder)}")
+        except Exception as e:
+            print(f"  [FAIL] 修复JS失败: {os.path.basename(filepath)} - {str(e)}")
+
+    def rewrite_files_in_processes(self, targets):
+        """在进程池中并行修复文件，每个进程各自读取、重写、写回自己分到的文件
+
+        重写上下文（detected_prefixes、path_mapping、文件名索引）只在进程启动时传递一次；
+        大文件先提交，避免最后剩下一个大文件拖慢整体
+        """
+        if not targets:
+            return []
+        targets = sorted(targets, key=lambda t: os.path.getsize(t[0]) if os.path.exists(t[0]) else 0, reverse=True)
+        context = {
+            'base_url': self.base_url,
+            'output_folder': self.output_folder,
+            'detected_prefixes': sorted(self.detected_prefixes),
+            'mirror_hosts': self.mirror_hosts,
+            'path_mapping': self.path_mapping,
+            'indexed_paths': self.file_index.ordered_paths,
+            'blob_store': self.blob_store.root if self.blob_store else None,
+        }
+        results = []
+        start = time.perf_counter()
+        workers = min(self.rewrite_processes, len(targets))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_rewrite_worker,
+                                 initargs=(context,)) as executor:
+            futures = [executor.submit(_rewrite_worker, filepath, kind) for filepath, kind in targets]
+            for future in as_completed(futures):
+                filepath, kind, changed, elapsed, error = future.result()
+                results.append((filepath, kind, changed, elapsed, error))
+                label = 'CSS' if kind == 'css' else 'JS'
+                rel = os.path.relpath(filepath, self.output_folder)
+                if error:
+                    print(f"  [FAIL] 修复{label}失败: {os.path.basename(filepath)} - {error}")
+                    continue
+                size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+                self.metrics.rewrite(kind, rel, elapsed, size, changed)
+                if changed:
+                    self._log(f"  [OK] 修复{label}: {rel} ({elapsed * 1000:.1f}ms)")
+        wall = time.perf_counter() - start
+        busy = sum(r[3] for r in results)
+        print(f"  重写完成: {len(results)} 个文件，修改 {sum(1 for r in results if r[2])} 个，"
+              f"累计耗时 {busy:.2f}s，实际耗时 {wall:.2f}s（并行度 {busy / wall if wall else 0:.1f}x）")
+        return results
+
+    def precompress_files(self):
+        """为输出目录中的可压缩文件并行生成 .gz/.br 同名文件，返回 [(相对路径, 结果)]"""
+        targets = []
         for root, dirs, files in os.walk(self.output_folder):
             for filename in files:
-                if filename.endswith('.js'):
-                    filepath = os.path.join(root, filename)
-                    try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        fixed = self.fix_js_paths(content, filepath)
-                        if fixed != content:
-                            with open(filepath, 'w', encoding='utf-8') as f:
-                                f.write(fixed)
-                            print(f"  [OK] 修复JS: {os.path.relpath(filepath, self.output_folder)}")
-                    except Exception as e:
-                        print(f"  [FAIL] 修复JS失败: {filename} - {str(e)}")
+                if filename.startswith('.') or os.path.splitext(filename)[1].lower() not in _COMPRESSIBLE_EXTS:
+                    continue
+                filepath = os.path.join(root, filename)
+                rel = os.path.relpath(filepath, self.output_folder).replace('\\', '/')
+                targets.append((filepath, rel))
+        if not targets:
+            return []
+        previous = self.previous_manifest.get('compressed', {}) if self.incremental else {}
+        results = []
+        counts = {'compressed': 0, 'unchanged': 0, 'small': 0}
+        saved = 0
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=min(self.rewrite_processes, len(targets))) as executor:
+            futures = {executor.submit(_compress_worker, filepath, self.precompress, self.compress_min_size,
+                                       previous.get(rel)): rel
+                       for filepath, rel in targets}
+            for future in as_completed(futures):
+                rel = futures[future]
+                try:
+                    digest, status, original, compressed = future.result()
+                except Exception as e:
+                    print(f"  [FAIL] 预压缩失败: {rel} - {str(e)}")
+                    continue
+                results.append((rel, status))
+                counts[status] += 1
+                if digest is not None:
+                    self.compressed_files[rel] = digest
+                if status == 'compressed':
+                    saved += original - compressed
+                    self._log(f"  [OK] 预压缩: {rel} ({original} -> {compressed} 字节)")
+        print(f"  预压缩完成: 生成 {counts['compressed']} 个，未修改跳过 {counts['unchanged']} 个，"
+              f"过小跳过 {counts['small']} 个，节省 {saved / 1024 / 1024:.2f}MB，耗时 {time.perf_counter() - start:.2f}s")
+        return results
+
+
+# ========== 进程池重写 ==========
+
+# 每个重写进程内的重写器（由 _init_rewrite_worker 创建一次）
+_rewrite_context = None
+
+
+def _init_rewrite_worker(context):
+    """进程池初始化：用主进程传来的只读上下文构建本进程的重写器"""
+    global _rewrite_context
+    crawler = WebsiteCrawler(context['base_url'], context['output_folder'], rate_limit=None, incremental=False,
+                             blob_store=context['blob_store'], mirror_hosts=context['mirror_hosts'])
+    crawler.detected_prefixes.update(context['detected_prefixes'])
+    crawler.path_mapping = context['path_mapping']
+    for rel_path in context['indexed_paths']:
+        crawler.file_index.add(rel_path)
+    crawler.file_index.seeded = True
+    _rewrite_context = crawler
+
+
+def _rewrite_worker(filepath, kind):
+    """在重写进程中修复单个文件，返回 (路径, 类型, 是否修改, 耗时, 错误信息)"""
+    start = time.perf_counter()
+    try:
+        changed = _rewrite_context._rewrite_file(filepath, kind)
+        return filepath, kind, changed, time.perf_counter() - start, None
+    except Exception as e:
+        return filepath, kind, False, time.perf_counter() - start, str(e)
+
+
+def _compress_worker(filepath, encodings, min_size, known_digest=None):
+    """在压缩进程中为单个文件生成预压缩文件，返回 (源文件sha256, 结果, 原始大小, 最小压缩后大小)
+
+    结果为 'compressed'（已生成）、'unchanged'（内容未变且压缩文件都在）或 'small'（不值得压缩，删除旧的压缩文件）
+    """
+    suffixes = {'gzip': '.gz', 'br': '.br'}
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    siblings = [filepath + suffixes[encoding] for encoding in encodings]
+    if len(data) < min_size:
+        for sibling in siblings:
+            if os.path.exists(sibling):
+                os.remove(sibling)
+        return None, 'small', len(data), len(data)
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == known_digest and all(os.path.isfile(sibling) for sibling in siblings):
+        return digest, 'unchanged', len(data), len(data)
+
+    smallest = len(data)
+    stat = os.stat(filepath)
+    for encoding, sibling in zip(encodings, siblings):
+        if encoding == 'gzip':
+            # mtime=0 使输出只取决于内容
+            payload = gzip.compress(data, compresslevel=9, mtime=0)
+        else:
+            payload = brotli.compress(data, quality=11)
+        smallest = min(smallest, len(payload))
+        tmp_path = f"{sibling}.{os.getpid()}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.chmod(tmp_path, _file_mode())
+        # 与源文件保持相同的修改时间，nginx 返回的 Last-Modified 与未压缩版本一致
+        os.utime(tmp_path, (stat.st_atime, stat.st_mtime))
+        os.replace(tmp_path, sibling)
+    return digest, 'compressed', len(data), smallest
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        # 浏览已爬取的镜像：python website_crawler.py serve <目录> [端口]
+        from crawler_server import serve
+        serve(sys.argv[2] if len(sys.argv) > 2 else 'fooror_website3',
+              port=int(sys.argv[3]) if len(sys.argv) > 3 else 8000)
+        sys.exit(0)
+    if len(sys.argv) > 2 and sys.argv[1] == 'batch':
+        # 批量镜像：python website_crawler.py batch <任务.jsonl> [结果.jsonl] [进程数]
+        from crawler_batch import run_batch
+        run_batch(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else 'batch_results.jsonl',
+                  int(sys.argv[4]) if len(sys.argv) > 4 else None)
+        sys.exit(0)
+
     # 配置
     target_url = 'https://ouraring.com/'
     output_folder = 'fooror_website3'
 
     # 创建爬虫并开始爬取
-    crawler = WebsiteCrawler(target_url, output_folder)
-    crawler.crawl()
+    with WebsiteCrawler(target_url, output_folder, max_workers=8, per_host_limit=4, rate_limit=10.0) as crawler:
+        crawler.crawl()
 
     print("\n注意: 此脚本仅供学习研究使用，请遵守网站的使用条款和版权规定。")